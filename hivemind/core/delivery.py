@@ -0,0 +1,310 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+At-least-once delivery between the RootController and subscriptions.
+
+The root hands each subscription up to ``window`` messages that it has
+not heard back about. Nodes accept a message right away, run the
+subscription off of the request and then report back in batches with
+the ids they've finished (ack) or failed (nack). Anything not heard
+back about within ``ack_timeout`` is sent again. Failures are retried
+after a delay that doubles each time, until ``max_attempts`` is used up.
+"""
+import time
+import queue
+import logging
+import threading
+import traceback
+
+from collections import deque
+
+DELIVERY_HEADER = 'X-Hive-Delivery'
+
+
+class _InFlight(object):
+    """
+    A message a subscriber has yet to acknowledge
+    """
+    __slots__ = ('dispatch', 'deadline', 'attempts')
+
+    def __init__(self, dispatch, deadline):
+        self.dispatch = dispatch
+        self.deadline = deadline
+        self.attempts = 1
+
+
+class DeliveryTracker(object):
+    """
+    Root side bookkeeping of what each subscription has in flight.
+
+    Everything is keyed by the subscription endpoint. Dispatch objects
+    are expected to carry a unique ``offset``.
+
+    :param max_attempts: Deliveries of a message before we give up on
+                         it. None to retry forever
+    :param backoff: Seconds before a rejected message is sent again,
+                    doubled with each attempt up to max_backoff
+    """
+    def __init__(self,
+                 window: int = 32,
+                 ack_timeout: float = 5.0,
+                 max_attempts: int = 10,
+                 backoff: float = 0.5,
+                 max_backoff: float = 30.0):
+        self._window = window
+        self._ack_timeout = ack_timeout
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._lock = threading.Lock()
+
+        # endpoint -> { offset : _InFlight }
+        self._in_flight = {}
+
+        # endpoint -> deque[dispatch] waiting on room in the window
+        self._backlog = {}
+
+
+    @property
+    def ack_timeout(self) -> float:
+        return self._ack_timeout
+
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+
+    def reserve(self, endpoint: str, dispatch) -> bool:
+        """
+        Claim a slot in the endpoint's window for dispatch. Messages
+        that are already in flight (a redelivery) keep their slot.
+
+        :return: False if the window is full. The dispatch is parked
+                 until an acknowledgement makes room for it
+        """
+        with self._lock:
+            window = self._in_flight.setdefault(endpoint, {})
+            deadline = time.monotonic() + self._ack_timeout
+
+            flight = window.get(dispatch.offset)
+            if flight is not None:
+                flight.deadline = deadline
+                flight.attempts += 1
+                return True
+
+            if len(window) >= self._window:
+                self._backlog.setdefault(endpoint, deque()).append(dispatch)
+                return False
+
+            window[dispatch.offset] = _InFlight(dispatch, deadline)
+            return True
+
+
+    def acknowledge(self, endpoint: str, offsets: list) -> list:
+        """
+        The subscriber is done with these messages
+        :return: list of dispatch objects from the backlog that now fit
+                 in the window
+        """
+        with self._lock:
+            window = self._in_flight.get(endpoint, {})
+            for offset in offsets:
+                window.pop(offset, None)
+
+            released = []
+            backlog = self._backlog.get(endpoint)
+            while backlog and len(window) + len(released) < self._window:
+                released.append(backlog.popleft())
+            return released
+
+
+    def reject(self, endpoint: str, offsets: list) -> list:
+        """
+        The subscriber failed to process these messages. Each is sent
+        again by expired() once it's backoff is up, unless it's used up
+        it's attempts.
+        :return: list of dispatch objects we've given up on
+        """
+        now = time.monotonic()
+        dropped = []
+        with self._lock:
+            window = self._in_flight.get(endpoint, {})
+            for offset in offsets:
+                flight = window.get(offset)
+                if flight is None:
+                    continue
+
+                if self._max_attempts and flight.attempts >= self._max_attempts:
+                    window.pop(offset)
+                    dropped.append(flight.dispatch)
+                else:
+                    flight.deadline = now + min(
+                        self._backoff * 2 ** (flight.attempts - 1),
+                        self._max_backoff
+                    )
+        return dropped
+
+
+    def expired(self) -> tuple:
+        """
+        Collect everything that's gone too long without an answer.
+        Messages that have used up their attempts are dropped.
+
+        :return: tuple(list[tuple(endpoint, dispatch)],
+                       list[tuple(endpoint, dispatch)]) of messages to
+                 send again and messages we've given up on
+        """
+        now = time.monotonic()
+        retry = []
+        dropped = []
+        with self._lock:
+            for endpoint, window in self._in_flight.items():
+                for offset, flight in list(window.items()):
+                    if flight.deadline > now:
+                        continue
+
+                    if self._max_attempts and flight.attempts >= self._max_attempts:
+                        window.pop(offset)
+                        dropped.append((endpoint, flight.dispatch))
+                    else:
+                        # Don't fire again until we've had a chance to
+                        # hear back
+                        flight.deadline = now + self._ack_timeout
+                        retry.append((endpoint, flight.dispatch))
+        return retry, dropped
+
+
+    def low_water(self, endpoint: str) -> (int, None):
+        """
+        :return: The lowest offset the endpoint still owes us an answer
+                 for or None if it's all caught up
+        """
+        with self._lock:
+            offsets = list(self._in_flight.get(endpoint, {}))
+            offsets.extend(d.offset for d in self._backlog.get(endpoint, ()))
+        return min(offsets) if offsets else None
+
+
+    def in_flight(self, endpoint: str) -> int:
+        with self._lock:
+            return len(self._in_flight.get(endpoint, {}))
+
+
+    def forget(self, endpoint: str) -> None:
+        """
+        The subscription is gone for good
+        """
+        with self._lock:
+            self._in_flight.pop(endpoint, None)
+            self._backlog.pop(endpoint, None)
+
+
+class Acknowledger(object):
+    """
+    Node side worker. Runs subscriptions for messages that expect an
+    acknowledgement, in the order they arrived, and reports the results
+    to the root in batches.
+
+    :param deliver: callable(path, data) that runs the subscription
+    :param send: callable(acks:dict, nacks:dict) that ships a batch of
+                 results to the root. Both map endpoint -> list[offset]
+    :param flush_interval: The longest we'll hold onto results
+    """
+    def __init__(self, deliver, send, flush_interval=0.05, logger=None):
+        self._deliver = deliver
+        self._send = send
+        self._flush_interval = flush_interval
+        self._logger = logger or logging
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._acks = {}
+        self._nacks = {}
+        self._abort = False
+
+        self._thread = threading.Thread(
+            target=self._run, name='acknowledger'
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def submit(self, path: str, data, offset: int) -> None:
+        """
+        Queue a message to run on our worker
+        """
+        self._queue.put((path, data, offset))
+
+
+    def complete(self, path: str, offset: int, success: bool) -> None:
+        """
+        Record the result of a message that was run elsewhere
+        """
+        with self._lock:
+            target = self._acks if success else self._nacks
+            target.setdefault(path, []).append(offset)
+
+
+    def shutdown(self) -> None:
+        self._abort = True
+        self._queue.put(None)
+        self._thread.join()
+        self._flush()
+
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._abort:
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                item = None
+
+            if item is not None:
+                path, data, offset = item
+                try:
+                    self._deliver(path, data)
+                    self.complete(path, offset, True)
+                except Exception:
+                    self._logger.error(traceback.format_exc())
+                    self.complete(path, offset, False)
+
+            now = time.monotonic()
+            if (now - last_flush) >= self._flush_interval:
+                self._flush()
+                last_flush = now
+
+
+    def _flush(self) -> None:
+        with self._lock:
+            acks, self._acks = self._acks, {}
+            nacks, self._nacks = self._nacks, {}
+
+        if not acks and not nacks:
+            return
+
+        try:
+            self._send(acks, nacks)
+        except Exception as e:
+            # The root will send these again once they time out
+            self._logger.warning(f'Failed to send acknowledgements: {e}')
@@ -0,0 +1,194 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+Failure detection for nodes that heartbeat into the RootController.
+
+Rather than a fixed timeout, each node gets a phi accrual detector. It
+learns the usual gap between that node's heartbeats and reports how
+suspicious the current silence is (phi). A phi of 1 means roughly a 10%
+chance we're wrong in calling the node dead, 2 a 1% chance and so on.
+"""
+import math
+import time
+import threading
+
+from collections import deque
+
+
+class _HeartbeatHistory(object):
+    """
+    Sliding window of the intervals between heartbeats
+    """
+    __slots__ = ('intervals', 'total', 'squared', 'last')
+
+    def __init__(self, first_interval: float, window: int, now: float):
+        self.intervals = deque(maxlen=window)
+        self.total = 0.0
+        self.squared = 0.0
+        self.last = now
+
+        # Seed with something sensible so a single heartbeat is
+        # enough to start judging the node
+        self._add(first_interval)
+        self._add(first_interval * 1.5)
+        self._add(first_interval * 0.5)
+
+
+    def _add(self, interval: float) -> None:
+        if len(self.intervals) == self.intervals.maxlen:
+            old = self.intervals[0]
+            self.total -= old
+            self.squared -= old * old
+        self.intervals.append(interval)
+        self.total += interval
+        self.squared += interval * interval
+
+
+    def beat(self, now: float) -> None:
+        self._add(max(now - self.last, 0.0))
+        self.last = now
+
+
+    @property
+    def mean(self) -> float:
+        return self.total / len(self.intervals)
+
+
+    @property
+    def std_dev(self) -> float:
+        mean = self.mean
+        variance = (self.squared / len(self.intervals)) - (mean * mean)
+        return math.sqrt(max(variance, 0.0))
+
+
+class FailureDetector(object):
+    """
+    Phi accrual failure detector over any number of nodes.
+
+    .. code-block:: python
+
+        detector = FailureDetector(interval=1.0, threshold=8.0)
+        detector.heartbeat('my_node')
+        ...
+        for name in detector.suspects():
+            mark_offline(name)
+
+    :param interval: How often nodes are expected to heartbeat
+    :param threshold: phi above which a node is considered dead. Lower
+                      values detect failures faster but are more likely
+                      to be wrong
+    :param acceptable_pause: Extra seconds of silence to put up with
+                             before phi starts to climb (e.g. GC pauses)
+    :param min_std_dev: Floor on the deviation so a very regular node
+                        isn't declared dead after the slightest hiccup
+    :param window: Number of intervals remembered per node
+    """
+    def __init__(self,
+                 interval: float = 1.0,
+                 threshold: float = 8.0,
+                 acceptable_pause: float = 0.0,
+                 min_std_dev: float = None,
+                 window: int = 100):
+        self._interval = interval
+        self._threshold = threshold
+        self._acceptable_pause = acceptable_pause
+        self._min_std_dev = min_std_dev \
+            if min_std_dev is not None else interval / 4.0
+        self._window = window
+        self._lock = threading.Lock()
+        self._histories = {}
+
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+
+    def heartbeat(self, name: str, now: float = None) -> bool:
+        """
+        Record a heartbeat from a node
+        :return: True if this is the first we've heard of it
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            history = self._histories.get(name)
+            if history is None:
+                self._histories[name] = _HeartbeatHistory(
+                    self._interval, self._window, now
+                )
+                return True
+            history.beat(now)
+            return False
+
+
+    def phi(self, name: str, now: float = None) -> float:
+        """
+        :return: The suspicion level for a node. 0.0 for nodes we're
+                 not tracking
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            history = self._histories.get(name)
+            if history is None:
+                return 0.0
+            elapsed = now - history.last
+            mean = history.mean + self._acceptable_pause
+            std_dev = max(history.std_dev, self._min_std_dev)
+        return self._phi(elapsed, mean, std_dev)
+
+
+    def suspects(self, now: float = None) -> list:
+        """
+        :return: list[str] of the nodes we believe to be dead
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            names = list(self._histories)
+        return [n for n in names if self.phi(n, now) > self._threshold]
+
+
+    def forget(self, name: str) -> None:
+        """
+        Stop tracking a node
+        """
+        with self._lock:
+            self._histories.pop(name, None)
+
+
+    @staticmethod
+    def _phi(elapsed: float, mean: float, std_dev: float) -> float:
+        """
+        -log10 of the probability that a heartbeat is still coming,
+        using a logistic approximation of the normal CDF
+        """
+        y = (elapsed - mean) / std_dev
+        try:
+            e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        except OverflowError:
+            return 0.0 # Far earlier than expected
+        if elapsed > mean:
+            later = e / (1.0 + e)
+        else:
+            later = 1.0 - 1.0 / (1.0 + e)
+        if later <= 0.0:
+            return float('inf')
+        return -math.log10(later)
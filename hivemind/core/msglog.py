@@ -0,0 +1,468 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+Durable message log for the RootController.
+
+Every message a service sends is appended to a memory mapped segment
+file before it's dispatched. Segments are rotated once full and the
+offset of a record is it's byte position across the whole log, so it
+only ever grows.
+
+Durability comes from a single flusher thread that syncs whatever
+has been appended every ``commit_interval`` seconds. Writers that need
+to know their record hit the disk call ``wait_durable()`` and ride
+along with the next flush rather than paying for their own fsync.
+"""
+import os
+import json
+import mmap
+import time
+import zlib
+import bisect
+import struct
+import threading
+
+_RECORD = struct.Struct('<II') # length, crc32
+_SEGMENT_SUFFIX = '.log'
+_CURSOR_FILE = 'cursors.json'
+
+
+class _Segment(object):
+    """
+    A single, preallocated, memory mapped file of the log
+    """
+    def __init__(self, path: str, base: int, size: int):
+        self.path = path
+        self.base = base
+        self.size = size
+        self.position = 0
+
+        exists = os.path.isfile(path)
+        self._handle = open(path, 'r+b' if exists else 'w+b')
+        if not exists or os.path.getsize(path) < size:
+            self._handle.truncate(size)
+        self._map = mmap.mmap(self._handle.fileno(), size)
+
+
+    def recover(self) -> None:
+        """
+        Walk the records to find where we left off. Anything after the
+        first torn or empty record is garbage.
+        """
+        position = 0
+        while position + _RECORD.size <= self.size:
+            length, crc = _RECORD.unpack_from(self._map, position)
+            start = position + _RECORD.size
+            if length == 0 or start + length > self.size:
+                break
+            if zlib.crc32(self._map[start:start + length]) != crc:
+                break
+            position = start + length
+        self.position = position
+
+
+    def fits(self, length: int) -> bool:
+        return self.position + _RECORD.size + length <= self.size
+
+
+    def write(self, data: bytes) -> int:
+        position = self.position
+        start = position + _RECORD.size
+        self._map[start:start + len(data)] = data
+        # Header last, a torn write leaves a zero length behind
+        _RECORD.pack_into(self._map, position, len(data), zlib.crc32(data))
+        self.position = start + len(data)
+        return self.base + position
+
+
+    def read(self, position: int) -> tuple:
+        """
+        :return: tuple(data:bytes|None, next_position:int)
+        """
+        if position + _RECORD.size > self.position:
+            return None, position
+        length, _ = _RECORD.unpack_from(self._map, position)
+        start = position + _RECORD.size
+        return self._map[start:start + length], start + length
+
+
+    def flush(self) -> None:
+        self._map.flush()
+
+
+    def close(self) -> None:
+        self._map.close()
+        self._handle.close()
+
+
+class MessageLog(object):
+    """
+    Append-only, segmented message log with per-subscriber delivery
+    cursors.
+
+    .. code-block:: python
+
+        log = MessageLog('/var/hive/messages')
+        offset = log.append({'service' : 'ping', 'payload' : 'pong'})
+        log.wait_durable(offset)
+
+        # -- Once the subscriber has the message
+        log.acknowledge('/sub/mynode/ping', offset)
+
+        # -- When it comes back after an outage
+        for offset, record in log.read_from(log.cursor('/sub/mynode/ping')):
+            ...
+
+    A cursor is the offset of the next record a subscriber has yet to
+    acknowledge. Subscribers that never come back can be let go of with
+    ``expire()`` so they don't hold onto the log forever.
+    """
+    def __init__(self,
+                 location: str,
+                 segment_size: int = 16 * 1024 * 1024,
+                 commit_interval: float = 0.005):
+        self._location = location
+        self._segment_size = segment_size
+        self._commit_interval = commit_interval
+
+        self._lock = threading.RLock()
+        self._condition = threading.Condition(self._lock)
+
+        self._segments = []
+        self._bases = []
+        self._written = 0
+        self._durable = 0
+        self._closed = False
+
+        self._cursors = {}
+        self._cursors_dirty = False
+
+        # key -> when we last heard of the subscriber. \see expire()
+        self._touched = {}
+
+        os.makedirs(location, exist_ok=True)
+        self._open()
+
+        self._flusher = threading.Thread(
+            target=self._flush_loop,
+            name='message_log_flush'
+        )
+        self._flusher.daemon = True
+        self._flusher.start()
+
+
+    @property
+    def end_offset(self) -> int:
+        """
+        :return: The offset the next record will be written to
+        """
+        with self._lock:
+            return self._written
+
+
+    @property
+    def durable_offset(self) -> int:
+        """
+        :return: Everything before this offset is on disk
+        """
+        with self._lock:
+            return self._durable
+
+    # -- Writing
+
+    def append(self, record: dict) -> int:
+        """
+        Add a record to the end of the log
+        :param record: json serializable dict
+        :return: The offset of the record
+        """
+        data = json.dumps(record).encode('utf-8')
+        if _RECORD.size + len(data) > self._segment_size:
+            raise ValueError(
+                f'Record of {len(data)} bytes exceeds the segment size'
+            )
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('MessageLog is closed')
+
+            segment = self._segments[-1]
+            if not segment.fits(len(data)):
+                segment = self._new_segment(self._written)
+
+            offset = segment.write(data)
+            self._written = segment.base + segment.position
+            self._condition.notify_all()
+        return offset
+
+
+    def wait_durable(self, offset: int, timeout: float = None) -> bool:
+        """
+        Block until the record at offset has been synced to disk
+        :return: False if we timed out first
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._durable > offset or self._closed,
+                timeout
+            )
+
+    # -- Reading
+
+    def read_from(self, offset: int = 0, end: int = None):
+        """
+        Iterate over the records from an offset up to the current end
+        of the log. Segments may be truncated away while we're between
+        records, in which case we carry on from the oldest one left.
+        :param end: Stop before this offset rather than the end
+        :return: Generator[tuple(offset:int, record:dict)]
+        """
+        with self._lock:
+            end = self._written if end is None else min(end, self._written)
+
+        while offset < end:
+            with self._lock:
+                if not self._segments:
+                    return # Closed
+
+                offset = max(offset, self._bases[0])
+                index = bisect.bisect_right(self._bases, offset) - 1
+                segment = self._segments[index]
+
+                data, next_position = segment.read(offset - segment.base)
+                if data is None:
+                    if index + 1 >= len(self._segments):
+                        return
+                    offset = self._bases[index + 1]
+                    continue
+                next_offset = segment.base + next_position
+
+            yield offset, json.loads(data)
+            offset = next_offset
+
+
+    def next_offset(self, offset: int) -> int:
+        """
+        :return: The offset directly after the record at offset
+        """
+        with self._lock:
+            index = bisect.bisect_right(self._bases, offset) - 1
+            if index < 0:
+                return offset
+            segment = self._segments[index]
+            _, next_position = segment.read(offset - segment.base)
+            return segment.base + next_position
+
+    # -- Cursors
+
+    def cursor(self, key: str) -> (int, None):
+        """
+        :return: The next unacknowledged offset for a subscriber or None
+                 if we've never seen them
+        """
+        with self._lock:
+            return self._cursors.get(key)
+
+
+    def set_cursor(self, key: str, offset: int) -> None:
+        with self._lock:
+            self._touched[key] = time.monotonic()
+            if self._cursors.get(key) != offset:
+                self._cursors[key] = offset
+                self._cursors_dirty = True
+
+
+    def acknowledge(self, key: str, offset: int) -> None:
+        """
+        The subscriber known as key has the record at offset. Move it's
+        cursor past it.
+        """
+        next_offset = self.next_offset(offset)
+        with self._lock:
+            self._touched[key] = time.monotonic()
+            if next_offset > self._cursors.get(key, -1):
+                self._cursors[key] = next_offset
+                self._cursors_dirty = True
+
+
+    def forget(self, key: str) -> None:
+        """
+        Drop a subscriber. It's cursor no longer holds back cleanup
+        """
+        with self._lock:
+            self._touched.pop(key, None)
+            if self._cursors.pop(key, None) is not None:
+                self._cursors_dirty = True
+
+
+    def expire(self, keep, max_idle: float) -> list:
+        """
+        Forget subscribers we haven't heard from in max_idle seconds.
+        One that's gone for good (or came back under another key) would
+        otherwise keep every segment after it's cursor around.
+
+        :param keep: Keys to hold onto regardless, e.g. the subscribers
+                     that are still registered
+        :return: list of the keys we let go of
+        """
+        cutoff = time.monotonic() - max_idle
+        with self._lock:
+            expired = [
+                key for key in self._cursors
+                if key not in keep and self._touched.get(key, cutoff) <= cutoff
+            ]
+            for key in expired:
+                self._touched.pop(key, None)
+                self._cursors.pop(key)
+            if expired:
+                self._cursors_dirty = True
+                self._condition.notify_all()
+        return expired
+
+    # -- Lifetime
+
+    def close(self) -> None:
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._flusher.join()
+        self._flush()
+
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+            self._bases = []
+
+    # -- Private Methods
+
+    def _open(self) -> None:
+        """
+        Load existing segments and cursors from disk
+        """
+        names = sorted(
+            n for n in os.listdir(self._location) if n.endswith(_SEGMENT_SUFFIX)
+        )
+        for name in names:
+            base = int(name[:-len(_SEGMENT_SUFFIX)])
+            path = os.path.join(self._location, name)
+            segment = _Segment(path, base, max(
+                self._segment_size, os.path.getsize(path)
+            ))
+            segment.recover()
+            self._segments.append(segment)
+            self._bases.append(base)
+
+        if not self._segments:
+            self._new_segment(0)
+
+        last = self._segments[-1]
+        self._written = self._durable = last.base + last.position
+
+        cursor_path = os.path.join(self._location, _CURSOR_FILE)
+        if os.path.isfile(cursor_path):
+            with open(cursor_path, 'r') as f:
+                self._cursors = json.load(f)
+
+            # Everyone gets a fresh start to come back in
+            now = time.monotonic()
+            self._touched = { key : now for key in self._cursors }
+
+
+    def _new_segment(self, base: int) -> _Segment:
+        path = os.path.join(self._location, f'{base:020d}{_SEGMENT_SUFFIX}')
+        if self._segments:
+            # The previous segment is done. Get it on disk
+            self._segments[-1].flush()
+        segment = _Segment(path, base, self._segment_size)
+        self._segments.append(segment)
+        self._bases.append(base)
+        return segment
+
+
+    def _flush_loop(self) -> None:
+        """
+        Group commit. Everything appended within one interval shares
+        a single sync.
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or self._written > self._durable
+                            or self._cursors_dirty
+                )
+                if self._closed:
+                    return
+
+            # Let the batch fill up
+            threading.Event().wait(self._commit_interval)
+            self._flush()
+
+
+    def _flush(self) -> None:
+        """
+        Sync the active segment and cursors. Appends carry on while
+        we wait on the disk.
+        """
+        with self._lock:
+            if not self._segments:
+                return
+            target = self._written
+            segment = self._segments[-1]
+            cursors = None
+            if self._cursors_dirty:
+                cursors = dict(self._cursors)
+                self._cursors_dirty = False
+
+        segment.flush()
+
+        if cursors is not None:
+            cursor_path = os.path.join(self._location, _CURSOR_FILE)
+            with open(cursor_path + '.tmp', 'w') as f:
+                json.dump(cursors, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(cursor_path + '.tmp', cursor_path)
+
+        with self._condition:
+            self._durable = max(self._durable, target)
+
+            # With nobody subscribed there's nothing left to keep
+            lows = list(self._cursors.values())
+            if cursors:
+                lows.extend(cursors.values())
+            self._truncate(min(lows) if lows else target)
+            self._condition.notify_all()
+
+
+    def _truncate(self, low: int) -> None:
+        """
+        Remove segments that every subscriber has moved past. Called
+        with the lock held.
+        """
+        while len(self._segments) > 1 and self._segments[1].base <= low:
+            segment = self._segments.pop(0)
+            self._bases.pop(0)
+            segment.close()
+            os.remove(segment.path)
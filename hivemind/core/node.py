@@ -20,11 +20,15 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import re
 import uuid
 import logging
+import threading
 import traceback
 
 from . import log
+from . import transport
+from .delivery import Acknowledger, DELIVERY_HEADER
 from .base import _HivemindAbstractObject, _HandlerBase
 from .root import RootController
 from .service import _Service
@@ -34,6 +38,7 @@ import asyncio
 from aiohttp import web
 
 from ..util.misc import BasicRegistry
+from ..util import global_settings
 
 class NodeSubscriptionHandler(_HandlerBase):
     """
@@ -45,24 +50,42 @@ class NodeSubscriptionHandler(_HandlerBase):
         """
         The POST operation for a node subscription
         """
-        data = await request.json()
+        if request.content_type == transport.RAW_CONTENT_TYPE:
+            data = await request.read() # A raw payload the ring couldn't take
+        else:
+            data = await request.json()
         path = '/' + request.match_info['fullpath']
 
-        if not hasattr(self, 'endpoints'):
-            return web.json_response(None) # Nothing to do...
+        delivery = request.headers.get(DELIVERY_HEADER)
+        if delivery is None or not getattr(self, 'acknowledger', None):
+            self.deliver(path, data)
+            return web.json_response(None)
+
+        # The root is waiting on an acknowledgement rather than this
+        # response, so we don't hold it up running the subscription
+        self.acknowledger.submit(path, data, int(delivery))
+        return web.json_response({ 'result' : 'accepted' }, status=202)
+
+
+    @classmethod
+    def deliver(cls, path, data):
+        """
+        Route a payload to the subscription living at path. This is
+        shared by every transport the root may use to reach us.
+        """
+        if not hasattr(cls, 'endpoints'):
+            return # Nothing to do...
 
         if isinstance(data, _HandlerBase.Error):
             # This is an errored response from our root. We need
             # to abort now
-            return web.json_response(None) # Nothing to do...
+            return # Nothing to do...
 
-        for endpoint, callback in self.endpoints.items():
+        for endpoint, callback in cls.endpoints.items():
             if path == endpoint:
                 # Fire up the execution function
                 callback.function(data)
 
-        return web.json_response(None)
-
 
 class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
     """
@@ -98,6 +121,18 @@ class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
         # The web server
         self._app = None
 
+        # Shared memory ring handed to us by the root (same host only)
+        self._ring = None
+        self._ring_thread = None
+        self._ring_abort = threading.Event()
+
+        # Runs subscriptions and reports back to the root
+        self._acknowledger = None
+
+        # Periodic proof of life for the root
+        self._heartbeat_thread = None
+        self._heartbeat_abort = threading.Event()
+
         self._abort_condition = kwargs.get('abort_condition', None)
         self._abort_event = kwargs.get('abort_event', None)
 
@@ -162,6 +197,16 @@ class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
             # Create independently to avoid reference mixup
             self._handler_class.endpoints = {}
 
+            handler_class = self._handler_class
+            self._acknowledger = Acknowledger(
+                deliver=handler_class.deliver,
+                send=lambda acks, nacks: RootController.acknowledge(
+                    self, acks, nacks
+                ),
+                logger=self.logger
+            )
+            self._handler_class.acknowledger = self._acknowledger
+
             # Route our logging facilities per-node for when the handler
             # recieves some form of log request
             node_ = self
@@ -176,12 +221,15 @@ class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
                 self._handler_class.endpoints[
                     subscription.endpoint
                 ] = subscription
-                RootController.register_subscription(subscription)
+                result = RootController.register_subscription(subscription)
+                if isinstance(result, dict) and result.get('transport'):
+                    self._attach_transport(result['transport'])
 
             self.additional_registration(self._handler_class)
 
             RootController.enable_node(self)
             self._set_enabled()
+            self._start_heartbeat()
 
             self._serve(loop)
 
@@ -260,15 +308,31 @@ class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
         return service
 
 
-    def add_subscription(self, subscription_filter, function, name=None):
+    def add_subscription(self, subscription_filter, function, name=None, where=None):
         """
         Generates a _Subscription with the given name. This becomes
         an enpoint on our local server 
+
+        :param where: Optional predicate on the payload. Only payloads
+                      that match are sent to us.
+                      \see hivemind.core.predicate
+        :param name: Defaults to the name of the function. It has to be
+                     the same from one run to the next for the root to
+                     replay what we missed while we were down
         """
-        subscription = _Subscription(
-            self, subscription_filter, function, name=name
-        )
         with self.lock:
+            if name is None:
+                base = re.sub(r'\W+', '', getattr(function, '__name__', ''))
+                base = base or 'subscription'
+                taken = {s.name for s in self._subscriptions}
+                name, count = base, 1
+                while name in taken:
+                    count += 1
+                    name = f'{base}_{count}'
+
+            subscription = _Subscription(
+                self, subscription_filter, function, name=name, where=where
+            )
             self._subscriptions.append(subscription)
         return subscription
 
@@ -294,9 +358,17 @@ class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
 
 
     def shutdown(self):
+        self._stop_heartbeat()
+
         for service in self._services:
             service.shutdown()
 
+        self._detach_transport()
+
+        if self._acknowledger:
+            self._acknowledger.shutdown()
+            self._acknowledger = None
+
         if self._registered:
             self.on_shutdown()
             RootController.deregister_node(self)
@@ -330,6 +402,104 @@ class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
                 service.alert()
 
 
+    def _start_heartbeat(self) -> None:
+        """
+        Start letting the root know we're alive
+        """
+        if self._heartbeat_thread:
+            return
+
+        self._heartbeat_abort.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat,
+            name=f'{self.name}_heartbeat'
+        )
+        self._heartbeat_thread.daemon = True
+        self._heartbeat_thread.start()
+
+
+    def _heartbeat(self) -> None:
+        """
+        Heartbeat loop. Failures are only logged, the root decides
+        when we've been quiet for too long
+        """
+        settings = global_settings.get('heartbeat', None) or {}
+        interval = settings.get('interval', 1.0)
+
+        while not self._heartbeat_abort.wait(interval):
+            try:
+                if not RootController.heartbeat(self):
+                    self.log_warning("Root does not recognize this node")
+            except Exception as e:
+                self.log_debug(f"Heartbeat failed: {e}")
+
+
+    def _stop_heartbeat(self) -> None:
+        if not self._heartbeat_thread:
+            return
+        self._heartbeat_abort.set()
+        self._heartbeat_thread.join()
+        self._heartbeat_thread = None
+
+
+    def _attach_transport(self, info: dict) -> None:
+        """
+        The root has offered us a shared memory ring. Start draining
+        it on a dedicated thread.
+        """
+        if self._ring or info.get('type') != 'shm' or not transport.available():
+            return
+
+        try:
+            self._ring = transport.ShmRing.attach(**info)
+        except Exception as e: # pragma: no cover
+            self.log_warning(f"Cannot attach to shared memory: {e}")
+            return
+
+        self._ring_abort.clear()
+        self._ring_thread = threading.Thread(
+            target=self._drain_transport,
+            name=f'{self.name}_ring'
+        )
+        self._ring_thread.daemon = True
+        self._ring_thread.start()
+
+
+    def _drain_transport(self) -> None:
+        """
+        Ring reader loop
+        """
+        def _deliver(path, data, delivery):
+            if delivery is None:
+                self._handler_class.deliver(path, data)
+                return
+
+            try:
+                self._handler_class.deliver(path, data)
+                self._acknowledger.complete(path, delivery, True)
+            except Exception:
+                self.log_error(traceback.format_exc())
+                self._acknowledger.complete(path, delivery, False)
+
+        while not self._ring_abort.is_set():
+            if self._ring.wait(0.5):
+                try:
+                    self._ring.drain(_deliver)
+                except Exception:
+                    self.log_error(traceback.format_exc())
+
+
+    def _detach_transport(self) -> None:
+        if not self._ring:
+            return
+        self._ring_abort.set()
+        if self._ring_thread:
+            self._ring_thread.join()
+            self._ring_thread = None
+        self._ring.close()
+        self._ring = None
+
+
     def _serve(self, loop):
         """
         Here's where the main node thread starts up and runs whatever
@@ -373,6 +543,8 @@ class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
         Lookup function to provide context for rendering different elements
         """
         nodes = cls.wapi_query_for_nodes(controller, querydict)
+        service_counts = controller.service_counts()
+        sub_counts = controller.subscription_counts()
 
         output = []
         for node in nodes:
@@ -384,8 +556,8 @@ class _Node(_HivemindAbstractObject, metaclass=BasicRegistry):
                 'infos' : [
                     { 'status' : 'Online' if node.status == 'online' else 'Offline'}
                 ],
-                'service_count' : controller.service_count(node),
-                'sub_count' : controller.subscription_count(node),
+                'service_count' : service_counts.get(node, 0),
+                'sub_count' : sub_counts.get(node, 0),
                 'url' : f'/nodes/{node.name}'
             })
 
@@ -20,7 +20,9 @@ class RootNodeHandler(_HandlerBase):
         """
         Simple nodes interface
         """
-        return self.controller.base_context()
+        return await self.controller.async_database.run(
+            self.controller.base_context
+        )
 
 
     @aiohttp_jinja2.template("nodes/page.html")
@@ -28,8 +30,10 @@ class RootNodeHandler(_HandlerBase):
         """
         A single page for a given node.
         """
-        context = self.controller.base_context()
-        context['node'] = self._get_node(request.match_info['name'])
+        context = await self.controller.async_database.run(
+            self.controller.base_context
+        )
+        context['node'] = await self._get_node(request.match_info['name'])
         return context
 
     # -- JSON Responses
@@ -40,7 +44,7 @@ class RootNodeHandler(_HandlerBase):
         parameters, check to see if we have any logging information
         to return.
         """
-        node = self._get_node(request.match_info['name'])
+        node = await self._get_node(request.match_info['name'])
         querydict = request.query
 
         position = 0
@@ -69,11 +73,13 @@ class RootNodeHandler(_HandlerBase):
 
     # -- Private Methods
 
-    def _get_node(self, name):
+    async def _get_node(self, name):
         """
         :return: ``NodeRegister`` instance if found. Raise 404 if not
         """
-        node = self.controller.get_node(name)
+        node = await self.controller.async_database.run(
+            self.controller.get_node, name
+        )
         if node is None:
             raise web.HTTPNotFound(text=f'Unknown none: {name}')
         return node
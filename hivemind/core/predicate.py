@@ -0,0 +1,181 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+Payload predicates for subscriptions.
+
+A subscription can ask the root to only send it payloads that match
+a ``where`` clause. The clause is plain json so it can travel with the
+registration and uses the same operator names as the data layer
+(``hivemind.data.query.QueryOperators``).
+
+.. code-block:: python
+
+    node.add_subscription('weather*', on_weather, where={
+        'site' : 'north',                          # equals
+        'reading.temp' : { 'gt_or_eq' : 30, 'lt' : 45 },
+        'kind' : { 'one_of' : ['storm', 'hail'] },
+    })
+
+Keys are dotted paths into the payload and every entry has to match.
+Use ``{ 'or' : [clause, ...] }`` or ``{ 'and' : [clause, ...] }`` to
+group clauses.
+"""
+import operator
+
+_MISSING = object()
+
+
+def _one_of(values):
+    try:
+        values = frozenset(values)
+    except TypeError:
+        values = list(values) # Unhashable members
+    return lambda x: x in values
+
+
+def _not_one_of(values):
+    match = _one_of(values)
+    return lambda x: not match(x)
+
+
+def _null(is_null: bool):
+    """
+    ``{ 'is_null' : False }`` is the same as ``{ 'is_not_null' : True }``
+    """
+    return lambda value: (lambda x: (x is None) == (bool(value) == is_null))
+
+
+def _compare(op):
+    return lambda value: (lambda x: op(x, value))
+
+
+def _string(test):
+    return lambda value: (
+        lambda x: isinstance(x, str) and test(x, value)
+    )
+
+
+#
+# name -> callable(value) -> callable(field) -> bool
+#
+OPERATORS = {
+    'equals'      : _compare(operator.eq),
+    'not_equals'  : _compare(operator.ne),
+    'lt'          : _compare(operator.lt),
+    'lt_or_eq'    : _compare(operator.le),
+    'gt'          : _compare(operator.gt),
+    'gt_or_eq'    : _compare(operator.ge),
+    'startswith'  : _string(str.startswith),
+    'endswith'    : _string(str.endswith),
+    'contains'    : _string(str.__contains__),
+    'one_of'      : _one_of,
+    'not_one_of'  : _not_one_of,
+    'is_null'     : _null(True),
+    'is_not_null' : _null(False),
+}
+
+
+def _getter(path: str):
+    """
+    Build a callable that walks a dotted path into nested dicts (or
+    lists, with integer keys)
+    """
+    keys = path.split('.')
+
+    def _get(payload):
+        for key in keys:
+            if isinstance(payload, dict):
+                payload = payload.get(key, _MISSING)
+            elif isinstance(payload, (list, tuple)) and key.isdigit():
+                index = int(key)
+                payload = payload[index] if index < len(payload) else _MISSING
+            else:
+                return None
+            if payload is _MISSING:
+                return None
+        return payload
+
+    return _get
+
+
+def _compile_field(path: str, condition) -> list:
+    get = _getter(path)
+
+    if not isinstance(condition, dict):
+        condition = { 'equals' : condition }
+
+    tests = []
+    for name, value in condition.items():
+        if name not in OPERATORS:
+            raise ValueError(f'Unknown operator "{name}" for "{path}"')
+        test = OPERATORS[name](value)
+        tests.append(lambda payload, get=get, test=test: test(get(payload)))
+    return tests
+
+
+def _compile_clause(clause) -> callable:
+    if isinstance(clause, (list, tuple)):
+        clause = { 'and' : list(clause) }
+
+    if not isinstance(clause, dict):
+        raise ValueError(f'Invalid predicate clause: {clause!r}')
+
+    tests = []
+    for key, value in clause.items():
+        if key in ('and', 'or'):
+            if not isinstance(value, (list, tuple)):
+                raise ValueError(f'"{key}" expects a list of clauses')
+            children = [_compile_clause(c) for c in value]
+            group = all if key == 'and' else any
+            tests.append(
+                lambda payload, c=children, g=group: g(t(payload) for t in c)
+            )
+        else:
+            tests.extend(_compile_field(key, value))
+
+    if len(tests) == 1:
+        return tests[0]
+    return lambda payload: all(t(payload) for t in tests)
+
+
+def compile_predicate(where) -> (callable, None):
+    """
+    Compile a ``where`` clause into a callable we can run against
+    every payload.
+
+    :param where: dict|list clause (see module documentation) or None
+    :return: callable(payload) -> bool or None if there's nothing
+             to check
+    :raises ValueError: If the clause is malformed
+    """
+    if not where:
+        return None
+
+    test = _compile_clause(where)
+
+    def _predicate(payload) -> bool:
+        try:
+            return bool(test(payload))
+        except TypeError:
+            return False # e.g. comparing a str to an int
+
+    return _predicate
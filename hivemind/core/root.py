@@ -27,6 +27,7 @@ import logging
 import fnmatch
 import requests
 import functools
+import itertools
 import threading
 import importlib
 from itertools import islice
@@ -42,6 +43,11 @@ import jinja2
 import aiohttp_jinja2
 
 from . import log
+from . import transport
+from .msglog import MessageLog
+from .delivery import DeliveryTracker, DELIVERY_HEADER
+from .liveness import FailureDetector
+from .predicate import compile_predicate
 from .feature import _Feature
 from .base import _HivemindAbstractObject, _HandlerBase
 from .node_endpoints import RootNodeHandler
@@ -50,6 +56,8 @@ from hivemind.util.misc import requests_retry_session, get_ip
 from hivemind.util import _webtoolkit
 
 from hivemind.data.abstract.scafold import _DatabaseIntegration
+from hivemind.data.aio import AsyncDatabase
+from hivemind.data.migrate import Migrator
 
 # -- Bsaeic tables required by the system
 from hivemind.data.tables import (
@@ -70,26 +78,47 @@ class RootServiceHandler(_HandlerBase):
     async def register_node(self, request):
         """ Register a _Node """
         data = await request.json()
-        port = self.controller._register_node(data)
+        port = await self.controller.async_database.run(
+            self.controller._register_node, data
+        )
         return web.json_response({ 'result' : port })
 
 
     async def register_service(self, request):
         """ Register a _Service """
         data = await request.json()
-        self.controller._register_service(data)
+        await self.controller.async_database.run(
+            self.controller._register_service, data
+        )
         return web.json_response({ 'result' : True })
 
 
     async def register_subscription(self, request):
         """ Register a _Subscription """
         data = await request.json()
-        self.controller._register_subscription(data)
-        return web.json_response({ 'result' : True })
+        result = await self.controller.async_database.run(
+            self.controller._register_subscription, data
+        )
+        return web.json_response(result)
 
 
     async def heartbeat(self, request):
         """ Basic alive test """
+        if request.method == 'POST' and request.can_read_body:
+            data = await request.json()
+            result = await self.controller.async_database.run(
+                self.controller._heartbeat, data
+            )
+            return web.json_response({'result' : result})
+        return web.json_response({'result' : True})
+
+
+    async def acknowledge(self, request):
+        """ Batch of delivery results from a node """
+        data = await request.json()
+        await self.controller.async_database.run(
+            self.controller._acknowledge, data
+        )
         return web.json_response({'result' : True})
 
 
@@ -97,7 +126,10 @@ class RootServiceHandler(_HandlerBase):
         """ Dispatch service command """
         path = request.match_info['tail']
         data = await request.json()
-        passback = self.controller._delegate(path, data)
+        passback = await self.controller.async_database.run(
+            self.controller._delegate, path, data
+        )
+        await self.controller._wait_durable(passback.get('offset'))
         return web.json_response(passback)
 
 
@@ -119,7 +151,10 @@ class RootServiceHandler(_HandlerBase):
         """
         query = request.query
         path = request.match_info['api_path']
-        return _webtoolkit.api_request(path, self.controller, query)
+        return await self.controller.async_database.run(
+            _webtoolkit.api_request,
+            path, self.controller, query, request.method
+        )
 
 
     @aiohttp_jinja2.template("hive_index.html")
@@ -127,7 +162,9 @@ class RootServiceHandler(_HandlerBase):
         """
         The Landing page of the root controller
         """
-        return self.controller.base_context()
+        return await self.controller.async_database.run(
+            self.controller.base_context
+        )
 
 
 @dataclass(order=True)
@@ -141,6 +178,29 @@ class PrioritizedDispatch:
     node: Any=field(compare=False)
     payload: Any=field(compare=False)
 
+    # Position in the message log (when enabled)
+    offset: Any=field(default=None, compare=False)
+
+    # When set, only this SubscriptionInfo receives the payload
+    target: Any=field(default=None, compare=False)
+
+
+@dataclass
+class Replay:
+    """
+    A subscription being caught up from the message log, one delivery
+    window at a time. \see RootController._catch_up()
+    """
+    filter_: str
+    subinfo: Any
+
+    # The next record to read and where live dispatch took over
+    offset: int
+    end: int
+
+    # Offsets of the current batch we're waiting to hear back about
+    outstanding: set=field(default_factory=set)
+
 
 @dataclass(order=True)
 class SingleDispatch:
@@ -165,16 +225,18 @@ class RootController(_HivemindAbstractObject):
     #
     NODE_PENDING = 'pending'
     NODE_ONLINE  = 'online'
+    NODE_OFFLINE = 'offline'
     NODE_TERM    = 'terminate'
 
     class SubscriptionInfo(object):
         """
         Subscription data held by the RootController
         """
-        def __init__(self, endpoint, port, node):
+        def __init__(self, endpoint, port, node, predicate=None):
             self._endpoint = endpoint
             self._port = port
             self._node = node
+            self._predicate = predicate
 
         @property
         def port(self):
@@ -191,6 +253,13 @@ class RootController(_HivemindAbstractObject):
             return self._node
 
 
+        def accepts(self, payload) -> bool:
+            """
+            :return: True if the subscription wants this payload
+            """
+            return self._predicate is None or self._predicate(payload)
+
+
     def __init__(self, **kwargs):
         _HivemindAbstractObject.__init__(
             self,
@@ -227,6 +296,54 @@ class RootController(_HivemindAbstractObject):
         self._response_queue = queue.PriorityQueue()
         self._single_dispatch_queue = queue.PriorityQueue()
 
+        #
+        # Nodes that live on the same host as us can be handed a
+        # shared memory ring rather than going through HTTP for
+        # every message. { node_name : transport.ShmRing }
+        #
+        self._transports = {}
+        self._local_ip = get_ip()
+
+        #
+        # Optional durable log of every message we've been asked
+        # to deliver. \see _init_message_log()
+        #
+        self._message_log = None
+        self._cursor_ttl = None
+
+        #
+        # Every message shipped to a subscription stays in flight
+        # until the node acknowledges it. \see hivemind.core.delivery
+        #
+        delivery_settings = global_settings.get('delivery', None) or {}
+        self._delivery = DeliveryTracker(
+            window=delivery_settings.get('window', 32),
+            ack_timeout=delivery_settings.get('ack_timeout', 5.0),
+            max_attempts=delivery_settings.get('max_attempts', 10),
+            backoff=delivery_settings.get('backoff', 0.5),
+            max_backoff=delivery_settings.get('max_backoff', 30.0)
+        )
+        self._delivery_ids = itertools.count()
+        self._redelivery_abort = threading.Event()
+
+        # { endpoint : Replay } for subscriptions catching up from
+        # the message log. \see _catch_up()
+        self._replays = {}
+        self._replay_lock = threading.Lock()
+
+        #
+        # Nodes heartbeat into us. Those that go quiet for longer than
+        # their history says is reasonable are marked offline until
+        # they're heard from again. \see hivemind.core.liveness
+        #
+        heartbeat_settings = global_settings.get('heartbeat', None) or {}
+        self._liveness = FailureDetector(
+            interval=heartbeat_settings.get('interval', 1.0),
+            threshold=heartbeat_settings.get('phi_threshold', 8.0),
+            acceptable_pause=heartbeat_settings.get('acceptable_pause', 0.0)
+        )
+        self._liveness_abort = threading.Event()
+
         #
         # Startup utilities
         #
@@ -241,6 +358,7 @@ class RootController(_HivemindAbstractObject):
         # on the same node.
         #
         self._database = None
+        self._async_database = None
 
         #
         # Features are essential tools for adding customization and allowing
@@ -283,6 +401,51 @@ class RootController(_HivemindAbstractObject):
         return 0 # We'll need some kind of passback
 
 
+    @classmethod
+    def heartbeat(cls, node) -> bool:
+        """
+        Let the root know a node is still alive. Called periodically
+        from the _Node classes.
+
+        :return: False if the root doesn't know about the node
+        """
+        root_ip = global_settings.get('hive_root_ip', '127.0.0.1')
+        default_port = global_settings['default_port']
+
+        # No retries. If this doesn't make it, the next one will
+        result = requests.post(
+            f'http://{root_ip}:{default_port}/heartbeat',
+            json={ 'name' : node.name },
+            timeout=5.0,
+            verify=False
+        )
+        result.raise_for_status()
+        return result.json().get('result', False)
+
+
+    @classmethod
+    def acknowledge(cls, node, acks, nacks):
+        """
+        Report which deliveries a node has handled. Called from the
+        _Node classes in batches.
+
+        :param acks: dict[endpoint:str, list[int]] of deliveries that
+                     completed
+        :param nacks: dict[endpoint:str, list[int]] of deliveries that
+                      failed and should be sent again
+        """
+        root_ip = global_settings.get('hive_root_ip', '127.0.0.1')
+        default_port = global_settings['default_port']
+
+        result = requests_retry_session().post(
+            f'http://{root_ip}:{default_port}/ack',
+            json={ 'node' : node.name, 'acks' : acks, 'nacks' : nacks },
+            verify=False
+        )
+        result.raise_for_status()
+        return result.json()
+
+
     @classmethod
     def _register_post(cls, type_, json_data):
         """
@@ -365,7 +528,8 @@ class RootController(_HivemindAbstractObject):
             'node' : subscription.node.name,
             'filter' : subscription.filter,
             'endpoint' : subscription.endpoint,
-            'port' : subscription.node.port
+            'port' : subscription.node.port,
+            'where' : subscription.where
         })
 
 
@@ -383,7 +547,15 @@ class RootController(_HivemindAbstractObject):
     @property
     def database(self):
         return self._database
-    
+
+
+    @property
+    def async_database(self) -> AsyncDatabase:
+        """
+        :return: ``AsyncDatabase`` for use within our request handlers
+        """
+        return self._async_database
+
 
     # -- Virtual Interface
 
@@ -414,6 +586,11 @@ class RootController(_HivemindAbstractObject):
             # Data layer interface
             #
             self._init_database()
+            self._async_database = AsyncDatabase(
+                self._database,
+                max_workers=global_settings['database'].get('async_workers', 4)
+            )
+            self._init_message_log()
 
             self._handler_class = RootServiceHandler()
             self._node_handler = RootNodeHandler()
@@ -467,6 +644,9 @@ class RootController(_HivemindAbstractObject):
                 web.post('/heartbeat',
                          self._handler_class.heartbeat),
 
+                web.post('/ack',
+                         self._handler_class.acknowledge),
+
                 web.post('/service/{tail:.*}',
                          self._handler_class.service_dispatch),
 
@@ -503,6 +683,20 @@ class RootController(_HivemindAbstractObject):
                 res_thread.start()
                 self._response_threads.append(res_thread)
 
+            redelivery_thread = threading.Thread(
+                target=self._redeliver,
+                name='redelivery_thread'
+            )
+            redelivery_thread.start()
+            self._response_threads.append(redelivery_thread)
+
+            liveness_thread = threading.Thread(
+                target=self._monitor_liveness,
+                name='liveness_thread'
+            )
+            liveness_thread.start()
+            self._response_threads.append(liveness_thread)
+
 
             default_port = global_settings['default_port']
             self.log_info(f"Serving on {default_port}...")
@@ -591,6 +785,33 @@ class RootController(_HivemindAbstractObject):
             self._response_condition.notify()
 
 
+    def service_counts(self) -> dict:
+        """
+        The number of services for every node in one go
+
+        :return: ``dict[NodeRegister, int]``
+        """
+        with self.lock:
+            return {
+                node : len(services) for node, services in self._services.items()
+            }
+
+
+    def subscription_counts(self) -> dict:
+        """
+        The number of subscriptions for every node, in a single pass
+        over our subscriptions rather than one per node
+
+        :return: ``dict[NodeRegister, int]``
+        """
+        counts = {}
+        with self.lock:
+            for subinfos in self._subscriptions.values():
+                for si in subinfos:
+                    counts[si.node] = counts.get(si.node, 0) + 1
+        return counts
+
+
     def service_count(self, node) -> int:
         """
         Query for the number of services this node consumes
@@ -752,8 +973,17 @@ class RootController(_HivemindAbstractObject):
                         self._remove_node(node)
                         return 0
                     else:
+                        came_online = node.status != self.NODE_ONLINE and \
+                            payload['status'] == self.NODE_ONLINE
+
                         node.status = payload['status']
                         self._database.save(node)
+
+                        if came_online:
+                            # Once everyone can see it's online
+                            self.database.transaction.after(
+                                lambda: self._catch_up_node(node.name)
+                            )
                         return node.port
 
 
@@ -774,7 +1004,15 @@ class RootController(_HivemindAbstractObject):
                         to_rem.append(d)
                 for d in to_rem:
                     subinfo.remove(d)
-
+                    self._delivery.forget(d.endpoint)
+                    with self._replay_lock:
+                        self._replays.pop(d.endpoint, None)
+                    if self._message_log:
+                        # Leaving for good, don't hold the log for it
+                        self._message_log.forget(d.endpoint)
+
+            self._close_transport(node_instance.name)
+            self._liveness.forget(node_instance.name)
             self._database.delete(node_instance)
 
 
@@ -824,20 +1062,83 @@ class RootController(_HivemindAbstractObject):
             f"Register Subscription: {payload['node']} to {payload['filter']}"
         )
 
+        # Compiled once here rather than for every message
+        predicate = compile_predicate(payload.get('where'))
+
         with self.lock:
 
             known_subscriptions = self._subscriptions.setdefault(
                 payload['filter'], []
             )
-            known_subscriptions.append(
-                self.SubscriptionInfo(
-                    payload['endpoint'],
-                    payload['port'],
-                    node
-                )
+
+            # A node coming back replaces it's previous registration
+            known_subscriptions[:] = [
+                si for si in known_subscriptions
+                if si.endpoint != payload['endpoint']
+            ]
+
+            subinfo = self.SubscriptionInfo(
+                payload['endpoint'],
+                payload['port'],
+                node,
+                predicate
             )
+            known_subscriptions.append(subinfo)
+
+            result = { 'result' : True }
+            ring = self._transport_for(node)
+            if ring:
+                result['transport'] = ring.info()
+
+        # Replays to a node that isn't online yet would be dropped.
+        # It's caught up once it is. \see _register_node()
+        self._catch_up(
+            payload['filter'],
+            subinfo,
+            replay=(node.status == self.NODE_ONLINE)
+        )
+        return result
 
-        return 0
+
+    def _transport_for(self, node: NodeRegister) -> (transport.ShmRing, None):
+        """
+        Locate (or create) the shared memory ring for a node. We only
+        hand these out when the node lives on the same host as we do.
+
+        :param node: ``NodeRegister``
+        :return: ShmRing|None
+        """
+        if not global_settings.get('shm_transport', False):
+            return None
+
+        if not transport.available():
+            return None
+
+        if node.ip not in ('127.0.0.1', self._local_ip):
+            return None # Has to go over the wire
+
+        with self.lock:
+            if node.name not in self._transports:
+                name = f'hm_{os.getpid()}_{node.id}'
+                try:
+                    self._transports[node.name] = transport.ShmRing.create(
+                        name,
+                        global_settings.get('shm_transport_size', 4 * 1024 * 1024)
+                    )
+                except Exception as e: # pragma: no cover
+                    self.log_warning(f"Shared memory unavailable: {e}")
+                    return None
+            return self._transports[node.name]
+
+
+    def _close_transport(self, node_name: str) -> None:
+        """
+        Tear down any ring we've built for a node
+        """
+        with self.lock:
+            ring = self._transports.pop(node_name, None)
+        if ring:
+            ring.close(unlink=True)
 
 
     def _delegate(self, path, payload):
@@ -847,17 +1148,127 @@ class RootController(_HivemindAbstractObject):
         service_name = path.split('/')[-1]
         self.log_debug(f"Message from: {service_name}")
 
+        if self._message_log:
+            offset = self._message_log.append({
+                'service' : service_name,
+                'node' : payload.get('node', None),
+                'payload' : payload.get('payload', None),
+                'priority' : payload.get('priority', 1)
+            })
+        else:
+            offset = next(self._delivery_ids)
+
         self._response_queue.put(PrioritizedDispatch(
-            payload.get('priority', 1),  # Prio (lower is higher prio!)
-            service_name,                # Name
-            payload.get('node', None),   # Node
-            payload.get('payload', None) # Payload
+            payload.get('priority', 1),   # Prio (lower is higher prio!)
+            service_name,                 # Name
+            payload.get('node', None),    # Node
+            payload.get('payload', None), # Payload
+            offset
         ))
 
         with self._response_condition:
             self._response_condition.notify()
 
-        return { 'result' : True } # For now
+        return { 'result' : True, 'offset' : offset }
+
+
+    async def _wait_durable(self, offset) -> None:
+        """
+        Wait, without blocking the loop, for a logged message to hit
+        the disk. Concurrent requests share the same sync.
+        """
+        if self._message_log is None:
+            return
+        await asyncio.get_event_loop().run_in_executor(
+            None, self._message_log.wait_durable, offset
+        )
+
+
+    def _catch_up(self, filter_: str, subinfo, replay: bool = True) -> None:
+        """
+        A subscription has (re)registered. If the message log knows
+        where it left off, replay everything it missed since.
+
+        The backlog could be the better part of the log so it's read a
+        delivery window at a time. The next batch is queued once the
+        subscriber has answered for the last. \see _replay()
+
+        :param replay: False to only start the log for a new subscription
+        """
+        if not self._message_log:
+            return
+
+        cursor = self._message_log.cursor(subinfo.endpoint)
+        if cursor is None:
+            # Never seen - start from now
+            self._message_log.set_cursor(
+                subinfo.endpoint, self._message_log.end_offset
+            )
+            return
+
+        if not replay:
+            return
+
+        end = self._message_log.end_offset
+        if cursor >= end:
+            return # Nothing missed
+
+        self.log_info(f"Replaying missed messages to {subinfo.endpoint}")
+        with self._replay_lock:
+            # Starts over if it was already part way through
+            self._replays[subinfo.endpoint] = Replay(
+                filter_, subinfo, cursor, end
+            )
+        self._replay(subinfo.endpoint)
+
+
+    def _replay(self, endpoint: str, answered: list = ()) -> None:
+        """
+        Queue the next batch of a subscription's replay once it's
+        answered for everything in the last one
+
+        :param answered: Offsets the subscriber has acknowledged or we've
+                         given up on since
+        """
+        with self._replay_lock:
+            replay = self._replays.get(endpoint)
+            if replay is None:
+                return
+
+            replay.outstanding.difference_update(answered)
+            if replay.outstanding:
+                return
+
+            batch = []
+            reader = self._message_log.read_from(replay.offset, replay.end)
+            for offset, record in reader:
+                if not fnmatch.fnmatch(record['service'], replay.filter_):
+                    continue
+                if not replay.subinfo.accepts(record.get('payload', None)):
+                    continue # Would never be answered for
+                if len(batch) == self._delivery.window:
+                    replay.offset = offset
+                    break
+                batch.append(PrioritizedDispatch(
+                    record.get('priority', 1),
+                    record['service'],
+                    record.get('node', None),
+                    record.get('payload', None),
+                    offset,
+                    replay.subinfo
+                ))
+            else:
+                # Live dispatch has it from here
+                self._replays.pop(endpoint)
+
+            replay.outstanding.update(d.offset for d in batch)
+
+        for dispatch in batch:
+            self._response_queue.put(dispatch)
+
+        if batch:
+            with self._response_condition:
+                self._response_condition.notify_all()
 
 
 
@@ -867,6 +1278,14 @@ class RootController(_HivemindAbstractObject):
         with self._response_condition:
             self._abort = True
             self._response_condition.notify_all()
+        self._redelivery_abort.set()
+        self._liveness_abort.set()
+        for node_name in list(self._transports):
+            self._close_transport(node_name)
+        if self._message_log:
+            self._message_log.close()
+        if self._async_database:
+            self._async_database.shutdown()
         self._database.disconnect()
 
 
@@ -893,7 +1312,11 @@ class RootController(_HivemindAbstractObject):
                 except queue.Empty:
                     pass # We may just have a single dispatch to fire
 
-            if dispatch_object:
+            if dispatch_object and dispatch_object.target:
+                # Replay for a single subscriber
+                self._deliver(dispatch_object, None, dispatch_object.target)
+
+            elif dispatch_object:
                 # We have a dispatch - locate any matching subscriptions
                 for filter_ in self._subscriptions:
                     if fnmatch.fnmatch(dispatch_object.name, filter_):
@@ -903,15 +1326,7 @@ class RootController(_HivemindAbstractObject):
                         # payload to the subscriptions undernearth
                         #
                         for si in self._subscriptions[filter_]:
-
-                            node = self.get_node(si.node.name) # cache?
-                            if node and node.status != self.NODE_ONLINE:
-                                continue
-
-                            url = f'http://{si.node.ip}:{si.port}{si.endpoint}'
-                            self._ship(
-                                url, dispatch_object.payload, subinfo=(filter_, si)
-                            )
+                            self._deliver(dispatch_object, filter_, si)
             else:
                 # Check if we have single dispatch commands to run
                 single_dispatch = None
@@ -935,13 +1350,253 @@ class RootController(_HivemindAbstractObject):
                 )
 
 
-    def _ship(self, url, payload, subinfo=None) -> None:
+    def _deliver(self, dispatch_object, filter_, si) -> None:
+        """
+        Ship a single dispatch to one subscription over whichever
+        transport suits it best
+        """
+        node = self.get_node(si.node.name) # cache?
+        if node and node.status != self.NODE_ONLINE:
+            # The log (if any) will catch them up. Nothing may move
+            # it past this one until then
+            return
+
+        if not si.accepts(dispatch_object.payload):
+            # Filtered out. Nothing to acknowledge so move the log
+            # along if we're not waiting on anything else
+            self._advance_cursor(si.endpoint, dispatch_object.offset)
+            return
+
+        if not self._delivery.reserve(si.endpoint, dispatch_object):
+            return # Window is full. Goes out once there's an ack
+
+        #
+        # Being accepted isn't the same as being handled. The message
+        # stays in flight until the node acknowledges it and anything
+        # that fails here is picked up again by _redeliver()
+        #
+        ring = self._transports.get(si.node.name)
+        if ring and ring.send(si.endpoint,
+                              dispatch_object.payload,
+                              dispatch_object.offset):
+            return # Delivered through shared memory
+
+        url = f'http://{si.node.ip}:{si.port}{si.endpoint}'
+        self._ship(
+            url,
+            dispatch_object.payload,
+            subinfo=(filter_, si),
+            headers={ DELIVERY_HEADER : str(dispatch_object.offset) }
+        )
+
+
+    def _subscription_info(self, endpoint: str):
+        """
+        :return: The SubscriptionInfo registered at endpoint or None
+        """
+        with self.lock:
+            for subinfos in self._subscriptions.values():
+                for si in subinfos:
+                    if si.endpoint == endpoint:
+                        return si
+        return None
+
+
+    def _requeue(self, endpoint: str, dispatches: list) -> None:
+        """
+        Send dispatches again, to a single subscription
+        """
+        si = self._subscription_info(endpoint)
+        if si is None or not dispatches:
+            return
+
+        for d in dispatches:
+            self._response_queue.put(PrioritizedDispatch(
+                d.priority, d.name, d.node, d.payload, d.offset, si
+            ))
+
+        with self._response_condition:
+            self._response_condition.notify_all()
+
+
+    def _acknowledge(self, payload: dict) -> None:
+        """
+        A node has reported back on the deliveries it's handled
+        """
+        for endpoint, offsets in payload.get('acks', {}).items():
+            if not offsets:
+                continue
+            released = self._delivery.acknowledge(endpoint, offsets)
+            self._requeue(endpoint, released)
+            self._advance_cursor(endpoint, max(offsets))
+            self._replay(endpoint, offsets)
+
+        for endpoint, offsets in payload.get('nacks', {}).items():
+            self.log_warning(
+                f"{len(offsets)} deliveries failed for {endpoint}"
+            )
+            for dispatch in self._delivery.reject(endpoint, offsets):
+                self._give_up(endpoint, dispatch)
+
+
+    def _advance_cursor(self, endpoint: str, offset: int) -> None:
+        """
+        Move the log cursor for an endpoint as far as we can without
+        skipping anything it still owes us an answer for
+        """
+        if not self._message_log:
+            return
+
+        low = self._delivery.low_water(endpoint)
+        if low is None:
+            self._message_log.acknowledge(endpoint, offset)
+        elif low > (self._message_log.cursor(endpoint) or 0):
+            self._message_log.set_cursor(endpoint, low)
+
+
+    def _heartbeat(self, payload: dict) -> bool:
+        """
+        A node has checked in. If we'd given up on it, bring it back
+        online and catch up it's subscriptions.
+
+        :return: False if we don't know the node
+        """
+        name = payload.get('name')
+        if not name:
+            return False
+
+        self._liveness.heartbeat(name)
+
+        node = self.get_node(name)
+        if not node:
+            return False
+
+        if node.status == self.NODE_OFFLINE:
+            self.log_info(f"Node back online: {name}")
+            with self.lock:
+                with self.database.transaction:
+                    node.status = self.NODE_ONLINE
+                    self._database.save(node)
+
+            self._catch_up_node(name)
+
+        return True
+
+
+    def _catch_up_node(self, name: str) -> None:
+        """
+        A node has come online. Replay whatever it's subscriptions
+        missed in the meantime
+        """
+        with self.lock:
+            subscriptions = [
+                (filter_, si)
+                for filter_, subinfos in self._subscriptions.items()
+                for si in subinfos if si.node.name == name
+            ]
+
+        for filter_, si in subscriptions:
+            self._catch_up(filter_, si)
+
+
+    def _monitor_liveness(self) -> None:
+        """
+        Mark nodes that have stopped heartbeating as offline so
+        dispatch skips them
+        """
+        while not self._liveness_abort.wait(self._liveness.interval / 2.0):
+            for name in self._liveness.suspects():
+                node = self.get_node(name)
+                if not node or node.status != self.NODE_ONLINE:
+                    continue
+
+                self.log_warning(
+                    f"Node {name} missed it's heartbeats "
+                    f"(phi: {self._liveness.phi(name):.1f}), marking offline"
+                )
+                with self.lock:
+                    with self.database.transaction:
+                        node.status = self.NODE_OFFLINE
+                        self._database.save(node)
+
+
+    def _redeliver(self) -> None:
+        """
+        Periodically send anything that's gone unacknowledged for
+        too long
+        """
+        interval = self._delivery.ack_timeout / 4.0
+        while not self._redelivery_abort.wait(interval):
+
+            retry, dropped = self._delivery.expired()
+
+            by_endpoint = {}
+            for endpoint, dispatch in retry:
+                by_endpoint.setdefault(endpoint, []).append(dispatch)
+            for endpoint, dispatches in by_endpoint.items():
+                self._requeue(endpoint, dispatches)
+
+            for endpoint, dispatch in dropped:
+                self._give_up(endpoint, dispatch)
+
+            self._expire_cursors()
+
+
+    def _expire_cursors(self) -> None:
+        """
+        Stop holding the log for subscriptions that haven't been
+        registered in a long while
+        """
+        if not self._message_log or self._cursor_ttl is None:
+            return
+
+        with self.lock:
+            registered = {
+                si.endpoint
+                for subinfos in self._subscriptions.values()
+                for si in subinfos
+            }
+
+        for endpoint in self._message_log.expire(registered, self._cursor_ttl):
+            self.log_info(f"Dropping the message log cursor of {endpoint}")
+
+
+    def _give_up(self, endpoint: str, dispatch) -> None:
+        """
+        A delivery has used up it's attempts. Move on without it
+        """
+        self.log_error(
+            f"Giving up on delivery {dispatch.offset} to {endpoint}"
+        )
+        self._requeue(
+            endpoint, self._delivery.acknowledge(endpoint, [])
+        )
+        self._advance_cursor(endpoint, dispatch.offset)
+        self._replay(endpoint, [dispatch.offset])
+
+
+    def _ship(self, url, payload, subinfo=None, headers=None) -> bool:
         """
         Do a basic POST operation
+        :return: True if the subscriber accepted the payload
         """
         try:
-            result = requests.post(url, json=payload, verify=False)
+            if isinstance(payload, (bytes, bytearray, memoryview)):
+                # Raw payloads (\see transport.ShmRing) go as they are
+                result = requests.post(
+                    url,
+                    data=bytes(payload),
+                    headers=dict(headers or {}, **{
+                        'Content-Type' : transport.RAW_CONTENT_TYPE
+                    }),
+                    verify=False
+                )
+            else:
+                result = requests.post(
+                    url, json=payload, headers=headers, verify=False
+                )
             result.raise_for_status()
+            return True
         except Exception as e:
             #
             # TESTME:
@@ -950,19 +1605,20 @@ class RootController(_HivemindAbstractObject):
             # rather spend elsewhere but it's too much code to pragma
             # away
             #
-            do_log = False
+            do_log = subinfo is None
             with self.lock:
                 if self._done:
-                    return
+                    return False
 
-                filter_, si = subinfo
-                if filter_ in self._subscriptions:
-                    if si in self._subscriptions:
+                if subinfo:
+                    filter_, si = subinfo
+                    if filter_ is None or si in self._subscriptions.get(filter_, []):
                         do_log = True
 
             if do_log:
                 self.log_error(f"POST to {url} failed!")
                 self.log_error("  `-> " + str(e)) # ??
+            return False
 
 
     def _init_database(self) -> None:
@@ -984,23 +1640,46 @@ class RootController(_HivemindAbstractObject):
             self._database._create_table(TableDefinition)
             active_tables.append(TableDefinition.db_name())
 
-        for name, table in RequiredTables:
+        migrator = Migrator(
+            self._database,
+            **global_settings['database'].get('migrations', {})
+        )
+
+        #
+        # Build any feature requested tables along with our own. Those
+        # that already exist are brought in line with their declarations
+        #
+        tables = [table for _, table in RequiredTables]
+        for feature in self._features:
+            tables.extend(feature.tables())
 
-            if name not in active_tables:
+        for table in tables:
+            if table.db_name() not in active_tables:
                 self._database._create_table(table)
                 TableDefinition.register_table(self._database, table)
+            elif table is not TableDefinition:
+                migrator.migrate(table)
 
-            # else:
-            #     TODO
-            #     TableDefinition.validate_table(table)
 
-        #
-        # Build any feature requested tables
-        #
-        for feature in self._features:
-            for table in feature.tables():
-                if table.db_name() not in active_tables:
-                    self._database._create_table(table)
+    def _init_message_log(self) -> None:
+        """
+        If requested, open the durable message log. Without it, any
+        message that's in flight when we go down is lost.
+        :return: None
+        """
+        log_settings = global_settings.get('message_log', None)
+        if not log_settings:
+            return
+
+        location = log_settings.get('location', os.path.join(
+            global_settings['hive_root'], 'data', 'messages'
+        ))
+        self._message_log = MessageLog(
+            location,
+            segment_size=log_settings.get('segment_size', 16 * 1024 * 1024),
+            commit_interval=log_settings.get('commit_interval', 0.005)
+        )
+        self._cursor_ttl = log_settings.get('cursor_ttl', 7 * 24 * 3600.0)
 
 
     def _install_utility_endpoints(self, app: web.Application) -> None:
@@ -1009,7 +1688,8 @@ class RootController(_HivemindAbstractObject):
         with the web interface.
         """
         self._app.add_routes([
-            web.get('/api/{api_path:.*}', self._handler_class.api)
+            web.get('/api/{api_path:.*}', self._handler_class.api),
+            web.post('/api/{api_path:.*}', self._handler_class.api),
         ])
 
 
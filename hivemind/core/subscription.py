@@ -27,12 +27,18 @@ class _Subscription(_HivemindAbstractObject):
     """
     The low level unit for subscribing to a service
     """
-    def __init__(self, node, filter_, function, name=None):
+    def __init__(self, node, filter_, function, name=None, where=None):
         _HivemindAbstractObject.__init__(self, logger=node._logger)
         self._node = node
         self._filter = filter_
         self._function = function
         self._name = name or uuid.uuid4()
+        self._where = where
+
+    @property
+    def name(self):
+        return self._name
+
 
     @property
     def node(self):
@@ -49,6 +55,15 @@ class _Subscription(_HivemindAbstractObject):
         return self._function
 
 
+    @property
+    def where(self):
+        """
+        Optional payload predicate that the root evaluates before
+        sending us anything. \see hivemind.core.predicate
+        """
+        return self._where
+
+
     @property
     def endpoint(self):
         return f'/sub/{self.node.name}/{self._name}'
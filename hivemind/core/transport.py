@@ -0,0 +1,378 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+Same-host transport between the RootController and its nodes.
+
+When a subscribing node lives on the same machine as the root, there's
+no reason to pay for a loopback TCP connection and an HTTP round trip
+per message. Instead the root writes into a ``ShmRing``, a single
+producer/single consumer ring buffer living in shared memory, and rings
+a doorbell (a named pipe) so the node wakes up and drains it.
+"""
+import os
+import json
+import errno
+import select
+import struct
+import tempfile
+import threading
+
+try:
+    from multiprocessing import shared_memory
+except ImportError: # pragma: no cover
+    shared_memory = None # Python < 3.8
+
+#
+# Layout of the shared block:
+#
+#   [ head:u64 | tail:u64 | capacity:u64 | magic:u32 | pad ] [ data... ]
+#
+# head and tail are monotonically increasing byte counters. The
+# position within the data region is counter % capacity.
+#
+_HEADER = struct.Struct('<QQQI')
+_HEADER_SIZE = 64
+_MAGIC = 0x48495645 # 'HIVE'
+
+#
+# Each record is prefixed with the size of it's body, the kind
+# of payload, the length of the endpoint it's destined for and
+# the delivery id the subscriber acknowledges (-1 for none).
+#
+_RECORD = struct.Struct('<IBHq')
+_WRAP = 0xFFFFFFFF
+_ALIGN = 8
+
+KIND_JSON = 0
+KIND_RAW = 1
+
+# Raw payloads that fall back to HTTP are posted as is with this type
+RAW_CONTENT_TYPE = 'application/octet-stream'
+
+# Segments created by this process. See _attach_shared_memory()
+_OWNED_SEGMENTS = set()
+
+
+def available() -> bool:
+    """
+    :return: True if this interpreter can use the shared memory transport
+    """
+    return shared_memory is not None and hasattr(os, 'mkfifo')
+
+
+def _aligned(size: int) -> int:
+    return (size + _ALIGN - 1) & ~(_ALIGN - 1)
+
+
+def _attach_shared_memory(name: str):
+    """
+    Attach to an existing block without letting the resource tracker
+    of *this* process take ownership of it. Otherwise a node exiting
+    would unlink the segment out from under the root.
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _OWNED_SEGMENTS:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class ShmRing(object):
+    """
+    Single producer, single consumer ring buffer in shared memory.
+
+    The owner (``ShmRing.create()``) is the producer, the other end
+    (``ShmRing.attach()``) is the consumer.
+
+    .. code-block:: python
+
+        # -- Root
+        ring = ShmRing.create('hive_mynode', 4 * 1024 * 1024)
+        ring.send('/sub/mynode/ping', {'foo' : 'bar'})
+
+        # -- Node
+        ring = ShmRing.attach(**info)
+        ring.wait(0.5)
+        ring.drain(lambda endpoint, payload, delivery: ...)
+
+    Raw payloads (``bytes``, ``bytearray`` or ``memoryview``) are
+    copied once, directly into the ring, and handed to the consumer
+    as a ``memoryview`` over the shared block. That view is only valid
+    for the duration of the callback. Those the root has to post over
+    HTTP instead arrive as ``bytes``.
+    """
+    def __init__(self, shm, doorbell, owner):
+        self._shm = shm
+        self._buf = shm.buf
+        self._doorbell = doorbell
+        self._owner = owner
+        self._bell_fd = None
+        self._lock = threading.Lock()
+
+        head, tail, capacity, magic = _HEADER.unpack_from(self._buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'{shm.name} is not a hivemind ring')
+        self._capacity = capacity
+        self._data = self._buf[_HEADER_SIZE:_HEADER_SIZE + capacity]
+
+        if not owner and doorbell:
+            # O_RDWR so the pipe never reports EOF when the root
+            # hasn't got it open
+            self._bell_fd = os.open(doorbell, os.O_RDWR | os.O_NONBLOCK)
+
+
+    @classmethod
+    def create(cls, name: str, size: int) -> 'ShmRing':
+        """
+        Create a new ring (and it's doorbell) to produce into
+        :param name: Unique name of the shared memory block
+        :param size: The capacity of the data region in bytes
+        :return: ShmRing
+        """
+        if not available():
+            raise RuntimeError('Shared memory transport is not available')
+
+        size = _aligned(size)
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=_HEADER_SIZE + size
+        )
+        _OWNED_SEGMENTS.add(shm.name)
+        _HEADER.pack_into(shm.buf, 0, 0, 0, size, _MAGIC)
+
+        doorbell = os.path.join(tempfile.gettempdir(), f'{name}.bell')
+        try:
+            if os.path.exists(doorbell):
+                os.remove(doorbell)
+            os.mkfifo(doorbell)
+        except OSError:
+            doorbell = None # The consumer will just poll
+
+        return cls(shm, doorbell, owner=True)
+
+
+    @classmethod
+    def attach(cls, name: str, doorbell: str = None, **kwargs) -> 'ShmRing':
+        """
+        Attach to a ring created by another process to consume from
+        :param name: The name of the shared memory block
+        :param doorbell: Path to the named pipe we wait on
+        :return: ShmRing
+        """
+        if not available():
+            raise RuntimeError('Shared memory transport is not available')
+        return cls(_attach_shared_memory(name), doorbell, owner=False)
+
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+
+    def info(self) -> dict:
+        """
+        :return: dict that the other end can pass to ``ShmRing.attach()``
+        """
+        return {
+            'type' : 'shm',
+            'name' : self._shm.name,
+            'doorbell' : self._doorbell,
+        }
+
+    # -- Producer
+
+    def send(self, endpoint: str, payload, delivery: int = None) -> bool:
+        """
+        Write a payload destined for a given endpoint into the ring.
+
+        :param endpoint: The subscription endpoint to deliver to
+        :param payload: Any json serializable object or a bytes-like
+                        object to ship raw
+        :param delivery: The id the subscriber should acknowledge
+        :return: False if there wasn't enough room for the record. The
+                 caller should fall back to another transport.
+        """
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            kind = KIND_RAW
+            body = memoryview(payload).cast('B')
+        else:
+            kind = KIND_JSON
+            body = json.dumps(payload).encode('utf-8')
+
+        endpoint_bytes = endpoint.encode('utf-8')
+        body_size = len(endpoint_bytes) + len(body)
+        record_size = _aligned(_RECORD.size + body_size)
+
+        if record_size > self._capacity:
+            return False
+
+        data = self._data
+        capacity = self._capacity
+
+        with self._lock:
+            head, tail = struct.unpack_from('<QQ', self._buf, 0)
+            position = head % capacity
+            contiguous = capacity - position
+
+            skip = contiguous if contiguous < record_size else 0
+            if (head - tail) + skip + record_size > capacity:
+                return False # Full
+
+            if skip:
+                if skip >= _RECORD.size:
+                    struct.pack_into('<I', data, position, _WRAP)
+                head += skip
+                position = 0
+
+            _RECORD.pack_into(
+                data, position, body_size, kind, len(endpoint_bytes),
+                -1 if delivery is None else delivery
+            )
+            start = position + _RECORD.size
+            data[start:start + len(endpoint_bytes)] = endpoint_bytes
+            start += len(endpoint_bytes)
+            data[start:start + len(body)] = body
+
+            # Publish only once the record is complete
+            struct.pack_into('<Q', self._buf, 0, head + record_size)
+
+        self._ring()
+        return True
+
+
+    def _ring(self) -> None:
+        if not self._doorbell:
+            return
+
+        if self._bell_fd is None:
+            try:
+                self._bell_fd = os.open(
+                    self._doorbell, os.O_WRONLY | os.O_NONBLOCK
+                )
+            except OSError:
+                return # Nobody listening (yet)
+
+        try:
+            os.write(self._bell_fd, b'\x01')
+        except OSError as err:
+            if err.errno != errno.EAGAIN:
+                raise
+            # Pipe is full, the consumer has plenty of wakeups pending
+
+    # -- Consumer
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the producer rings the doorbell or the timeout
+        elapses.
+        :return: True if there may be records to drain
+        """
+        if self._bell_fd is None:
+            if self.pending():
+                return True
+            threading.Event().wait(timeout)
+            return self.pending()
+
+        readable, _, _ = select.select([self._bell_fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self._bell_fd, 4096):
+                    pass
+            except OSError:
+                pass # Drained
+        return self.pending()
+
+
+    def pending(self) -> bool:
+        head, tail = struct.unpack_from('<QQ', self._buf, 0)
+        return head != tail
+
+
+    def drain(self, callback) -> int:
+        """
+        Hand every available record to the callback.
+
+        :param callback: callable(endpoint:str, payload, delivery:int|None)
+                         where payload is the decoded json object or a
+                         ``memoryview`` for raw records
+        :return: The number of records consumed
+        """
+        data = self._data
+        capacity = self._capacity
+        consumed = 0
+
+        head, tail = struct.unpack_from('<QQ', self._buf, 0)
+        while tail != head:
+            position = tail % capacity
+            contiguous = capacity - position
+
+            if contiguous < _RECORD.size or \
+               struct.unpack_from('<I', data, position)[0] == _WRAP:
+                tail += contiguous
+                continue
+
+            body_size, kind, endpoint_size, delivery = _RECORD.unpack_from(
+                data, position
+            )
+            if delivery < 0:
+                delivery = None
+            start = position + _RECORD.size
+            endpoint = bytes(data[start:start + endpoint_size]).decode('utf-8')
+            start += endpoint_size
+            view = data[start:start + body_size - endpoint_size]
+
+            try:
+                if kind == KIND_JSON:
+                    callback(endpoint, json.loads(bytes(view)), delivery)
+                else:
+                    callback(endpoint, view, delivery)
+            finally:
+                view.release()
+                tail += _aligned(_RECORD.size + body_size)
+                struct.pack_into('<Q', self._buf, 8, tail)
+
+            consumed += 1
+
+        return consumed
+
+    # -- Cleanup
+
+    def close(self, unlink: bool = False) -> None:
+        """
+        Release our mapping. The owner should unlink when the other end
+        is no longer going to use it.
+        """
+        if self._bell_fd is not None:
+            os.close(self._bell_fd)
+            self._bell_fd = None
+
+        self._data.release()
+        self._buf = None
+        self._shm.close()
+
+        if unlink:
+            _OWNED_SEGMENTS.discard(self._shm.name)
+            self._shm.unlink()
+            if self._doorbell and os.path.exists(self._doorbell):
+                os.remove(self._doorbell)
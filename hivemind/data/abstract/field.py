@@ -98,10 +98,24 @@ class _Field(object, metaclass=FieldMeta):
         self._default = kwargs.get('default', None)
         self._null = kwargs.get('null', False)
         self._db_column = kwargs.get('db_column', None)
+        self._index = kwargs.get('index', False)
 
         self._table = None # Set by the table metaclass
 
 
+    def __get__(self, instance, owner):
+        """
+        Fields are non-data descriptors. Instances keep their values
+        in their own ``__dict__``, which python checks before ever
+        calling this, so reading a column costs nothing extra. We only
+        get here for the class itself (``MyTable.foo.equals(...)``)
+        or a column that was never set.
+        """
+        if instance is None:
+            return self
+        return None
+
+
     def __getattr__(self, key):
         """
         Here's another spot where python some some mad-hattery.
@@ -126,8 +140,10 @@ class _Field(object, metaclass=FieldMeta):
         """
         return {
             'base_type': self.base_type.name,
+            'column': self.db_name(),
             'pk': self.pk,
             'unique': self._unique,
+            'index': self._index,
             'has_default': self.has_default,
             'null': self._null
         }
@@ -162,6 +178,11 @@ class _Field(object, metaclass=FieldMeta):
         return self._pk
 
 
+    @property
+    def index(self) -> bool:
+        return self._index
+
+
     @classmethod
     def db_type(cls, database) -> str:
         """
@@ -22,14 +22,22 @@ SOFTWARE.
 # --
 Abstract interface for the database api
 """
-import sqlparse
+import time
+import logging
+import functools
+import contextlib
+
 from purepy import pure_virtual
 
 from .field import FieldTypes, _Field
 from .table import _TableLayout
 
-from hivemind.util.misc import PV_SimpleRegistry, cd
+from hivemind.util import global_settings
+from hivemind.util.misc import PV_SimpleRegistry, LRUCache, cd
 from hivemind.data.db import TransactionManager
+from hivemind.data.exceptions import IntegrityError
+from hivemind.data.cache import QueryCache
+from hivemind.data.trace import SqlTracer
 from hivemind.data.query import Query
 
 
@@ -48,10 +56,31 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
     # their respective items
     overloaded_operators = {}
 
+    # How many distinct query shapes we hold the SQL for
+    sql_cache_size = 256
+
+    # True if ALTER TABLE can drop and change columns in place.
+    # Otherwise migrations rebuild the table. \see hivemind.data.migrate
+    alter_columns = False
+
+    # True if every thread writes through the same connection, and
+    # reads through others, which lets their transactions share a
+    # commit. \see TransactionManager
+    shared_writer = False
+
 
     def __init__(self):
         self.__tm = TransactionManager(self)
 
+        # Query shape -> WHERE clause. \see Query.sql()
+        self.sql_cache = LRUCache(self.sql_cache_size)
+
+        # Results of reads, when enabled. \see enable_query_cache()
+        self.query_cache = None
+
+        # Statement tracing, when enabled. \see enable_tracing()
+        self.tracer = None
+
     # -- Virtual Interface
 
     @pure_virtual
@@ -71,13 +100,40 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
 
 
     @pure_virtual
-    def execute(self, query, values=None):
+    def execute(self, query, values=None, cursor=None):
         """
         Execute a query
+
+        :param cursor: Run on this cursor rather than the active
+                       transaction's (or a new one)
         """
         raise NotImplementedError()
 
 
+    def execute_many(self, query, rows):
+        """
+        Execute the same statement once for each set of values.
+        Overload where the driver can do better than a loop.
+        """
+        for values in rows:
+            self.execute(query, values)
+
+
+    def begin_write(self):
+        """
+        Called as a thread starts it's outermost transaction. Overload to
+        claim exclusive write access where the integration needs it
+        """
+        pass
+
+
+    def end_write(self):
+        """
+        Called once the outermost transaction has finished
+        """
+        pass
+
+
     @pure_virtual
     def get_db_cursor(self):
         """
@@ -86,6 +142,15 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
         raise NotImplementedError()
 
 
+    def get_iter_cursor(self, chunk_size: int):
+        """
+        Obtain the cursor that iterators read through, ``chunk_size``
+        rows at a time. Overload for one that leaves the rows on the
+        server until they're fetched.
+        """
+        return self.get_db_cursor()
+
+
     @pure_virtual
     def get_table_names(self):
         """
@@ -98,59 +163,78 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
                   table: _TableLayout,
                   sql: str,
                   values: tuple,
-                  fields: list) -> list:
+                  fields: list,
+                  suffix: str = '') -> list:
         """
         Given a set of fields (_Field | str), obtain all the values
         for any rows that match our search
-        """
-        output = []
-        table_name = table.db_name()
 
-        full_field_names = []
-        fiels_names_to_zip = []
-
-        for field in fields:
-            if isinstance(field, str):
-                full_field_names.append(f'"{table_name}"."{field}"')
-                fiels_names_to_zip.append(field)
-
-            elif isinstance(field, _Field):
-                fdb_name = table.db_column_name(field)
-                full_field_names.append(f'"{table_name}"."{fdb_name}"')
-                fiels_names_to_zip.append(
-                    f"{table.__name__}.{field.field_name}"
-                )
+        :param suffix: SQL to add after the WHERE clause (e.g. ORDER BY)
+        """
+        full_sql, names = self._values_sql(table, sql, fields)
+        full_sql += suffix
+        rows = self.fetch_rows(full_sql, values, (table.db_name(),))
+        return [dict(zip(names, row)) for row in rows]
 
-            else:
-                raise TypeError('field must be _Field or str')
 
-        full_sql = (f'SELECT {", ".join(full_field_names)} '
-                    f'FROM {table_name}')
-
-        if sql:
-            full_sql += ' WHERE ' + sql
-
-        for row in self.execute(full_sql, values):
-            output.append(dict(zip(fiels_names_to_zip, row)))
-        return output
+    def iter_values(self,
+                    table: _TableLayout,
+                    sql: str,
+                    values: tuple,
+                    fields: list,
+                    chunk_size: int = 1000,
+                    suffix: str = ''):
+        """
+        Like to_values() but rows are pulled off of the cursor
+        ``chunk_size`` at a time as they're consumed.
+        :return: Generator[dict]
+        """
+        full_sql, names = self._values_sql(table, sql, fields)
+        full_sql += suffix
+        for row in self._iter_rows(full_sql, values, chunk_size):
+            yield dict(zip(names, row))
 
 
-    def to_objects(self, table: _TableLayout, sql: str, values: tuple) -> list:
+    def to_objects(self,
+                   table: _TableLayout,
+                   sql: str,
+                   values: tuple,
+                   select_related: tuple = (),
+                   suffix: str = '') -> list:
         """
         Given a sql statement and the values that we want to
         apply to our query, execute the statement and construct
         logical objects out of the results.
-        """
-        objects = []
-        full_sql = 'SELECT * FROM ' + table.db_name()
 
-        if sql:
-            full_sql += ' WHERE ' + sql
+        :param select_related: Names of foreign keys to JOIN against
+                               and hydrate from the same row
+        :param suffix: SQL to add after the WHERE clause (e.g. ORDER BY)
+        """
+        full_sql, build = self._objects_sql(table, sql, select_related)
+        full_sql += suffix
+        tables = (table.db_name(),) + tuple(
+            table.get_field(f).related_class.db_name() for f in select_related
+        )
+        return [build(row) for row in self.fetch_rows(full_sql, values, tables)]
 
-        for row in self.execute(full_sql, values):
-            objects.append(table._create_from_values(self, row))
-        return objects
 
+    def iter_objects(self,
+                     table: _TableLayout,
+                     sql: str,
+                     values: tuple,
+                     chunk_size: int = 1000,
+                     select_related: tuple = (),
+                     suffix: str = ''):
+        """
+        Like to_objects() but rows are pulled off of the cursor
+        ``chunk_size`` at a time as they're consumed, so memory use
+        doesn't grow with the size of the result.
+        :return: Generator[_TableLayout]
+        """
+        full_sql, build = self._objects_sql(table, sql, select_related)
+        full_sql += suffix
+        for row in self._iter_rows(full_sql, values, chunk_size):
+            yield build(row)
 
     # -- SQL Operations
     #    These may be overloaded at a per-integration level
@@ -167,12 +251,101 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
         return 'ROLLBACK' + (';' if term else '')
 
 
+    def savepoint_sql(self, name: str) -> str:
+        return f'SAVEPOINT "{name}"'
+
+
+    def release_sql(self, name: str) -> str:
+        return f'RELEASE SAVEPOINT "{name}"'
+
+
+    def rollback_to_sql(self, name: str) -> str:
+        return f'ROLLBACK TO SAVEPOINT "{name}"'
+
+
+    def index_name(self, table: _TableLayout, fields: tuple) -> str:
+        """
+        :param fields: The field names of the index, in order
+        :return: The name of the index
+        """
+        columns = [table.db_column_name(f) for f in fields]
+        return f'idx_{table.db_name()}_' + '_'.join(columns)
+
+
+    def index_sql(self, table: _TableLayout, fields: tuple) -> str:
+        """
+        :param fields: The field names to index, in order
+        :return: The SQL to create an index
+        """
+        name = self.index_name(table, fields)
+        column_sql = ', '.join(f'"{table.db_column_name(f)}"' for f in fields)
+        return f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table.db_name()}" ({column_sql})'
+
+
+    def add_column_sql(self, table: _TableLayout, column: _Field) -> str:
+        """
+        :return: The SQL to add a column to an existing table
+        """
+        sql, constraints = self.definition_sql(column)
+        if constraints:
+            raise ValueError(
+                f'{column.field_name} requires a constraint, rebuild the table'
+            )
+        return f'ALTER TABLE "{table.db_name()}" ADD COLUMN {sql}'
+
+
+    def alter_column_sql(self, table: _TableLayout, column: _Field, old: dict) -> list:
+        """
+        Overload along with ``alter_columns`` where columns can be
+        changed in place
+        :param old: The layout of the column before (see _Field.db_layout)
+        :return: list of statements
+        """
+        raise NotImplementedError()
+
+
+    def drop_column_sql(self, table: _TableLayout, column_name: str) -> str:
+        return f'ALTER TABLE "{table.db_name()}" DROP COLUMN "{column_name}"'
+
+
+    def set_foreign_keys(self, enabled: bool) -> None:
+        """
+        Turn the enforcement of foreign keys on or off, to let a table
+        be swapped out from under the ones that refer to it. Overload
+        where that's possible.
+        """
+        pass
+
+
+    def explain(self, sql: str, values: tuple = ()) -> list:
+        """
+        Ask the database how it would run a statement. The statement
+        itself is not run.
+        :return: list[str] of the lines of the plan
+        """
+        rows = self.execute('EXPLAIN ' + sql, values).fetchall()
+        return [str(row[-1]) for row in rows]
+
+
+    def limit_sql(self, limit: (int, None), offset: (int, None)) -> tuple:
+        """
+        :param limit: The most rows to return or None for all of them
+        :param offset: The number of rows to skip or None
+        :return: tuple(sql:str, values:tuple)
+        """
+        if limit is None:
+            return 'LIMIT -1 OFFSET ?', (offset,)
+        if offset:
+            return 'LIMIT ? OFFSET ?', (limit, offset)
+        return 'LIMIT ?', (limit,)
+
+
     def definition_sql(self, column):
         """
         :return: The default SQL required to build a column. Overload this
                  for custom fields or select relationship fields.
         """
-        sql = f'{column.db_name()} {column.db_type(self)}' + \
+        sql = f'"{column.db_name()}" {column.db_type(self)}' + \
             (' PRIMARY KEY' if column._pk else '') + \
             (' UNIQUE' if column._unique else '') + \
             ('' if column._null else ' NOT NULL')
@@ -192,9 +365,69 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
 
         interface = cls._simple_registry[database_type]()
         interface.connect(**database_settings)
+
+        if database_settings.get('query_cache'):
+            interface.enable_query_cache(**database_settings['query_cache'])
+        if database_settings.get('trace_sql'):
+            interface.enable_tracing(**database_settings['trace_sql'])
+        elif global_settings.get('log_sql', False):
+            interface.enable_tracing(log_statements=True)
+
+        if database_settings.get('group_commit'):
+            if interface.shared_writer:
+                interface.transaction.enable_group_commit(
+                    **database_settings['group_commit']
+                )
+            else:
+                # e.g. an in-memory sqlite database, where reads go
+                # through the writer and would see a group uncommitted
+                logging.warning(
+                    f'group_commit ignored: {type(interface).__name__} '
+                    'does not share one writer between threads'
+                )
         return interface
 
 
+    def enable_query_cache(self, maxsize: int = 256, ttl: float = None) -> QueryCache:
+        """
+        Start caching the results of reads. Writes made through this
+        interface invalidate whatever they touch.
+
+        :param maxsize: The most results to hold on to
+        :param ttl: Seconds a result is good for (None for no limit)
+        :return: QueryCache
+        """
+        self.query_cache = QueryCache(maxsize, ttl)
+        return self.query_cache
+
+
+    def enable_tracing(self, **kwargs) -> SqlTracer:
+        """
+        Start recording the statements we run. Takes the arguments of
+        the SqlTracer
+        :return: SqlTracer
+        """
+        self.tracer = SqlTracer(**kwargs)
+        return self.tracer
+
+
+    def fetch_rows(self, sql: str, values: tuple, tables: tuple) -> list:
+        """
+        Run a read and return all of the rows, through the query cache
+        if it's enabled. Reads within a transaction always go to the
+        database, they may see changes nobody else can yet.
+
+        :param tables: Names of the tables the statement reads from
+        :return: list of rows
+        """
+        cache = self.query_cache
+        if cache is None or self.transaction.active:
+            return self._fetch_all(sql, values)
+        return cache.fetch(
+            sql, values, tables, lambda: self._fetch_all(sql, values)
+        )
+
+
     @property
     def transaction(self):
         """
@@ -221,9 +454,6 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
         """
         values = []
 
-        pk_column = None
-        id_ = None
-
         # - Columns will maintain their db order
         for attr, column in cls.columns():
             if attr in kwargs:
@@ -235,21 +465,112 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
             else:
                 values.append(None)
 
-            if column.pk:
-                pk_column = attr
-                # Breaks with db auto incr! What should we do?
-                id_ = values[-1]
-
-        sql = f'INSERT INTO {cls.db_name()} VALUES ('
-        for i, v in enumerate(values):
-            sql += '?' + (', ' if (i + 1) != len(values) else '')
-        sql += ');'
+        placeholders = ', '.join('?' * len(values))
+        sql = f'INSERT INTO {cls.db_name()} ({cls.column_sql()}) ' \
+              f'VALUES ({placeholders});'
         self.execute(sql, values=values)
+        self._touch(cls)
+
+        # Breaks with db auto incr! What should we do?
+        pk_field = cls.pk_field()
+        id_ = values[cls.column_index(pk_field.field_name)]
 
         # -- We need better error handling
-        return self.new_query(
-            cls, getattr(cls, pk_column).equals(id_)
-        ).objects()[0]
+        return self.new_query(cls, pk_field.equals(id_)).objects()[0]
+
+
+    def bulk_create(self, cls, rows: list) -> list:
+        """
+        Insert many rows of a table with a single statement, inside one
+        transaction. Unlike create(), nothing is read back.
+
+        .. code-block:: python
+
+            ids = database.bulk_create(NodeMeta, [
+                { 'node' : node, 'key' : 'os', 'value' : 'linux' },
+                { 'node' : node, 'key' : 'arch', 'value' : 'x86_64' },
+            ])
+
+        :param cls: _TableLayout subclass
+        :param rows: list[dict] of field values (as with create())
+        :return: list of the primary keys, in the same order as rows
+        """
+        columns = cls.columns()
+        pk_index = cls.column_index(cls.pk_field().field_name)
+
+        db_rows = []
+        for kwargs in rows:
+            values = []
+            for attr, column in columns:
+                if attr in kwargs:
+                    values.append(column.prep_for_db(kwargs[attr]))
+                elif column.has_default:
+                    values.append(column.prep_for_db(
+                        column.generate_default()
+                    ))
+                else:
+                    values.append(None)
+            db_rows.append(values)
+
+        if not db_rows:
+            return []
+
+        placeholders = ', '.join('?' * len(columns))
+        sql = f'INSERT INTO {cls.db_name()} ({cls.column_sql()}) ' \
+              f'VALUES ({placeholders});'
+
+        if self.transaction.active:
+            self.execute_many(sql, db_rows)
+        else:
+            with self.transaction:
+                self.execute_many(sql, db_rows)
+        self._touch(cls)
+
+        return [values[pk_index] for values in db_rows]
+
+
+    def update_where(self,
+                     table: _TableLayout,
+                     sql: str,
+                     values: tuple,
+                     fields: dict) -> int:
+        """
+        Set fields on every row that matches a filter in one statement
+        :param fields: dict[field_name:str, value:Any]
+        :return: The number of rows changed
+        """
+        if not fields:
+            return 0
+
+        set_sql = []
+        set_values = []
+        for field_name, value in fields.items():
+            field = table.get_field(field_name)
+            set_sql.append(f'"{table.db_column_name(field_name)}" = ?')
+            set_values.append(field.prep_for_db(value))
+
+        full_sql = f'UPDATE "{table.db_name()}" SET {", ".join(set_sql)}'
+        if sql:
+            full_sql += ' WHERE ' + sql
+
+        count = self.execute(
+            full_sql, tuple(set_values) + tuple(values)
+        ).rowcount
+        self._touch(table)
+        return count
+
+
+    def delete_where(self, table: _TableLayout, sql: str, values: tuple) -> int:
+        """
+        Remove every row that matches a filter in one statement
+        :return: The number of rows removed
+        """
+        full_sql = f'DELETE FROM "{table.db_name()}"'
+        if sql:
+            full_sql += ' WHERE ' + sql
+        count = self.execute(full_sql, values).rowcount
+        self._touch(None) # Deletes may cascade
+        return count
 
 
     def get_or_create(self, cls, **kwargs) -> tuple:
@@ -276,36 +597,46 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
 
         sql = f'DELETE FROM "{table_name}" WHERE "{pk_column}" = ?'
         self.execute(sql, values=(instance.pk_value,))
+        self._touch(None) # Deletes may cascade
 
 
     def save(self, instance):
         """
         Based on the changes to the instance, we save the respective values.
+        Only the fields that have changed since it was loaded are written
+        and if nothing has, the database isn't touched at all.
+        :raises IntegrityError: If the primary key was changed. We
+                                can't know which row to update
         """
+        dirty = instance.dirty_fields()
+        if not dirty:
+            return
+
         table_name = instance.db_name()
         pk_column = instance.pk()
-        pk_field = instance.pk_field()
 
-        db_instance = self.new_query(
-            instance.__class__,
-            **{pk_field.field_name : instance.pk_value}
-        ).get()
+        if instance._pk_name in dirty:
+            raise IntegrityError(
+                f'Cannot change the primary key of {table_name} with save()'
+            )
 
         fields_to_update = []
         values = []
         for attr, column in instance.columns():
-            db_value = getattr(db_instance, attr)
-            this_value = getattr(instance, attr)
+            if attr not in dirty:
+                continue
+            fields_to_update.append(f'"{column.db_name()}" = ?')
+            values.append(column.prep_for_db(getattr(instance, attr)))
 
-            if db_value != this_value:
-                fields_to_update.append(f'"{column.db_name()}" = ?')
-                values.append(column.prep_for_db(this_value))
+        if fields_to_update:
+            set_sql = ', '.join(fields_to_update)
+            values.append(instance.pk_value)
 
-        set_sql = ', '.join(fields_to_update)
-        values.append(instance.pk_value)
+            sql = f'UPDATE "{table_name}" SET {set_sql} WHERE "{pk_column}" = ?'
+            self.execute(sql, values=tuple(values))
+            self._touch(type(instance))
 
-        sql = f'UPDATE "{table_name}" SET {set_sql} WHERE "{pk_column}" = ?'
-        self.execute(sql, values=tuple(values))
+        instance.mark_clean()
 
 
     def new_query(self, cls: _TableLayout, *filters, **eq_filters) -> Query:
@@ -320,14 +651,197 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
 
     # -- Private Interface
 
-    def _create_table(self, table_layout: _TableLayout) -> None:
+    def _touch(self, table: (_TableLayout, None)) -> None:
+        """
+        We've written to a table. Anything cached from it is stale now
+        and again once the transaction is over, in case another thread
+        read it in the meantime.
+        :param table: The table or None if we can't be sure which
+        """
+        cache = self.query_cache
+        if cache is None:
+            return
+        tables = None if table is None else (table.db_name(),)
+        cache.invalidate(tables)
+        if self.transaction.active:
+            self.transaction.after(functools.partial(cache.invalidate, tables))
+
+    def _values_sql(self, table: _TableLayout, sql: str, fields: list) -> tuple:
+        """
+        :return: tuple(full_sql:str, names:list[str]) where names are
+                 the keys for each column in the result
+        """
+        table_name = table.db_name()
+
+        full_field_names = []
+        fiels_names_to_zip = []
+
+        for field in fields:
+            if isinstance(field, str):
+                full_field_names.append(f'"{table_name}"."{field}"')
+                fiels_names_to_zip.append(field)
+
+            elif isinstance(field, _Field):
+                fdb_name = table.db_column_name(field)
+                full_field_names.append(f'"{table_name}"."{fdb_name}"')
+                fiels_names_to_zip.append(
+                    f"{table.__name__}.{field.field_name}"
+                )
+
+            else:
+                raise TypeError('field must be _Field or str')
+
+        full_sql = (f'SELECT {", ".join(full_field_names)} '
+                    f'FROM {table_name}')
+
+        if sql:
+            full_sql += ' WHERE ' + sql
+
+        return full_sql, fiels_names_to_zip
+
+
+    def _objects_sql(self,
+                     table: _TableLayout,
+                     sql: str,
+                     select_related: tuple) -> tuple:
+        """
+        :return: tuple(full_sql:str, build:callable(row) -> _TableLayout)
+        """
+        if not select_related:
+            full_sql = f'SELECT {table.column_sql()} FROM ' + table.db_name()
+            if sql:
+                full_sql += ' WHERE ' + sql
+            return full_sql, functools.partial(table._create_from_values, self)
+
+        #
+        # Related tables are brought along by LEFT JOIN. Each row is the
+        # columns of our table followed by those of each related table,
+        # in order.
+        #
+        table_name = table.db_name()
+        selects = [table.column_sql(table_name)]
+        joins = []
+
+        # tuple(field_name, related_class, row_start, row_end, pk_index)
+        layout = []
+        position = len(table.columns())
+
+        for field_name in select_related:
+            related = table.get_field(field_name).related_class
+            alias = f'_rel_{field_name}'
+
+            selects.append(related.column_sql(alias))
+            joins.append(
+                f'LEFT JOIN "{related.db_name()}" AS "{alias}" ON '
+                f'"{table_name}"."{table.db_column_name(field_name)}" = '
+                f'"{alias}"."{related.pk()}"'
+            )
+
+            end = position + len(related.columns())
+            layout.append((
+                field_name,
+                related,
+                position,
+                end,
+                position + related.column_index(related.pk_field().field_name)
+            ))
+            position = end
+
+        full_sql = f'SELECT {", ".join(selects)} FROM "{table_name}" ' + \
+            ' '.join(joins)
+
+        if sql:
+            full_sql += ' WHERE ' + sql
+
+        main_end = len(table.columns())
+
+        def _build(row):
+            instance = table._create_from_values(self, row[:main_end])
+            for field_name, related, start, end, pk_index in layout:
+                if row[pk_index] is None:
+                    continue # Null FK
+                instance.__dict__[field_name] = related._create_from_values(
+                    self, row[start:end]
+                )
+            return instance
+
+        return full_sql, _build
+
+
+    def _fetch_all(self, sql: str, values: tuple) -> list:
+        """
+        Run a read and fetch every row. A read may only do it's work as
+        the rows are fetched so it's traced as one, rather than the
+        execute() alone
+        """
+        tracer = self.tracer
+        if tracer is None:
+            return self.execute(sql, values).fetchall()
+
+        started = tracer.start()
+        try:
+            with tracer.paused():
+                return self.execute(sql, values).fetchall()
+        finally:
+            if started is not None:
+                tracer.finish(sql, len(values), started)
+
+
+    def _iter_rows(self, full_sql: str, values: tuple, chunk_size: int):
+        """
+        Run a statement on it's own cursor and hand back rows in
+        batches of chunk_size. Other statements (e.g. lazy foreign
+        keys) are free to run while we're partway through.
+        """
+        for rows in self._iter_chunks(full_sql, values, chunk_size):
+            yield from rows
+
+
+    def _iter_chunks(self, full_sql: str, values: tuple, chunk_size: int):
+        """
+        Like _iter_rows() but hand back each batch as the list the
+        cursor gave us
+        :return: Generator[list[tuple]]
+        """
+        tracer = self.tracer
+        started = tracer.start() if tracer is not None else None
+
+        # Traced from the execute() through the last fetch, less the
+        # time spent with our caller in between
+        with tracer.paused() if tracer is not None else contextlib.nullcontext():
+            cursor = self.execute(
+                full_sql, values, cursor=self.get_iter_cursor(chunk_size)
+            )
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if started is None:
+                    yield rows
+                    continue
+                handed_off = time.perf_counter()
+                yield rows
+                started += time.perf_counter() - handed_off
+        finally:
+            cursor.close()
+            if started is not None:
+                tracer.finish(full_sql, len(values), started)
+
+
+    def _create_table(self,
+                      table_layout: _TableLayout,
+                      name: str = None,
+                      indexes: bool = True) -> None:
         """
         Create a table in our database. Raise an error if it already
         exists.
         :param table_layout: TableLayout subclass
+        :param name: Create it under this name rather than it's own
+        :param indexes: Create the indexes it declares too
         :return: None
         """
-        sql = f'CREATE TABLE {table_layout.db_name()} ('
+        sql = f'CREATE TABLE "{name or table_layout.db_name()}" ('
 
         columns = table_layout.columns()
         column_sql = []
@@ -341,7 +855,10 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
             all_constraints.extend(constraints)
 
         for constrain_together_fields in table_layout.unqiue_constraints():
-            field_names = [table_layout.get_field(f).db_name() for f in constrain_together_fields]
+            field_names = [
+                f'"{table_layout.get_field(f).db_name()}"'
+                for f in constrain_together_fields
+            ]
             all_constraints.append(f'UNIQUE({", ".join(field_names)})')
 
         sql += ', '.join(column_sql)
@@ -351,10 +868,17 @@ class _DatabaseIntegration(metaclass=PV_SimpleRegistry):
 
         sql += ')'
 
-        # import sqlparse
-        # statements = sqlparse.split(sql)
-        # print ('-- sql')
-        # for statement in statements:
-        #     print (sqlparse.format(statement, reindent=True, keyword_case='upper'))
-
         self.execute(sql)
+        if indexes:
+            self._create_indexes(table_layout)
+
+
+    def _create_indexes(self, table_layout: _TableLayout) -> None:
+        """
+        Create any indexes the table declares that don't exist yet. Safe
+        to call on tables that are already around.
+        :param table_layout: TableLayout subclass
+        :return: None
+        """
+        for fields in table_layout.index_definitions():
+            self.execute(self.index_sql(table_layout, fields))
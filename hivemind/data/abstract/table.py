@@ -20,6 +20,9 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import json
+from datetime import datetime
+
 from .field import _Field, FieldTypes
 from typing import Any
 
@@ -27,6 +30,13 @@ from typing import Any
 from hivemind.data import fields
 from hivemind.util import misc
 
+def _json_text(value) -> str:
+    """
+    Stable text of a JSON value for change detection
+    """
+    return json.dumps(value, sort_keys=True, default=str)
+
+
 class _TableMeta(type):
     """
     Metaclass for the _TableLayout that helps reserve fields on the class
@@ -69,6 +79,72 @@ class _TableMeta(type):
             cls._internal_fields['id'] = cls.id
             cls.id.field_name = 'id'
             cls.id._table = cls
+            primary_key_field = cls.id
+
+        cls._freeze_layout(primary_key_field)
+
+
+    def _freeze_layout(cls, primary_key_field: _Field) -> None:
+        """
+        Everything about the layout that the data layer asks for per
+        row (or per query) is worked out once, here, rather than on
+        every call.
+        """
+        if hasattr(cls, 'db_table'):
+            cls._db_name = cls.db_table
+        else:
+            cls._db_name = misc.to_camel_case(cls.__name__)
+
+        cls._columns = tuple(
+            (name, cls._internal_fields[name])
+            for name in cls._internal_field_order
+        )
+
+        # python name -> column name in the database
+        cls._db_column_names = {
+            name : field._db_column or misc.to_camel_case(name)
+            for name, field in cls._columns
+        }
+
+        # python name -> position in a row selected by column_sql()
+        cls._column_index = {
+            name : i for i, (name, _) in enumerate(cls._columns)
+        }
+
+        # Rows are read and written by column name. The table itself
+        # may have them in another order (e.g. after ADD COLUMN)
+        cls._column_list = ', '.join(
+            f'"{cls._db_column_names[name]}"' for name, _ in cls._columns
+        )
+
+        cls._pk_field = primary_key_field
+        cls._pk_name = primary_key_field.field_name
+        cls._pk_column = cls._db_column_names[primary_key_field.field_name]
+
+        cls._fk_names = frozenset(
+            name for name, field in cls._columns
+            if field.base_type == FieldTypes.FK
+        )
+        cls._fk_columns = tuple(
+            (name, field) for name, field in cls._columns
+            if name in cls._fk_names
+        )
+
+        # What _create_from_values() needs to build an instance
+        cls._field_names = tuple(name for name, _ in cls._columns)
+        cls._field_set = frozenset(cls._field_names)
+        cls._id_index = None
+        if isinstance(primary_key_field, _Field.IdField):
+            cls._id_index = cls._column_index[primary_key_field.field_name]
+        cls._fk_pk_names = tuple(
+            (name, f'{name}_pk') for name, _ in cls._fk_columns
+        )
+
+        # JSON values can change in place without us seeing a setattr
+        cls._json_names = tuple(
+            name for name, field in cls._columns
+            if field.base_type == FieldTypes.JSON
+        )
 
 
 class _TableLayout(object, metaclass=_TableMeta):
@@ -92,30 +168,17 @@ class _TableLayout(object, metaclass=_TableMeta):
         return self.pk_value == other.pk_value
 
 
-    def __getattribute__(self, key):
+    def __setattr__(self, key, value):
         """
-        Before you say anything, this is intensional. We have to be extra
-        crafty when pulling down relationships
+        Note which fields change so save() only writes those
         """
-        if key == '_internal_fields' or key not in self._internal_fields:
-            return super().__getattribute__(key)
-
-        if self._internal_fields[key].base_type == FieldTypes.FK:
-
-            # Go get the thing
-            value = super().__getattribute__(key)
-            if isinstance(value, _TableLayout) or value is None:
-                return value
+        super().__setattr__(key, value)
+        if key in self._field_set:
+            dirty = self.__dict__.get('_dirty')
+            if dirty is None:
+                self.__dict__['_dirty'] = { key }
             else:
-                field = self._internal_fields[key]
-                value = self._database.new_query(
-                    field.related_class,
-                    **{field.related_class.pk(): value}
-                ).get()
-                setattr(self, key, value)
-                return value
-
-        return super().__getattribute__(key)
+                dirty.add(key)
 
 
     @classmethod
@@ -126,15 +189,14 @@ class _TableLayout(object, metaclass=_TableMeta):
         """
         return {
             'name' : cls.db_name(),
-            'fields' : [[n, cls._internal_fields[n].db_layout()] for n in cls._internal_field_order]
+            'fields' : [[n, cls._internal_fields[n].db_layout()] for n in cls._internal_field_order],
+            'indexes' : [list(fields) for fields in cls.index_definitions()]
         }
 
 
     @classmethod
     def db_name(cls) -> str:
-        if hasattr(cls, 'db_table'):
-            return cls.db_table
-        return misc.to_camel_case(cls.__name__)
+        return cls._db_name
 
 
     @classmethod
@@ -146,40 +208,66 @@ class _TableLayout(object, metaclass=_TableMeta):
         if isinstance(field, str):
             field_name = field
         elif isinstance(field, _Field):
+            if field._table is cls:
+                return cls._db_column_names[field.field_name]
             field_name = field.db_name()
         else:
             raise TypeError(
                 f'Cannot convert {type(field)} to column name'
             )
 
-        return misc.to_camel_case(field_name)
+        try:
+            return cls._db_column_names[field_name]
+        except KeyError:
+            return misc.to_camel_case(field_name)
 
 
     @classmethod
-    def columns(cls) -> list:
+    def columns(cls) -> tuple:
         """
-        :return: list[str, _Field]
+        :return: tuple[tuple(str, _Field)] in the order they're declared
         """
-        output = []
-        for name in cls._internal_field_order:
-            output.append([name, cls._internal_fields[name]])
-        return output
+        return cls._columns
+
+
+    @classmethod
+    def column_sql(cls, alias: str = None) -> str:
+        """
+        :param alias: The name the table goes by in the statement, if
+                      the columns need to be qualified
+        :return: Our columns, in order, for a SELECT or INSERT
+        """
+        if alias is None:
+            return cls._column_list
+        return ', '.join(
+            f'"{alias}"."{cls._db_column_names[name]}"' for name, _ in cls._columns
+        )
+
+
+    @classmethod
+    def column_index(cls, field_name: str) -> int:
+        """
+        :return: The position of a field within a full row
+        """
+        return cls._column_index[field_name]
+
+
+    @classmethod
+    def fk_columns(cls) -> tuple:
+        """
+        :return: tuple[tuple(str, _Field)] of the foreign keys
+        """
+        return cls._fk_columns
 
 
     @classmethod
     def pk(cls) -> str:
-        f = cls.pk_field()
-        if f:
-            return cls.db_column_name(f.field_name)
-        return None
+        return cls._pk_column
 
 
     @classmethod
     def pk_field(cls) -> _Field:
-        for name, field in cls._internal_fields.items():
-            if field.pk:
-                return field
-        return None
+        return cls._pk_field
 
 
     @property
@@ -187,8 +275,51 @@ class _TableLayout(object, metaclass=_TableMeta):
         """
         :return: The value of the primary key, whatever it might be
         """
-        field = self.pk_field()
-        return getattr(self, field.field_name)
+        return getattr(self, self._pk_name)
+
+
+    @property
+    def created_on(self) -> datetime:
+        """
+        :return: When this row was created, decoded from it's id. Only
+                 available on tables with an IdField primary key
+        """
+        created_on = self.__dict__.get('_created_on')
+        if created_on is None:
+            if self._id_index is None:
+                raise AttributeError(
+                    f'{self.__class__.__name__} has no created_on'
+                )
+            created_on = _Field.IdField.to_datetime(self.pk_value)
+            self.__dict__['_created_on'] = created_on
+        return created_on
+
+
+    def dirty_fields(self) -> set:
+        """
+        :return: set[str] of the fields that have changed since this
+                 instance was loaded or last saved
+        """
+        dirty = set(self.__dict__.get('_dirty', ()))
+
+        snapshot = self.__dict__.get('_json_snapshot')
+        if snapshot:
+            for name, text in snapshot.items():
+                if name not in dirty and _json_text(self.__dict__.get(name)) != text:
+                    dirty.add(name)
+        return dirty
+
+
+    def mark_clean(self) -> None:
+        """
+        Forget any changes. Called once they're in the database
+        """
+        self.__dict__.pop('_dirty', None)
+        if self._json_names:
+            self.__dict__['_json_snapshot'] = {
+                name : _json_text(self.__dict__.get(name))
+                for name in self._json_names
+            }
 
 
     @classmethod
@@ -204,24 +335,24 @@ class _TableLayout(object, metaclass=_TableMeta):
     @classmethod
     def _create_from_values(cls, database, values):
         """
-        Temporary crutch to build an item from values coming from
-        the database
-        """
-        new_instance = cls(database)
+        Build an item from a row coming from the database.
 
-        for i, name in enumerate(cls._internal_field_order):
-            field = cls._internal_fields[name]
-
-            if isinstance(field, _Field.IdField) and field.pk:
-                # Make a created_on field
-                setattr(new_instance,
-                        'created_on',
-                        _Field.IdField.to_datetime(values[i]))
+        This is the hot path for large result sets, so we skip __init__
+        and fill the instance __dict__ in one go. Foreign keys hold
+        their primary key until they're first accessed.
+        """
+        new_instance = cls.__new__(cls)
+        state = new_instance.__dict__
+        state['_database'] = database
+        state.update(zip(cls._field_names, values))
 
-            setattr(new_instance, name, values[i])
+        for name, pk_name in cls._fk_pk_names:
+            state[pk_name] = state[name]
 
-            if field.base_type == FieldTypes.FK:
-                setattr(new_instance, f'{name}_pk', values[i])
+        if cls._json_names:
+            state['_json_snapshot'] = {
+                name : _json_text(state[name]) for name in cls._json_names
+            }
 
         return new_instance
 
@@ -234,3 +365,44 @@ class _TableLayout(object, metaclass=_TableMeta):
         :return: tuple(tuple(str),)
         """
         return tuple()
+
+
+    @classmethod
+    def indexes(cls) -> tuple:
+        """
+        Return any (composite) indexes for fields by overloading
+        this. Single columns may use ``index=True`` on the field.
+
+        .. code-block:: python
+
+            class Reading(_TableLayout):
+                sensor = _Field.TextField(index=True)
+                taken = _Field.DatetimeField()
+
+                @classmethod
+                def indexes(cls):
+                    return (('sensor', 'taken'),)
+
+        :return: tuple(tuple(str),)
+        """
+        return tuple()
+
+
+    @classmethod
+    def index_definitions(cls) -> tuple:
+        """
+        :return: tuple(tuple(str),) of every index this table wants,
+                 single column ones first
+        """
+        output = []
+        for name, field in cls._columns:
+            if field.index and not (field.pk or field._unique):
+                output.append((name,))
+
+        for fields in cls.indexes():
+            fields = tuple(fields)
+            for field_name in fields:
+                cls.get_field(field_name) # Raise early on a typo
+            if fields not in output:
+                output.append(fields)
+        return tuple(output)
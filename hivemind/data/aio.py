@@ -0,0 +1,230 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+Asyncio facade over a ``_DatabaseIntegration``.
+
+The data layer is synchronous. Calling it from an aiohttp handler holds
+up every other request on the loop until the statement is done. The
+``AsyncDatabase`` runs that work on a small, dedicated thread pool
+instead so handlers can simply ``await`` it.
+
+.. code-block:: python
+
+    adb = AsyncDatabase(database)
+
+    nodes = await adb.query(NodeRegister, status='online').objects()
+    node = await adb.create(NodeRegister, name='foo', status='pending')
+
+    # Transactions are bound to a thread. Run the whole unit of work
+    # on one of ours
+    await adb.atomic(self._register_node, payload)
+"""
+import asyncio
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .query import Query
+
+
+class AsyncQuery(object):
+    """
+    Awaitable counterpart of ``Query``. Building the query happens
+    right away, running it happens on the database executor.
+    """
+    def __init__(self, adb, query: Query):
+        self._adb = adb
+        self._query = query
+
+
+    @property
+    def query(self) -> Query:
+        """
+        :return: The underlying synchronous ``Query``
+        """
+        return self._query
+
+
+    def filter(self, *args, **kwargs) -> 'AsyncQuery':
+        return AsyncQuery(self._adb, self._query.filter(*args, **kwargs))
+
+
+    def select_related(self, *fields) -> 'AsyncQuery':
+        return AsyncQuery(self._adb, self._query.select_related(*fields))
+
+
+    def prefetch_related(self, *fields) -> 'AsyncQuery':
+        return AsyncQuery(self._adb, self._query.prefetch_related(*fields))
+
+
+    def order_by(self, *fields) -> 'AsyncQuery':
+        return AsyncQuery(self._adb, self._query.order_by(*fields))
+
+
+    def limit(self, count: int) -> 'AsyncQuery':
+        return AsyncQuery(self._adb, self._query.limit(count))
+
+
+    def offset(self, count: int) -> 'AsyncQuery':
+        return AsyncQuery(self._adb, self._query.offset(count))
+
+
+    def after(self, value) -> 'AsyncQuery':
+        return AsyncQuery(self._adb, self._query.after(value))
+
+
+    def annotate(self, **aggregates) -> 'AsyncQuery':
+        return AsyncQuery(self._adb, self._query.annotate(**aggregates))
+
+    # -- Execution
+
+    async def objects(self) -> list:
+        return await self._adb.run(self._query.objects)
+
+
+    async def values(self, *fields) -> list:
+        return await self._adb.run(self._query.values, *fields)
+
+
+    async def values_list(self, field) -> list:
+        return await self._adb.run(self._query.values_list, field)
+
+
+    async def to_columns(self, *fields, **kwargs) -> dict:
+        return await self._adb.run(self._query.to_columns, *fields, **kwargs)
+
+
+    async def explain(self, *fields) -> list:
+        return await self._adb.run(self._query.explain, *fields)
+
+
+    async def aggregate(self, **aggregates) -> dict:
+        return await self._adb.run(self._query.aggregate, **aggregates)
+
+
+    async def get(self):
+        return await self._adb.run(self._query.get)
+
+
+    async def get_or_null(self):
+        return await self._adb.run(self._query.get_or_null)
+
+
+    async def count(self) -> int:
+        return await self._adb.run(self._query.count)
+
+
+    async def update(self, **fields) -> int:
+        return await self._adb.run(self._query.update, **fields)
+
+
+    async def delete(self) -> int:
+        return await self._adb.run(self._query.delete)
+
+
+class AsyncDatabase(object):
+    """
+    Runs the statements of a ``_DatabaseIntegration`` on a dedicated
+    executor.
+
+    :param database: The integration to wrap
+    :param max_workers: Size of the thread pool. With sqlite, reads run
+                        in parallel while writes queue up for the
+                        single writer
+    :param executor: Use this executor rather than creating one
+    """
+    def __init__(self, database, max_workers: int = 4, executor=None):
+        self._database = database
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='hive_db'
+        )
+
+
+    @property
+    def database(self):
+        return self._database
+
+
+    @property
+    def executor(self):
+        return self._executor
+
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Call func(*args, **kwargs) on the database executor
+        :return: Whatever func returns
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+
+    async def atomic(self, func, *args, **kwargs):
+        """
+        Call func within a single transaction on the database executor
+        :return: Whatever func returns
+        """
+        def _in_transaction():
+            with self._database.transaction:
+                return func(*args, **kwargs)
+        return await self.run(_in_transaction)
+
+
+    def query(self, cls, *filters, **eq_filters) -> AsyncQuery:
+        """
+        :return: ``AsyncQuery`` over the given table
+        """
+        return AsyncQuery(
+            self, self._database.new_query(cls, *filters, **eq_filters)
+        )
+
+
+    async def create(self, cls, **kwargs):
+        return await self.run(self._database.create, cls, **kwargs)
+
+
+    async def bulk_create(self, cls, rows: list) -> list:
+        return await self.run(self._database.bulk_create, cls, rows)
+
+
+    async def get_or_create(self, cls, **kwargs) -> tuple:
+        return await self.run(self._database.get_or_create, cls, **kwargs)
+
+
+    async def save(self, instance) -> None:
+        return await self.run(self._database.save, instance)
+
+
+    async def delete(self, instance) -> None:
+        return await self.run(self._database.delete, instance)
+
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop our executor. A shared executor is left to it's owner
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,131 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+Read-through cache of query results.
+
+Rows are cached by the SQL that produced them and the values bound to
+it. Every entry remembers which tables it was read from and the
+*generation* of each at the time. Writing to a table bumps it's
+generation, which makes anything read from it before then stale at
+once, without having to hunt the entries down.
+
+Only the writes that go through the data layer (``create()``,
+``save()``, ``Query.update()``...) are seen. Entries may also be given
+a time to live to bound how stale they can get otherwise.
+"""
+import copy
+import time
+import threading
+
+from hivemind.util.misc import LRUCache
+
+
+class QueryCache(object):
+    """
+    :param maxsize: The most results we hold on to
+    :param ttl: Seconds a result is good for. None to keep it until
+                it's invalidated or pushed out
+    """
+    def __init__(self, maxsize: int = 256, ttl: float = None):
+        self._entries = LRUCache(maxsize)
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+        # table name -> generation
+        self._generations = {}
+
+        # Bumped when we can't tell which tables changed
+        self._epoch = 0
+
+        self.hits = 0
+        self.misses = 0
+
+
+    def fetch(self, sql: str, values: tuple, tables: tuple, loader) -> list:
+        """
+        Rows for a statement, from the cache if we can.
+
+        :param sql: The statement
+        :param values: The values bound to it
+        :param tables: Names of the tables the result is read from
+        :param loader: callable() -> list of rows when we have to run it
+        :return: list of rows
+        """
+        try:
+            key = (sql, tuple(values))
+            hash(key)
+        except TypeError:
+            return loader() # Nothing we can key on
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            rows, expires, stamp, mutable = entry
+            if (expires is None or expires > time.monotonic()) \
+               and stamp == self._stamp(tables):
+                self.hits += 1
+                return copy.deepcopy(rows) if mutable else rows
+            self._entries.pop(key)
+
+        self.misses += 1
+
+        # Taken before we run the statement. A write that lands while
+        # we do leaves this entry stale on arrival
+        stamp = self._stamp(tables)
+        rows = loader()
+
+        expires = None
+        if self._ttl is not None:
+            expires = time.monotonic() + self._ttl
+
+        # Decoded json comes back as dicts and lists. Callers get their
+        # own copy of those so they can't change what we hold
+        mutable = any(
+            isinstance(value, (dict, list)) for row in rows for value in row
+        )
+        self._entries.put(key, (rows, expires, stamp, mutable))
+        return copy.deepcopy(rows) if mutable else rows
+
+
+    def invalidate(self, tables: (list, None) = None) -> None:
+        """
+        Anything read from these tables is now stale
+        :param tables: Table names or None for every table
+        """
+        with self._lock:
+            if tables is None:
+                self._epoch += 1
+                return
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def _stamp(self, tables: tuple) -> tuple:
+        generations = self._generations
+        return (self._epoch,) + tuple(generations.get(t, 0) for t in tables)
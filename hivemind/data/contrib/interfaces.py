@@ -23,4 +23,5 @@ SOFTWARE.
 Where we import any of our interfaces
 """
 
-from . import sqlite_interface
\ No newline at end of file
+from . import sqlite_interface
+from . import postgres_interface
\ No newline at end of file
@@ -0,0 +1,469 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+PostgreSQL integration.
+
+Requires ``psycopg2`` (or ``psycopg2-binary``). Select it with:
+
+.. code-block:: python
+
+    DATABASE = {
+        "type" : "postgres",
+        "name" : "hivemind",
+        "host" : "localhost",
+        "user" : "hive",
+        "max_connections" : 20,
+    }
+
+A ``"dsn"`` may be given instead of (or along side) the individual
+connection arguments.
+"""
+import itertools
+import threading
+import contextlib
+
+from purepy import override
+
+try:
+    import psycopg2
+    import psycopg2.pool
+    import psycopg2.extras
+except ImportError: # pragma: no cover
+    psycopg2 = None
+
+from hivemind.data.abstract.field import FieldTypes
+from hivemind.data.abstract.scafold import _DatabaseIntegration
+from hivemind.data.exceptions import (
+    DatabaseError, IntegrityError, OperationalError, MigrationError
+)
+from hivemind.util.misc import LRUCache
+
+# Connection arguments we pass through to psycopg2 from the settings
+_CONNECT_KEYS = ('host', 'port', 'user', 'password', 'sslmode', 'connect_timeout')
+
+
+def available() -> bool:
+    """
+    :return: True if the postgres integration can be used
+    """
+    return psycopg2 is not None
+
+
+def to_pyformat(query: str) -> str:
+    """
+    The data layer writes SQL with qmark (``?``) placeholders. psycopg2
+    expects pyformat (``%s``) so swap them, leaving quoted identifiers
+    and literals alone, and escape any literal ``%``.
+
+    :param query: SQL with qmark placeholders
+    :return: str
+    """
+    output = []
+    quote = None
+    for char in query:
+        if char == '%':
+            output.append('%%')
+            continue
+
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char == '?':
+            output.append('%s')
+            continue
+
+        output.append(char)
+    return ''.join(output)
+
+
+class _ConnectionPool(object):
+    """
+    A bounded pool of connections. Each thread that talks to the
+    database leases one and keeps it until it's released, so a
+    transaction always runs on a single connection. The interface
+    hands it back after every statement outside of a transaction and
+    as the outermost transaction ends.
+    """
+    def __init__(self, minconn: int, maxconn: int, **connect_kwargs):
+        self._pool = psycopg2.pool.ThreadedConnectionPool(
+            minconn, maxconn, **connect_kwargs
+        )
+        self._local = threading.local()
+
+
+    def connection(self):
+        """
+        :return: The connection leased to this thread
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or connection.closed:
+            connection = self._pool.getconn(key=threading.get_ident())
+
+            # We control the transactions ourselves
+            connection.autocommit = True
+            self._local.connection = connection
+        return connection
+
+
+    def release(self) -> None:
+        """
+        Hand this thread's connection back to the pool
+        """
+        if getattr(self._local, 'pins', 0):
+            return # A server side cursor is still reading from it
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            self._pool.putconn(connection, key=threading.get_ident())
+
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """
+        Keep this thread's lease, whatever else is run, until we're
+        done with it
+        """
+        self._local.pins = getattr(self._local, 'pins', 0) + 1
+        try:
+            yield self.connection()
+        finally:
+            self._local.pins -= 1
+
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+class PostgresInterface(_DatabaseIntegration):
+    """
+    PostgreSQL interface, for data that has to outlive the root and be
+    shared between them.
+    """
+    name = 'postgres'
+
+    # Migrations ALTER in place rather than rebuilding tables
+    alter_columns = True
+
+    mapped_types = {
+
+        # -- Numeric
+        FieldTypes.TINYINT : ('SMALLINT',),
+        FieldTypes.SMALLINT : ('SMALLINT',),
+        FieldTypes.INT : ('INTEGER',),
+        FieldTypes.BIGINT : ('BIGINT',),
+        FieldTypes.DECIMAL: ('NUMERIC',),
+        FieldTypes.FLOAT: ('DOUBLE PRECISION',),
+        FieldTypes.REAL: ('REAL',),
+
+        # -- DATETIME
+        FieldTypes.DATE: ('DATE',),
+        FieldTypes.TIME: ('TEXT',), # ?? Needs work
+        FieldTypes.DATETIME: ('TIMESTAMP WITH TIME ZONE',),
+
+        # -- Characters
+        FieldTypes.VARCHAR: ('TEXT',),
+        FieldTypes.TEXT: ('TEXT',),
+
+        # -- Blob
+        FieldTypes.BINARY: ('BYTEA',),
+
+        # psycopg2 decodes jsonb for us on the way out
+        FieldTypes.JSON: ('JSONB',),
+    }
+
+    def __init__(self):
+        _DatabaseIntegration.__init__(self)
+        self.__pool = None
+
+        # qmark SQL -> pyformat SQL. Our statements are stable per
+        # query shape so this stays small
+        self._translated = LRUCache(self.sql_cache_size)
+
+        # Names for server side cursors. \see get_iter_cursor()
+        self._cursor_ids = itertools.count()
+
+
+    @override()
+    def connect(self, **kwargs):
+        """
+        Build our pool of connections to the server
+        """
+        if not available():
+            raise RuntimeError(
+                'The postgres integration requires psycopg2 to be installed'
+            )
+
+        connect_kwargs = {
+            key : kwargs[key] for key in _CONNECT_KEYS if key in kwargs
+        }
+        if 'dsn' in kwargs:
+            connect_kwargs['dsn'] = kwargs['dsn']
+        else:
+            connect_kwargs['dbname'] = kwargs.get('name', 'hivemind')
+
+        try:
+            self.__pool = _ConnectionPool(
+                kwargs.get('min_connections', 1),
+                kwargs.get('max_connections', 20),
+                **connect_kwargs
+            )
+        except psycopg2.OperationalError as e:
+            raise OperationalError(str(e))
+
+
+    @override()
+    def disconnect(self):
+        """
+        Close every connection in the pool
+        """
+        if not self.__pool:
+            return
+        self.__pool.close()
+        self.__pool = None
+
+
+    def release(self):
+        """
+        Return this thread's connection to the pool. Done for us once
+        a statement or transaction is over.
+        """
+        if self.__pool:
+            self.__pool.release()
+
+
+    def end_write(self):
+        """
+        The outermost transaction is over, we don't need our lease
+        """
+        self.release()
+
+
+    @override()
+    def execute(self, query, values=None, cursor=None):
+        """
+        Raw, low level query interface
+        """
+        if values is None:
+            values = tuple()
+
+        sql = self._translated.get(query)
+        if sql is None:
+            sql = self._translated.put(query, to_pyformat(query))
+
+        tracer = self.tracer
+        started = tracer.start() if tracer is not None else None
+
+        try:
+            if cursor is None:
+                cursor = self.transaction.active or self.get_db_cursor()
+            cursor.execute(sql, values)
+            return cursor
+
+        except psycopg2.IntegrityError as e:
+            raise IntegrityError(str(e))
+        except (psycopg2.OperationalError, psycopg2.pool.PoolError) as e:
+            raise OperationalError(str(e))
+        except Exception as e:
+            raise DatabaseError(str(e))
+        finally:
+            if started is not None:
+                tracer.finish(query, len(values), started)
+
+            # Rows are fetched into the cursor so, outside of a
+            # transaction, the connection can go back right away
+            if not self.transaction.active:
+                self.release()
+
+
+    def execute_many(self, query, rows):
+        """
+        One statement, many sets of values, sent in pages rather than
+        a round trip per row
+        """
+        sql = self._translated.get(query)
+        if sql is None:
+            sql = self._translated.put(query, to_pyformat(query))
+
+        tracer = self.tracer
+        started = tracer.start() if tracer is not None else None
+
+        try:
+            cursor = self.transaction.active or self.get_db_cursor()
+            psycopg2.extras.execute_batch(cursor, sql, rows)
+            return cursor
+
+        except psycopg2.IntegrityError as e:
+            raise IntegrityError(str(e))
+        except (psycopg2.OperationalError, psycopg2.pool.PoolError) as e:
+            raise OperationalError(str(e))
+        except Exception as e:
+            raise DatabaseError(str(e))
+        finally:
+            if started is not None:
+                tracer.finish_many(query, rows, started)
+            if not self.transaction.active:
+                self.release()
+
+
+    @override()
+    def get_db_cursor(self):
+        """
+        :return: A cursor on this thread's connection
+        """
+        return self.__pool.connection().cursor()
+
+
+    def get_iter_cursor(self, chunk_size: int):
+        """
+        :return: A named (server side) cursor so iterators are sent
+                 chunk_size rows at a time rather than all of them at
+                 once. Outside of a transaction it's declared WITH HOLD
+                 to outlive the statement, which has postgres keep the
+                 rows on it's end until we're done
+        """
+        cursor = self.__pool.connection().cursor(
+            name=f'hive_iter_{next(self._cursor_ids)}',
+            withhold=not self.transaction.active
+        )
+        cursor.itersize = chunk_size
+        return cursor
+
+
+    def _iter_chunks(self, full_sql: str, values: tuple, chunk_size: int):
+        """
+        The cursor lives on our connection so we hold onto it until
+        the iterator is done, even if other statements run meanwhile
+        """
+        try:
+            with self.__pool.pinned():
+                yield from _DatabaseIntegration._iter_chunks(
+                    self, full_sql, values, chunk_size
+                )
+        finally:
+            if not self.transaction.active:
+                self.release()
+
+
+    @override()
+    def get_table_names(self):
+        result = self.execute(
+            'SELECT table_name FROM information_schema.tables '
+            'WHERE table_schema = current_schema()'
+        )
+        return [row[0] for row in result.fetchall()]
+
+
+    def limit_sql(self, limit, offset) -> tuple:
+        """
+        postgres doesn't accept a negative LIMIT, OFFSET stands alone
+        """
+        if limit is None:
+            return 'OFFSET ?', (offset,)
+        return super().limit_sql(limit, offset)
+
+
+    def add_column_sql(self, table, column) -> str:
+        """
+        Constraints are added along with the column
+        """
+        sql, constraints = self.definition_sql(column)
+        return f'ALTER TABLE "{table.db_name()}" ADD COLUMN {sql}' + \
+            ''.join(f', ADD {constraint}' for constraint in constraints)
+
+
+    def alter_column_sql(self, table, column, old: dict) -> list:
+        """
+        Change the name, type, nullability or uniqueness of a column in
+        place
+        """
+        table_name = table.db_name()
+        column_name = column.db_name()
+        prefix = f'ALTER TABLE "{table_name}"'
+
+        if old.get('pk', False) != column.pk:
+            raise MigrationError(
+                f'Cannot change the primary key of {table_name}'
+            )
+
+        statements = []
+        old_name = old.get('column')
+        if old_name and old_name != column_name:
+            statements.append(
+                f'{prefix} RENAME COLUMN "{old_name}" TO "{column_name}"'
+            )
+
+        if old['base_type'] != column.base_type.name:
+            if column.base_type == FieldTypes.FK:
+                db_type = column.related_class.pk_field().db_type(self)
+            else:
+                db_type = column.db_type(self)
+            statements.append(
+                f'{prefix} ALTER COLUMN "{column_name}" TYPE {db_type} '
+                f'USING "{column_name}"::{db_type}'
+            )
+
+        if old.get('null', False) != column._null:
+            action = 'DROP' if column._null else 'SET'
+            statements.append(
+                f'{prefix} ALTER COLUMN "{column_name}" {action} NOT NULL'
+            )
+
+        if old.get('unique', False) != column._unique:
+            # Matches the name postgres gives inline UNIQUE constraints
+            constraint = f'{table_name}_{column_name}_key'
+            if column._unique:
+                statements.append(
+                    f'{prefix} ADD CONSTRAINT "{constraint}" UNIQUE ("{column_name}")'
+                )
+            else:
+                statements.append(
+                    f'{prefix} DROP CONSTRAINT IF EXISTS "{constraint}"'
+                )
+
+        return statements
+
+
+    def definition_sql(self, column):
+        """
+        Foreign keys take on the type of the key they point to
+        """
+        if column.base_type != FieldTypes.FK:
+            return super().definition_sql(column)
+
+        column_name = column.db_name()
+        fk_table_name = column.related_class.db_name()
+        fk_pk_column_name = column.related_class.pk()
+        fk_type = column.related_class.pk_field().db_type(self)
+
+        sql = f'"{column_name}" {fk_type}' + \
+            (' UNIQUE' if column._unique else '') + \
+            ('' if column._null else ' NOT NULL')
+
+        return sql, [
+            f'CONSTRAINT "fk_{column_name}_to_{fk_pk_column_name}" '
+            f'FOREIGN KEY("{column_name}") '
+            f'REFERENCES "{fk_table_name}"("{fk_pk_column_name}") '
+            f'ON DELETE {column.deletion_policy}'
+        ]
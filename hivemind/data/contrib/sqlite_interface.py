@@ -20,9 +20,12 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import re
 import json
 import sqlite3
-import sqlparse
+import weakref
+import threading
+from contextlib import contextmanager
 from decimal import Decimal
 from datetime import datetime, date
 
@@ -31,7 +34,146 @@ from purepy import override
 from hivemind.data.abstract.field import FieldTypes
 from hivemind.data.abstract.scafold import _DatabaseIntegration
 from hivemind.data.exceptions import DatabaseError, IntegrityError, OperationalError
-from hivemind.util import global_settings
+
+_QUOTED = re.compile(r"'[^']*'|\"[^\"]*\"|--[^\n]*|/\*.*?\*/", re.S)
+_STATEMENTS = ('SELECT', 'VALUES', 'INSERT', 'REPLACE', 'UPDATE', 'DELETE')
+
+def _is_read(query: str) -> bool:
+    """
+    :return: True if the statement only reads. A ``WITH`` is decided
+             by the statement after it's common table expressions as
+             that could just as well be an INSERT as a SELECT
+    """
+    head = query.lstrip()[:7].upper()
+    if head.startswith(('SELECT', 'EXPLAIN')):
+        return True
+    if not head.startswith('WITH'):
+        return False
+
+    depth = 0
+    for token in re.findall(r'\(|\)|\w+', _QUOTED.sub(' ', query)):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and token.upper() in _STATEMENTS:
+            return token.upper() in ('SELECT', 'VALUES')
+    return False
+
+
+class _Reader(object):
+    """
+    Holds a thread's reader connection. The thread-local is the only
+    strong reference, so the connection is closed when the thread ends
+    """
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self._finalizer = weakref.finalize(self, connection.close)
+
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+class _ConnectionPool(object):
+    """
+    sqlite connections for many threads.
+
+    Every thread reads through it's own connection, so with WAL
+    journaling readers never wait on each other or on the writer. All
+    writes go through a single connection guarded by a lock, which is
+    held for the length of a transaction.
+
+    An in-memory database only exists on the connection that made it,
+    so there we share a single connection for everything.
+    """
+    def __init__(self, database: str, pragmas: dict, cached_statements: int):
+        self._database = database
+        self._pragmas = pragmas
+        self._cached_statements = cached_statements
+        self.memory = database == ':memory:' or 'mode=memory' in database
+
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = weakref.WeakSet()
+        self._readers_lock = threading.Lock()
+
+        self.writer = self._connect()
+        if not self.memory:
+            self.writer.execute('PRAGMA journal_mode = WAL;')
+
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self._database,
+            detect_types=sqlite3.PARSE_DECLTYPES, # To support JSON
+            check_same_thread=False,
+            cached_statements=self._cached_statements
+        )
+
+        # We control the transactions ourselves
+        connection.isolation_level = None
+
+        # We have to enable FKs
+        connection.execute("PRAGMA foreign_keys = 1;")
+
+        for key, value in self._pragmas.items():
+            if value is not None:
+                connection.execute(f'PRAGMA {key} = {value};')
+        return connection
+
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        :return: The connection this thread reads with
+        """
+        if self.memory:
+            return self.writer
+
+        reader = getattr(self._local, 'reader', None)
+        if reader is None:
+            connection = self._connect()
+            connection.execute('PRAGMA query_only = 1;')
+            reader = _Reader(connection)
+            self._local.reader = reader
+            with self._readers_lock:
+                self._readers.add(reader)
+        return reader.connection
+
+
+    def acquire_writer(self) -> None:
+        self._lock.acquire()
+        self._local.writing = getattr(self._local, 'writing', 0) + 1
+
+
+    def release_writer(self) -> None:
+        self._local.writing -= 1
+        self._lock.release()
+
+
+    def is_writing(self) -> bool:
+        """
+        :return: True if this thread holds the writer
+        """
+        return getattr(self._local, 'writing', 0) > 0
+
+
+    @contextmanager
+    def writing(self):
+        self.acquire_writer()
+        try:
+            yield
+        finally:
+            self.release_writer()
+
+
+    def close(self) -> None:
+        with self._readers_lock:
+            for reader in list(self._readers):
+                reader.close()
+            self._readers = weakref.WeakSet()
+        self.writer.close()
+
 
 class SQLiteInterface(_DatabaseIntegration):
     """
@@ -39,6 +181,9 @@ class SQLiteInterface(_DatabaseIntegration):
     """
     name = 'sqlite'
 
+    # Every write goes through the one connection
+    shared_writer = True
+
     mapped_types = {
 
         # -- Numeric
@@ -66,9 +211,18 @@ class SQLiteInterface(_DatabaseIntegration):
         FieldTypes.JSON: ('JSON', None, json.loads)
     }
 
+    # Applied to every connection unless overridden in the database
+    # settings (either top level or within a "pragmas" dict)
+    default_pragmas = {
+        'synchronous' : 'NORMAL',
+        'cache_size' : -16000, # KiB when negative
+        'mmap_size' : 64 * 1024 * 1024,
+        'busy_timeout' : 5000,
+    }
+
     def __init__(self):
         _DatabaseIntegration.__init__(self)
-        self.__db = None
+        self.__pool = None
 
 
     @override()
@@ -82,17 +236,25 @@ class SQLiteInterface(_DatabaseIntegration):
             if not database_name.endswith('.db'):
                 database_name += '.db'
 
-        self.__db = sqlite3.connect(
+        pragmas = dict(self.default_pragmas)
+        for key in self.default_pragmas:
+            if key in kwargs:
+                pragmas[key] = kwargs[key]
+        pragmas.update(kwargs.get('pragmas', {}))
+
+        self.__pool = _ConnectionPool(
             database_name,
-            detect_types=sqlite3.PARSE_DECLTYPES, # To support JSON
-            check_same_thread=False
+            pragmas,
+            # Our SQL text is stable per query shape (see Query.sql())
+            # so keep plenty of prepared statements around
+            cached_statements=kwargs.get(
+                'cached_statements', self.sql_cache_size
+            )
         )
 
-        # We control the transactions ourselves
-        self.__db.isolation_level = None
-
-        # We have to enable FKs
-        self.__db.execute("PRAGMA foreign_keys = 1;")
+        # In memory, reads go through the writer too and would see a
+        # group's writes before they're committed
+        self.shared_writer = not self.__pool.memory
 
 
     @override()
@@ -100,48 +262,106 @@ class SQLiteInterface(_DatabaseIntegration):
         """
         Disconnect from the local connection
         """
-        if not self.__db:
+        if not self.__pool:
             return
-        self.__db.close()
+        self.__pool.close()
 
 
     @override()
-    def execute(self, query, values=None):
+    def execute(self, query, values=None, cursor=None):
         """
-        Raw, low level query interface
+        Raw, low level query interface.
+
+        Reads outside of a transaction go to this thread's reader. Writes
+        go to the single writer connection, one thread at a time.
         """
-        if self.transaction.active:
-            cursor = self.transaction.active
-        else:
-            cursor = self.get_db_cursor()
         if values is None:
             values = tuple()
 
-        if global_settings.get('log_sql', False):
-            statements = sqlparse.split(query)
-            print ('-- sql')
-            for statement in statements:
-                print (sqlparse.format(statement, reindent=True, keyword_case='upper'))
-            print ("_values:")
-            __import__('pprint').pprint(values)
-            print ('-------------------------------------')
+        tracer = self.tracer
+        started = tracer.start() if tracer is not None else None
 
         try:
-            return cursor.execute(query, values)
+            if cursor is None:
+                cursor = self.transaction.active
+
+            if cursor is not None:
+                return cursor.execute(query, values)
+
+            if _is_read(query):
+                return self.__pool.reader().cursor().execute(query, values)
+
+            with self.__pool.writing():
+                self.transaction.wait_for_group()
+                return self.__pool.writer.cursor().execute(query, values)
+
         except sqlite3.IntegrityError as e:
             raise IntegrityError(str(e))
         except sqlite3.OperationalError as e:
             raise OperationalError(str(e))
         except Exception as e:
             raise DatabaseError(str(e))
+        finally:
+            if started is not None:
+                tracer.finish(query, len(values), started)
+
+
+    def execute_many(self, query, rows):
+        """
+        One statement, many sets of values, in a single call
+        """
+        tracer = self.tracer
+        started = tracer.start() if tracer is not None else None
+
+        try:
+            if self.transaction.active:
+                return self.transaction.active.executemany(query, rows)
+
+            with self.__pool.writing():
+                self.transaction.wait_for_group()
+                return self.__pool.writer.cursor().executemany(query, rows)
+
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(str(e))
+        except sqlite3.OperationalError as e:
+            raise OperationalError(str(e))
+        except Exception as e:
+            raise DatabaseError(str(e))
+        finally:
+            if started is not None:
+                tracer.finish_many(query, rows, started)
+
+
+    def begin_write(self):
+        self.__pool.acquire_writer()
+
+
+    def end_write(self):
+        self.__pool.release_writer()
+
+
+    def explain(self, sql: str, values: tuple = ()) -> list:
+        """
+        The plan is a tree of steps, each row naming it's parent
+        """
+        rows = self.execute('EXPLAIN QUERY PLAN ' + sql, values).fetchall()
+        depths = {0 : -1}
+        output = []
+        for node, parent, _, detail in rows:
+            depth = depths[node] = depths.get(parent, -1) + 1
+            output.append('  ' * depth + detail)
+        return output
 
 
     @override()
     def get_db_cursor(self):
         """
-        From our connection, snag a cursor
+        From our connection, snag a cursor. Within a transaction that's
+        the writer, otherwise this thread's reader
         """
-        return self.__db.cursor()
+        if self.__pool.is_writing():
+            return self.__pool.writer.cursor()
+        return self.__pool.reader().cursor()
 
 
     @override()
@@ -153,6 +373,10 @@ class SQLiteInterface(_DatabaseIntegration):
         return output
 
 
+    def set_foreign_keys(self, enabled: bool) -> None:
+        self.execute(f'PRAGMA foreign_keys = {1 if enabled else 0};')
+
+
     def definition_sql(self, column):
         """
         Based on the column provided, return the SQL for building a table with
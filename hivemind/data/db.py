@@ -30,9 +30,27 @@ class TransactionLocal(threading.local):
     local mechanism
     """
     def __init__(self):
+        # The savepoint of each nested transaction, None for the
+        # outermost
         self.transaction_stack = deque()
         self.cursor = None
 
+        # Run once the outermost transaction is done
+        self.callbacks = []
+
+        # The _CommitGroup our outermost transaction is part of
+        self.group = None
+
+
+class _CommitGroup(object):
+    """
+    Transactions, from any number of threads, that share one COMMIT
+    """
+    def __init__(self):
+        self.size = 0
+        self.done = threading.Event()
+        self.error = None
+
 
 class TransactionManager(object):
     """
@@ -47,29 +65,123 @@ class TransactionManager(object):
                 with self.database.transaction:
                     self.perform_sql()
 
+                    # Nested transactions are savepoints. Should this
+                    # fail, only it's own work is rolled back
+                    with self.database.transaction:
+                        self.perform_more_sql()
+
+    With group commit (see enable_group_commit()) the outermost
+    transactions of every thread pile into one open transaction that
+    is committed once per window. Each still waits for that commit
+    before it returns so nothing is reported done before it's durable.
     """
 
     def __init__(self, integration):
         self._integration = integration
         self._transaction_local = TransactionLocal()
 
+        # Group commit, when enabled
+        self._group_interval = None
+        self._group_max_size = 0
+        self._group = None
+
 
     @property
     def active(self):
         return self._transaction_local.cursor
 
 
+    @property
+    def group_commit(self) -> bool:
+        return self._group_interval is not None
+
+
+    def enable_group_commit(self, interval: float = 0.002, max_size: int = 64) -> None:
+        """
+        Coalesce the commits of small write transactions. Only for
+        integrations where every thread writes through the same
+        connection.
+
+        :param interval: Seconds the first transaction of a group waits
+                         for others to join it before committing
+        :param max_size: Commit as soon as this many have joined
+        """
+        if not self._integration.shared_writer:
+            raise ValueError(
+                f'{type(self._integration).__name__} cannot group commits'
+            )
+        self._group_interval = interval
+        self._group_max_size = max_size
+
+
+    def wait_for_group(self) -> None:
+        """
+        A write outside of a transaction would otherwise land in the open
+        group and only be committed (or rolled back) along with it.
+        Called with the writer held, which we give up until any open
+        group has been committed.
+        """
+        group = self._group
+        while group is not None:
+            self._integration.end_write()
+            try:
+                group.done.wait()
+            finally:
+                self._integration.begin_write()
+            group = self._group
+
+
+    def after(self, callback) -> None:
+        """
+        Call callback() once this thread's outermost transaction has
+        finished, whether it was committed or rolled back. Outside of a
+        transaction it's called right away.
+        """
+        if not self._transaction_local.transaction_stack:
+            callback()
+        else:
+            self._transaction_local.callbacks.append(callback)
+
+
     def __enter__(self):
         """
         Start a transaction. This may vary depending on the
         use case
         """
-        self._transaction_local.transaction_stack.append(1)
-        if not self._transaction_local.cursor:
-            self._transaction_local.cursor = self._integration.get_db_cursor()
+        local = self._transaction_local
+        integration = self._integration
+
+        if local.transaction_stack:
+            savepoint = f'hm_sp_{len(local.transaction_stack)}'
+            integration.execute(integration.savepoint_sql(savepoint))
+            local.transaction_stack.append(savepoint)
+            return
+
+        integration.begin_write()
+        try:
+            local.cursor = integration.get_db_cursor()
+            if self._group_interval is None:
+                integration.execute(integration.begin_sql())
+                local.transaction_stack.append(None)
+                return
+
+            if self._group is None:
+                integration.execute(integration.begin_sql())
+                self._group = _CommitGroup()
+                leader = True
+            else:
+                leader = False
 
-        begin_sql = self._integration.begin_sql()
-        self._integration.execute(begin_sql)
+            # Our own savepoint, so we can fail without taking the rest
+            # of the group with us
+            savepoint = 'hm_sp_0'
+            integration.execute(integration.savepoint_sql(savepoint))
+            local.group = (self._group, leader)
+            local.transaction_stack.append(savepoint)
+        except:
+            local.cursor = None
+            integration.end_write()
+            raise
 
 
     def __exit__(self, type, value, traceback):
@@ -78,14 +190,90 @@ class TransactionManager(object):
         commit any changes, unless of course there's an
         error at which point we need to rollback completely
         """
-        self._transaction_local.transaction_stack.pop()
+        local = self._transaction_local
+        integration = self._integration
+        savepoint = local.transaction_stack.pop()
+
+        if savepoint is None:
+            try:
+                if traceback:
+                    integration.execute(integration.rollback_sql())
+                else:
+                    integration.execute(integration.commit_sql())
+            finally:
+                self._finish()
+            return
+
+        try:
+            if traceback:
+                integration.execute(integration.rollback_to_sql(savepoint))
+            integration.execute(integration.release_sql(savepoint))
+        finally:
+            if not local.transaction_stack:
+                try:
+                    self._commit_group()
+                finally:
+                    self._finish()
+
+
+    def _commit_group(self) -> None:
+        """
+        Our part of the group is done. Called with the writer held,
+        which we give up while the group fills.
+        """
+        local = self._transaction_local
+        group, leader = local.group
+        local.group = None
+        local.cursor = None
 
-        if traceback:
-            rollback_sql = self._integration.rollback_sql()
-            self._integration.execute(rollback_sql)
+        group.size += 1
+        if group.size >= self._group_max_size:
+            self._commit(group)
+            self._integration.end_write()
         else:
-            commit_sql = self._integration.commit_sql()
-            self._integration.execute(commit_sql)
+            self._integration.end_write()
+            if leader:
+                group.done.wait(self._group_interval)
+                self._integration.begin_write()
+                try:
+                    self._commit(group)
+                finally:
+                    self._integration.end_write()
+
+        group.done.wait()
+        if group.error is not None:
+            raise group.error
+
+
+    def _commit(self, group: _CommitGroup) -> None:
+        """
+        COMMIT the group if nobody has yet. Called with the writer held
+        """
+        if self._group is not group:
+            return
+        self._group = None
+
+        integration = self._integration
+        cursor = integration.get_db_cursor()
+        try:
+            integration.execute(integration.commit_sql(), cursor=cursor)
+        except Exception as e:
+            group.error = e
+            integration.execute(integration.rollback_sql(), cursor=cursor)
+        finally:
+            group.done.set()
+
+
+    def _finish(self) -> None:
+        """
+        The outermost transaction is over
+        """
+        local = self._transaction_local
+        if local.cursor is not None:
+            local.cursor = None # No longer need the cursor
+            self._integration.end_write()
 
-        if len(self._transaction_local.transaction_stack) == 0:
-            self._transaction_local.cursor = None # No longer need the cursor
+        callbacks = local.callbacks
+        local.callbacks = []
+        for callback in callbacks:
+            callback()
@@ -40,3 +40,8 @@ class OperationalError(Exception):
 class MultipleResultsError(Exception):
     """ For get operations that return too many results """
     pass
+
+
+class MigrationError(Exception):
+    """ A change to a table that we can't migrate automatically """
+    pass
@@ -0,0 +1,261 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+Columnar export of query results.
+
+``Query.values()`` builds a dict per row, which is fine for a page of
+results and a lot of garbage for a few million. These read straight
+off of the cursor a chunk at a time and lay the results out by column
+instead.
+
+.. code-block:: python
+
+    query = database.new_query(NodeMeta)
+
+    # dict of column name -> array.array, numpy array or list
+    columns = query.to_columns('node', 'key')
+
+    # Stream it out
+    with open('meta.csv', 'w', newline='') as f:
+        query.write_csv(f, 'node', 'key', 'value')
+
+    # Requires pyarrow
+    with open('meta.arrow', 'wb') as f:
+        query.write_arrow(f)
+
+Integer and floating point columns are packed into ``array.array``
+(or handed to numpy as is, when it's installed). A column that turns
+out to hold something else, such as an empty value, falls back to a
+plain list.
+"""
+import csv
+import json
+import array
+
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError: # pragma: no cover
+    pyarrow = None
+
+from hivemind.data.abstract.field import _Field, FieldTypes
+from hivemind.data.query import Count
+
+# Rows we pull off of the cursor at a time
+CHUNK_SIZE = 10000
+
+_TYPECODES = {
+    FieldTypes.TINYINT : 'q',
+    FieldTypes.SMALLINT : 'q',
+    FieldTypes.INT : 'q',
+    FieldTypes.BIGINT : 'q',
+    FieldTypes.FLOAT : 'd',
+    FieldTypes.REAL : 'd',
+}
+
+
+def numpy_available() -> bool:
+    return numpy is not None
+
+
+def arrow_available() -> bool:
+    return pyarrow is not None
+
+
+def typecode(column) -> (str, None):
+    """
+    :param column: _Field or _Aggregate that a column comes from
+    :return: The array.array typecode the column packs into or None
+             if it's kept as a list
+    """
+    if isinstance(column, Count):
+        return 'q'
+    if not isinstance(column, _Field):
+        return None
+    if column.base_type == FieldTypes.FK:
+        column = column.related_class.pk_field()
+    return _TYPECODES.get(column.base_type)
+
+
+class _ColumnBuilder(object):
+    """
+    Gathers the values of one column, packed where we can
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, code: (str, None)):
+        self.data = array.array(code) if code else []
+
+
+    def extend(self, values: tuple) -> None:
+        data = self.data
+        if isinstance(data, array.array):
+            size = len(data)
+            try:
+                data.extend(values)
+                return
+            except (TypeError, OverflowError):
+                # Not what we expected (e.g. None), keep what we
+                # have as a list from here on
+                del data[size:]
+                self.data = data = data.tolist()
+        data.extend(values)
+
+
+    def result(self, use_numpy: bool):
+        if use_numpy and isinstance(self.data, array.array):
+            return numpy.asarray(self.data) # Shares the buffer
+        return self.data
+
+
+def to_columns(query, *fields, chunk_size: int = CHUNK_SIZE, use_numpy: bool = None) -> dict:
+    """
+    Run a query and gather the results by column
+    :param fields: The fields (or annotations) to export. All of the
+                   columns of the table when none are given
+    :param use_numpy: Hand back numpy arrays for the packed columns.
+                      Defaults to whether numpy is installed
+    :return: dict[str, array.array|numpy.ndarray|list]
+    """
+    if use_numpy is None:
+        use_numpy = numpy_available()
+    elif use_numpy and not numpy_available():
+        raise RuntimeError('numpy is not installed')
+
+    names, sources, chunks = query._column_chunks(fields, chunk_size)
+    builders = [_ColumnBuilder(typecode(s)) for s in sources]
+
+    for rows in chunks:
+        for builder, values in zip(builders, zip(*rows)):
+            builder.extend(values)
+
+    return {
+        name : builder.result(use_numpy) for name, builder in zip(names, builders)
+    }
+
+
+def _json_columns(sources: list) -> list:
+    """
+    :return: list[int] of the columns that hold json
+    """
+    return [
+        i for i, s in enumerate(sources)
+        if isinstance(s, _Field) and s.base_type == FieldTypes.JSON
+    ]
+
+
+def _dump_json(rows: list, indices: list) -> list:
+    """
+    Serialize the json columns of a chunk, everything else is
+    written as is
+    """
+    if not indices:
+        return rows
+
+    output = []
+    for row in rows:
+        row = list(row)
+        for i in indices:
+            if row[i] is not None:
+                row[i] = json.dumps(row[i])
+        output.append(row)
+    return output
+
+
+def write_csv(query, fp, *fields, header: bool = True, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Stream the results of a query as csv
+    :param fp: File-like object opened for text
+    :param header: Start with a row of the column names
+    :return: The number of rows written
+    """
+    names, sources, chunks = query._column_chunks(fields, chunk_size)
+    json_columns = _json_columns(sources)
+
+    writer = csv.writer(fp)
+    if header:
+        writer.writerow(names)
+
+    count = 0
+    for rows in chunks:
+        writer.writerows(_dump_json(rows, json_columns))
+        count += len(rows)
+    return count
+
+
+def _require_arrow() -> None:
+    if not arrow_available():
+        raise RuntimeError('Arrow export requires pyarrow to be installed')
+
+
+def _record_batches(names: list, sources: list, chunks):
+    json_columns = _json_columns(sources)
+    for rows in chunks:
+        rows = _dump_json(rows, json_columns)
+        yield pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(values) for values in zip(*rows)], names=names
+        )
+
+
+def arrow_batches(query, *fields, chunk_size: int = CHUNK_SIZE):
+    """
+    :return: Generator[pyarrow.RecordBatch] of the results of a query,
+             one per chunk
+    """
+    _require_arrow()
+    names, sources, chunks = query._column_chunks(fields, chunk_size)
+    yield from _record_batches(names, sources, chunks)
+
+
+def write_arrow(query, sink, *fields, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Stream the results of a query in the Arrow IPC stream format. The
+    schema is taken from the first chunk.
+    :param sink: File-like object opened for binary or a pyarrow sink
+    :return: The number of rows written
+    """
+    _require_arrow()
+    names, sources, chunks = query._column_chunks(fields, chunk_size)
+
+    writer = None
+    count = 0
+    try:
+        for batch in _record_batches(names, sources, chunks):
+            if writer is None:
+                writer = pyarrow.ipc.new_stream(sink, batch.schema)
+            writer.write_batch(batch)
+            count += batch.num_rows
+
+        if writer is None:
+            # Nothing matched, readers still want to know the columns
+            writer = pyarrow.ipc.new_stream(
+                sink, pyarrow.schema([(n, pyarrow.null()) for n in names])
+            )
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
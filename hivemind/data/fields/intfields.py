@@ -22,15 +22,136 @@ SOFTWARE.
 # --
 Basic fields surrounding the int type
 """
-import functools
-import itertools
+import os
+import time
+import logging
+import threading
 from datetime import datetime, timezone, timedelta
 
 from hivemind.data.abstract.field import _Field, FieldTypes
 from hivemind.util import global_settings
 
-BASIC_TICK = itertools.count()
-SHARD_ID = 1
+#
+# An id is laid out as:
+#
+#   [ milliseconds since the hive_epoch:41 | shard:13 | sequence:10 ]
+#
+SHARD_BITS = 13
+SEQUENCE_BITS = 10
+MAX_SHARD_ID = (1 << SHARD_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = SHARD_BITS + SEQUENCE_BITS
+
+_UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MS = timedelta(milliseconds=1)
+
+
+class _IdGenerator(object):
+    """
+    Hands out ids for the IdField. Each millisecond gets it's own run of
+    sequence numbers. Once those are used up we wait for the clock to
+    tick over rather than hand out an id we already have.
+
+    The shard comes from the ``hive_shard_id`` setting. Every process
+    that writes to the same tables should have it's own. A forked child
+    shares it's parent's shard until it calls ``set_shard_id()`` and
+    we warn if it makes ids before then.
+    """
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self) -> None:
+        """
+        Start over. The epoch and shard are read again on next use
+        """
+        self._lock = threading.Lock()
+        self._epoch_ms = None
+        self._shard = None
+        self._last_ms = -1
+        self._sequence = 0
+        self._forked = False
+
+
+    def set_shard_id(self, shard_id: int) -> None:
+        if not 0 <= shard_id <= MAX_SHARD_ID:
+            raise ValueError(
+                f'Shard id {shard_id} is out of range (0-{MAX_SHARD_ID})'
+            )
+        with self._lock:
+            self._shard = shard_id << SEQUENCE_BITS
+            self._forked = False
+
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._epoch_ms is None:
+                self._load_settings()
+
+            if self._forked:
+                self._forked = False
+                logging.warning(
+                    'Process %d is making ids after a fork without calling'
+                    ' set_shard_id(). They may collide with the parent\'s',
+                    os.getpid()
+                )
+
+            now = time.time_ns() // 1000000 - self._epoch_ms
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # Same millisecond (or the clock stepped back on us,
+                # in which case we stay on the last one)
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms = self._wait_past(self._last_ms)
+                    self._sequence = 0
+
+            return (self._last_ms << TIMESTAMP_SHIFT) | self._shard | self._sequence
+
+
+    def after_fork(self) -> None:
+        """
+        The lock may have been held by another thread when we forked and
+        the child shouldn't carry on from the parent's sequence
+        """
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+        self._forked = True
+
+
+    def _wait_past(self, last_ms: int) -> int:
+        """
+        Spin until the clock moves beyond last_ms
+        :return: The new millisecond
+        """
+        while True:
+            now = time.time_ns() // 1000000 - self._epoch_ms
+            if now > last_ms:
+                return now
+            time.sleep(0)
+
+
+    def _load_settings(self) -> None:
+        self._epoch_ms = (global_settings['hive_epoch'] - _UNIX_EPOCH) // _ONE_MS
+        if self._shard is None:
+            shard_id = global_settings.get('hive_shard_id', None)
+            if shard_id is None:
+                shard_id = 1
+            if not 0 <= shard_id <= MAX_SHARD_ID:
+                raise ValueError(
+                    f'hive_shard_id {shard_id} is out of range (0-{MAX_SHARD_ID})'
+                )
+            self._shard = shard_id << SEQUENCE_BITS
+
+
+_GENERATOR = _IdGenerator()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_GENERATOR.after_fork)
+
 
 class IntField(_Field):
     """
@@ -75,11 +196,9 @@ class IdField(_Field):
     def date_to_int(datetime):
         """
         :param datetime: Timezone aware datetime that we're converting to an int
-        :return: int
+        :return: int of the milliseconds since the hive_epoch
         """
-        diff = datetime - global_settings['hive_epoch']
-        delta = (diff.days * 86400000) + (diff.seconds * 1000) + (diff.microseconds / 1000)
-        return int(delta)
+        return (datetime - global_settings['hive_epoch']) // _ONE_MS
 
 
     @staticmethod
@@ -88,16 +207,17 @@ class IdField(_Field):
         Python menthod of constructing an id a-la instagrams setup
         https://instagram-engineering.com/sharding-ids-at-instagram-1cf5a71e5a5c
         """
-        # 1: Timestamp
-        current_id = IdField.date_to_int(datetime.utcnow().replace(tzinfo=timezone.utc)) << 23
-
-        # 2: Shard ID (For now, always one)
-        current_id |= SHARD_ID << 10
+        return _GENERATOR.next_id()
 
-        # 3: Auto-incr with the last 10 bits
-        current_id |= next(BASIC_TICK) % 1024
 
-        return current_id
+    @staticmethod
+    def set_shard_id(shard_id: int) -> None:
+        """
+        Claim a shard for the ids this process generates, overriding
+        the ``hive_shard_id`` setting. Useful for workers that are
+        started from the same settings.
+        """
+        _GENERATOR.set_shard_id(shard_id)
 
 
     @staticmethod
@@ -105,4 +225,4 @@ class IdField(_Field):
         """
         :return: datetimte.datetime
         """
-        return global_settings['hive_epoch'] + timedelta(microseconds=(timestamp >> 23) * 1000)
+        return global_settings['hive_epoch'] + (timestamp >> TIMESTAMP_SHIFT) * _ONE_MS
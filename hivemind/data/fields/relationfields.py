@@ -48,6 +48,38 @@ class ForeignKeyField(_Field):
             )
 
 
+    def __get__(self, instance, owner):
+        """
+        Unlike other fields, foreign keys are data descriptors so we can
+        load the related instance the first time it's asked for.
+        """
+        if instance is None:
+            return self
+
+        value = instance.__dict__.get(self.field_name)
+        if value is None or isinstance(value, self._related_class):
+            return value
+
+        related = self._related_class
+        value = instance._database.new_query(
+            related,
+            **{related.pk_field().field_name: value}
+        ).get()
+        instance.__dict__[self.field_name] = value
+        return value
+
+
+    def __set__(self, instance, value):
+        """
+        Store either the related instance or it's primary key. The key
+        is always available as ``<field_name>_pk``.
+        """
+        instance.__dict__[self.field_name] = value
+        if isinstance(value, self._related_class):
+            value = value.pk_value
+        instance.__dict__[f'{self.field_name}_pk'] = value
+
+
     @property
     def deletion_policy(self):
         return self._del_policy
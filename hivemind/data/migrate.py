@@ -0,0 +1,504 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+Schema migrations driven by ``TableDefinition``.
+
+Every table the root creates has it's ``db_layout()`` recorded in the
+``TableDefinition`` table. On start up we compare the latest record with
+the layout the code declares now and work out the operations that take
+the table from one to the other:
+
+    - New columns that can be added in place are (``ALTER TABLE``)
+    - Indexes are created and dropped to match
+    - Anything else either alters the column in place, where the
+      database is able to, or rebuilds the table: create the new layout
+      under a temporary name, copy the rows across, then swap it in
+
+Rows are copied (and new columns filled) in batches, each in it's own
+transaction, so other threads get a turn at the database in between.
+
+.. code-block:: python
+
+    migrator = Migrator(database, batch_size=500)
+    for operation in migrator.plan(MyTable, migrator.current_layout(MyTable)):
+        print (operation.describe())
+
+    migrator.migrate(MyTable)
+"""
+import copy
+import time
+import logging
+import threading
+
+from hivemind.data.abstract.table import _TableLayout
+from hivemind.data.abstract.field import FieldTypes
+from hivemind.data.exceptions import MigrationError
+from hivemind.data.tables import TableDefinition
+from hivemind.util import misc
+
+
+def _column_name(field_name: str, layout: dict) -> str:
+    """
+    :return: The column a field was stored in. Layouts recorded before
+             we tracked it use the default naming
+    """
+    return layout.get('column') or misc.to_camel_case(field_name)
+
+
+def _differs(old: dict, new: dict) -> bool:
+    """
+    :return: True if the column itself has to change
+    """
+    for key in ('base_type', 'pk', 'unique', 'null'):
+        if old.get(key, False) != new.get(key, False):
+            return True
+    return 'column' in old and old['column'] != new['column']
+
+
+def _loosened(field):
+    """
+    :return: A copy of the field that allows empty and repeated values
+    """
+    field = copy.copy(field)
+    field._null = True
+    field._unique = False
+    return field
+
+
+class _Operation(object):
+    """
+    A single step of a migration
+    """
+    def __init__(self, table: _TableLayout):
+        self.table = table
+
+
+    def describe(self) -> str:
+        raise NotImplementedError()
+
+
+    def apply(self, migrator) -> None:
+        raise NotImplementedError()
+
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.describe()}>'
+
+
+class AddColumn(_Operation):
+    """
+    ALTER TABLE ... ADD COLUMN. When ``relaxed`` the column is added
+    without it's NOT NULL and UNIQUE constraints, to be filled in and
+    tightened up afterwards.
+    """
+    def __init__(self, table, field, relaxed: bool = False):
+        super().__init__(table)
+        self.field = field
+        self.relaxed = relaxed
+
+
+    def describe(self) -> str:
+        return f'add column {self.table.db_name()}.{self.field.db_name()}'
+
+
+    def apply(self, migrator) -> None:
+        field = _loosened(self.field) if self.relaxed else self.field
+        migrator.database.execute(
+            migrator.database.add_column_sql(self.table, field)
+        )
+
+
+class BackfillColumn(_Operation):
+    """
+    Give every row without a value for a column it's default
+    """
+    def __init__(self, table, field):
+        super().__init__(table)
+        self.field = field
+
+
+    def describe(self) -> str:
+        return f'fill column {self.table.db_name()}.{self.field.db_name()}'
+
+
+    def apply(self, migrator) -> None:
+        database = migrator.database
+        table_name = self.table.db_name()
+        column = self.field.db_name()
+        pk_column = self.table.pk()
+
+        if not self.field.has_default:
+            if self.field._null:
+                return # Nothing to fill in
+            raise MigrationError(
+                f'{table_name}.{column} is not null and has no default'
+            )
+
+        sql = f'UPDATE "{table_name}" SET "{column}" = ? WHERE "{pk_column}" = ?'
+        for rows in migrator.batches(table_name, pk_column, [],
+                                     where=f'"{column}" IS NULL'):
+            with database.transaction:
+                database.execute_many(sql, [
+                    (self.field.prep_for_db(self.field.generate_default()), pk)
+                    for pk, in rows
+                ])
+            migrator.pause()
+
+
+class AlterColumn(_Operation):
+    """
+    Change a column in place. Only for databases with ``alter_columns``
+    """
+    def __init__(self, table, field, old: dict):
+        super().__init__(table)
+        self.field = field
+        self.old = old
+
+
+    def describe(self) -> str:
+        return f'alter column {self.table.db_name()}.{self.field.db_name()}'
+
+
+    def apply(self, migrator) -> None:
+        database = migrator.database
+        with database.transaction:
+            for sql in database.alter_column_sql(self.table, self.field, self.old):
+                database.execute(sql)
+
+
+class DropColumn(_Operation):
+    """
+    Remove a column. Only for databases with ``alter_columns``
+    """
+    def __init__(self, table, column_name: str):
+        super().__init__(table)
+        self.column_name = column_name
+
+
+    def describe(self) -> str:
+        return f'drop column {self.table.db_name()}.{self.column_name}'
+
+
+    def apply(self, migrator) -> None:
+        migrator.database.execute(
+            migrator.database.drop_column_sql(self.table, self.column_name)
+        )
+
+
+class CreateIndex(_Operation):
+
+    def __init__(self, table, fields: tuple):
+        super().__init__(table)
+        self.fields = tuple(fields)
+
+
+    def describe(self) -> str:
+        return f'create index on {self.table.db_name()} {self.fields}'
+
+
+    def apply(self, migrator) -> None:
+        migrator.database.execute(
+            migrator.database.index_sql(self.table, self.fields)
+        )
+
+
+class DropIndex(_Operation):
+
+    def __init__(self, table, fields: tuple):
+        super().__init__(table)
+        self.fields = tuple(fields)
+
+
+    def describe(self) -> str:
+        return f'drop index on {self.table.db_name()} {self.fields}'
+
+
+    def apply(self, migrator) -> None:
+        name = migrator.database.index_name(self.table, self.fields)
+        migrator.database.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class RebuildTable(_Operation):
+    """
+    Copy-swap. Build the table as it's declared now under a temporary
+    name, copy every row across in batches and swap it in for the old
+    one. Columns that are new, or that may no longer be empty, get
+    their defaults.
+    """
+    def __init__(self, table, old_layout: dict):
+        super().__init__(table)
+        self.old_layout = old_layout
+
+
+    def describe(self) -> str:
+        return f'rebuild table {self.table.db_name()}'
+
+
+    def apply(self, migrator) -> None:
+        database = migrator.database
+        table = self.table
+        name = table.db_name()
+        temp = f'_migrate_{name}'
+
+        old_fields = dict(self.old_layout['fields'])
+        pk_name = table.pk_field().field_name
+        if pk_name not in old_fields or not old_fields[pk_name].get('pk', False):
+            raise MigrationError(
+                f'Cannot rebuild {name}, it\'s primary key has changed'
+            )
+
+        # A previous attempt may have been cut short
+        database.execute(f'DROP TABLE IF EXISTS "{temp}"')
+        database._create_table(table, name=temp, indexes=False)
+
+        columns = table.columns()
+        copied = [attr for attr, _ in columns if attr in old_fields]
+        old_columns = [_column_name(attr, old_fields[attr]) for attr in copied]
+
+        column_sql = ', '.join(f'"{field.db_name()}"' for _, field in columns)
+        placeholders = ', '.join('?' * len(columns))
+        insert_sql = f'INSERT INTO "{temp}" ({column_sql}) VALUES ({placeholders})'
+
+        old_pk_column = _column_name(pk_name, old_fields[pk_name])
+        for rows in migrator.batches(name, old_pk_column, old_columns):
+            new_rows = []
+            for row in rows:
+                values = dict(zip(copied, row[1:]))
+                new_row = []
+                for attr, field in columns:
+                    value = values.get(attr)
+                    if value is None and not field._null and field.has_default:
+                        # New, or no longer allowed to be empty
+                        value = field.generate_default()
+                    new_row.append(
+                        None if value is None else field.prep_for_db(value)
+                    )
+                new_rows.append(new_row)
+
+            with database.transaction:
+                database.execute_many(insert_sql, new_rows)
+            migrator.pause()
+
+        # Other tables may refer to this one. Their references follow
+        # the name so they'll point at the new table once it's swapped
+        database.set_foreign_keys(False)
+        try:
+            with database.transaction:
+                database.execute(f'DROP TABLE "{name}"')
+                database.execute(f'ALTER TABLE "{temp}" RENAME TO "{name}"')
+        finally:
+            database.set_foreign_keys(True)
+
+        database._create_indexes(table)
+
+
+class Migrator(object):
+    """
+    Brings existing tables in line with their declarations.
+
+    :param database: _DatabaseIntegration
+    :param batch_size: Rows copied (or filled) per transaction
+    :param pause: Seconds to wait between batches
+    """
+    def __init__(self,
+                 database,
+                 batch_size: int = 1000,
+                 pause: float = 0.0,
+                 logger=None):
+        self.database = database
+        self.batch_size = batch_size
+        self._pause = pause
+        self._logger = logger or logging
+
+
+    def current_layout(self, table: _TableLayout) -> (dict, None):
+        """
+        :return: The layout last recorded for the table or None if it
+                 has never been recorded
+        """
+        records = self.database.new_query(
+            TableDefinition, table_name=table.db_name()
+        ).order_by('-id').limit(1).objects()
+        return records[0].table_layout if records else None
+
+
+    def plan(self, table: _TableLayout, old_layout: dict) -> list:
+        """
+        Work out what it takes to get a table from it's old layout to
+        the current one
+        :return: list[_Operation]
+        """
+        old_fields = dict(old_layout['fields'])
+        new_fields = dict(table.db_layout()['fields'])
+
+        added = [n for n in new_fields if n not in old_fields]
+        removed = [n for n in old_fields if n not in new_fields]
+        changed = [
+            n for n in new_fields
+            if n in old_fields and _differs(old_fields[n], new_fields[n])
+        ]
+
+        # Rows we already have need a value for any column that's
+        # becoming not null. Better to refuse now than part way through
+        # copying or filling them in
+        for field_name in added + changed:
+            field = table.get_field(field_name)
+            was_null = old_fields.get(field_name, {}).get('null', True)
+            if was_null and not field._null and not field.has_default:
+                raise MigrationError(
+                    f'{table.db_name()}.{field.db_name()} is not null '
+                    'and has no default'
+                )
+
+        alter = self.database.alter_columns
+        rebuild = not alter and bool(
+            removed or changed or
+            any(not self._simple_add(table.get_field(n)) for n in added)
+        )
+
+        operations = []
+        if rebuild:
+            operations.append(RebuildTable(table, old_layout))
+        else:
+            for field_name in added:
+                field = table.get_field(field_name)
+                if self._simple_add(field):
+                    operations.append(AddColumn(table, field))
+                    continue
+
+                # Add it loose, fill it in, then tighten it up
+                loose = dict(new_fields[field_name], null=True, unique=False)
+                operations.extend([
+                    AddColumn(table, field, relaxed=True),
+                    BackfillColumn(table, field),
+                    AlterColumn(table, field, loose)
+                ])
+
+            for field_name in changed:
+                field = table.get_field(field_name)
+                old = old_fields[field_name]
+                if not old.get('null', False) or field._null:
+                    operations.append(AlterColumn(table, field, old))
+                    continue
+
+                # Empty rows have to be filled in before they're refused
+                loose = dict(new_fields[field_name], null=True, unique=False)
+                operations.extend([
+                    AlterColumn(table, _loosened(field), old),
+                    BackfillColumn(table, field),
+                    AlterColumn(table, field, loose)
+                ])
+
+            for field_name in removed:
+                operations.append(DropColumn(
+                    table, _column_name(field_name, old_fields[field_name])
+                ))
+
+        old_indexes = [tuple(i) for i in old_layout.get('indexes', [])]
+        new_indexes = list(table.index_definitions())
+
+        if not rebuild:
+            # A rebuild drops the old ones and creates the new for us
+            for fields in old_indexes:
+                if fields not in new_indexes:
+                    operations.append(DropIndex(table, fields))
+
+            for fields in new_indexes:
+                if fields not in old_indexes:
+                    operations.append(CreateIndex(table, fields))
+
+        return operations
+
+
+    def migrate(self, table: _TableLayout) -> list:
+        """
+        Migrate a table that already exists and record it's new layout.
+        A table we've no record of is taken to be up to date.
+        :return: list[_Operation] that were applied
+        """
+        old_layout = self.current_layout(table)
+        if old_layout is None:
+            self.database._create_indexes(table)
+            TableDefinition.register_table(self.database, table)
+            return []
+
+        operations = self.plan(table, old_layout)
+        if not operations:
+            return operations
+
+        for operation in operations:
+            self._logger.info(f'Migration: {operation.describe()}')
+            operation.apply(self)
+
+        TableDefinition.register_table(self.database, table)
+        return operations
+
+
+    def batches(self, table_name: str, pk_column: str, columns: list, where: str = None):
+        """
+        Walk a table by primary key, batch_size rows at a time
+        :param columns: The columns to read along with the key
+        :param where: Extra condition on the rows
+        :return: Generator[list[tuple(pk, *columns)]]
+        """
+        select = ', '.join(f'"{c}"' for c in [pk_column] + list(columns))
+        last = None
+        while True:
+            clauses = [where] if where else []
+            values = []
+            if last is not None:
+                clauses.append(f'"{pk_column}" > ?')
+                values.append(last)
+
+            sql = f'SELECT {select} FROM "{table_name}"'
+            if clauses:
+                sql += ' WHERE ' + ' AND '.join(clauses)
+            sql += f' ORDER BY "{pk_column}" LIMIT ?'
+            values.append(self.batch_size)
+
+            rows = self.database.execute(sql, tuple(values)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield rows
+
+
+    def pause(self) -> None:
+        """
+        Between batches, let everyone else have a go
+        """
+        if self._pause:
+            threading.Event().wait(self._pause)
+        else:
+            time.sleep(0)
+
+
+    def _simple_add(self, field) -> bool:
+        """
+        :return: True if the column can be added with a plain ALTER TABLE
+        """
+        if field.pk or field._unique:
+            return False
+        if field.base_type == FieldTypes.FK and not self.database.alter_columns:
+            return False # Needs a table constraint
+        return field._null or \
+            (field.has_default and not callable(field._default))
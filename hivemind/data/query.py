@@ -77,6 +77,18 @@ class _QueryItemBase(object, metaclass=PureVirtualMeta):
         raise NotImplementedError()
 
 
+    @pure_virtual
+    def shape_and_values(self, interface) -> tuple:
+        """
+        Overload to describe the structure of this item without
+        building any SQL. Two items with the same shape produce the
+        same SQL text and only differ in the values bound to it.
+
+        :return: tuple(shape:hashable, values:list)
+        """
+        raise NotImplementedError()
+
+
 class _QueryFilterGroup(_QueryItemBase):
     """
     SQL Grouping (AND, OR) base to centralize the logic
@@ -111,6 +123,16 @@ class _QueryFilterGroup(_QueryItemBase):
         return output, values
 
 
+    @override()
+    def shape_and_values(self, interface) -> tuple:
+        shapes = []
+        values = []
+        for filter_ in self._filters:
+            shape, filter_values = filter_.shape_and_values(interface)
+            shapes.append(shape)
+            values.extend(filter_values)
+        return (self.op, tuple(shapes)), values
+
 
 class QueryAnd(_QueryFilterGroup):
     op = ' AND '
@@ -149,30 +171,23 @@ class QueryFilter(_QueryItemBase):
         return functools.partial(cls, table, field, operator)
 
 
-    @override()
-    def sql(self, interface) -> tuple:
+    def _prepare(self, interface) -> tuple:
         """
-        Build the proper SQL in order to 
+        Resolve our operator and the values to bind to it
+        :return: tuple(QueryOperators.Op, tuple|None) where the values
+                 are None if the operator doesn't take any
         """
-        db_col = self._table.db_column_name(self._field.field_name)
-        values = tuple()
-
-        opclass = None
-        expect_val = True
-
-        op = self._operator # ...
         if self._operator in interface.overloaded_operators:
             opclass = interface.overloaded_operators[self._operator]
 
         elif self._operator in QueryOperators.basic_operators:
             opclass = QueryOperators.basic_operators[self._operator]
 
-        elif hasattr(self._field, self._operator):
+        else:
             opclass = getattr(self._field, self._operator)()
 
-        op = opclass.op
-
-        if opclass.expect_val and self._value:
+        values = None
+        if opclass.expect_val and self._value is not None:
             v = self._value
             if opclass.val_comp:
                 v = opclass.val_comp(v)
@@ -183,8 +198,22 @@ class QueryFilter(_QueryItemBase):
             else:
                 values = (v,)
 
-            if opclass.op_comp:
-                op = opclass.op_comp(op, values)
+        return opclass, values
+
+
+    @override()
+    def sql(self, interface) -> tuple:
+        """
+        Build the proper SQL in order to 
+        """
+        db_col = self._table.db_column_name(self._field.field_name)
+        opclass, values = self._prepare(interface)
+
+        op = opclass.op
+        if values is None:
+            values = tuple()
+        elif opclass.op_comp:
+            op = opclass.op_comp(op, values)
 
         return (
             f'\"{self._table.db_name()}\".\"{db_col}\" {op}',
@@ -192,11 +221,139 @@ class QueryFilter(_QueryItemBase):
         )
 
 
+    @override()
+    def shape_and_values(self, interface) -> tuple:
+        """
+        The SQL for a filter only depends on the column, the operator
+        and how many values it binds (e.g. the placeholders in IN)
+        """
+        _, values = self._prepare(interface)
+        count = -1 if values is None else len(values)
+        return (
+            (self._table, self._field.field_name, self._operator, count),
+            values or tuple()
+        )
+
+
+class _Keyset(_QueryItemBase):
+    """
+    Rows that come after a given set of key values in the ordering,
+    compared as a whole, ``(a, b) > (?, ?)``. See Query.after()
+    """
+    def __init__(self, table, field_names: tuple, values: tuple, descending: bool):
+        _QueryItemBase.__init__(self)
+        self._table = table
+        self._field_names = field_names
+        self._values = values
+        self._descending = descending
+
+
+    def _prepared_values(self) -> tuple:
+        return tuple(
+            self._table.get_field(name).prep_for_db(value)
+            for name, value in zip(self._field_names, self._values)
+        )
+
+
+    @override()
+    def sql(self, interface) -> tuple:
+        table = self._table.db_name()
+        columns = [
+            f'"{table}"."{self._table.db_column_name(name)}"'
+            for name in self._field_names
+        ]
+        op = '<' if self._descending else '>'
+
+        if len(columns) == 1:
+            return f'{columns[0]} {op} ?', self._prepared_values()
+
+        placeholders = ', '.join('?' * len(columns))
+        return (
+            f'({", ".join(columns)}) {op} ({placeholders})',
+            self._prepared_values()
+        )
+
+
+    @override()
+    def shape_and_values(self, interface) -> tuple:
+        return (
+            ('keyset', self._table, self._field_names, self._descending),
+            self._prepared_values()
+        )
+
+
+# -- Aggregates
+
+class _Aggregate(object):
+    """
+    A SQL aggregate function over a column, for ``Query.aggregate()``
+    and ``Query.annotate()``
+    """
+    function = None
+
+    # function -> _Aggregate subclass
+    registry = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.function:
+            _Aggregate.registry[cls.function] = cls
+
+
+    def __init__(self, field: (str, None) = None, distinct: bool = False):
+        self._field = field
+        self._distinct = distinct
+
+
+    def sql(self, table, alias: str = None) -> str:
+        """
+        :param table: The _TableLayout we're aggregating over
+        :param alias: Name the rows are selected from, if not the table
+        :return: str
+        """
+        if self._field is None:
+            if self.function != 'COUNT':
+                raise ValueError(f'{type(self).__name__} requires a field')
+            column = '*'
+        else:
+            column = f'"{alias or table.db_name()}".' \
+                     f'"{table.db_column_name(self._field)}"'
+
+        distinct = 'DISTINCT ' if self._distinct else ''
+        return f'{self.function}({distinct}{column})'
+
+
+class Count(_Aggregate):
+    function = 'COUNT'
+
+
+class Sum(_Aggregate):
+    function = 'SUM'
+
+
+class Avg(_Aggregate):
+    function = 'AVG'
+
+
+class Min(_Aggregate):
+    function = 'MIN'
+
+
+class Max(_Aggregate):
+    function = 'MAX'
+
+
 class Query(object):
     """
     Query utilities for the data layer. This is where we can construct
-    and insert filters as required for various objects. Currently, we
-    don't have any kind of caching but that could be arranged.
+    and insert filters as required for various objects.
+
+    Two caches sit behind it. The SQL text for a set of filters is kept
+    on the database by their shape (the fields and operators, not the
+    values) so repeat queries skip building it. With
+    ``enable_query_cache()`` the rows themselves are cached too, until a
+    write through the data layer touches one of the tables they came
+    from (see ``hivemind.data.cache``).
 
     This object supports the lazy loading of items because, while building
     it, unless a specific execution function is called (e.g. count()),
@@ -219,14 +376,35 @@ class Query(object):
         # Basic equalative filtering on local fields
         quick_local_query = my_query.filter(some_field="foo")
 
+        # Statistics in a single statement
+        stats = my_query.aggregate(total=Count(), top=Max('some_field'))
+
+        # ...or per group
+        per_status = database.new_query(NodeRegister) \\
+            .annotate(nodes=Count()).values('status')
+
+        # Newest first, a page at a time
+        page = my_query.order_by('-id').limit(50)
+        next_page = page.after(page.objects()[-1])
+
+        # Pull foreign keys in with a JOIN rather than a query
+        # per instance
+        with_nodes = database.new_query(NodeMeta).select_related('node')
+
+        # ...or with one IN (...) query per relation
+        with_nodes = database.new_query(NodeMeta).prefetch_related('node')
+
     """
     AND = QueryAnd
     OR = QueryOr
 
+    # Most primary keys we'll look up in a single prefetch query
+    PREFETCH_CHUNK_SIZE = 500
+
     def __init__(self, cls, filters=None, database=None, **eq_filters):
 
         self._cls = cls
-        self._filters = filters or []
+        self._filters = list(filters or [])
 
         for field_name, value in eq_filters.items():
             field = self._cls.get_field(field_name)
@@ -234,6 +412,18 @@ class Query(object):
 
         self._database = database
 
+        # Foreign keys to load along with the objects
+        self._select_related = tuple()
+        self._prefetch_related = tuple()
+
+        # tuple(tuple(field_name:str, descending:bool),)
+        self._order_by = tuple()
+        self._limit = None
+        self._offset = None
+
+        # tuple(tuple(name:str, _Aggregate),) \see annotate()
+        self._annotations = tuple()
+
 
     def get_fiters(self) -> list:
         """
@@ -247,28 +437,180 @@ class Query(object):
         Filter this query a little bit
         :param query_item: The query filter that we want to add
         """
-        return Query(
+        query = Query(
             self._cls,
             filters=self._filters + ([query_item] if query_item else []),
             database=self._database,
             **eq_filters
         )
+        query._select_related = self._select_related
+        query._prefetch_related = self._prefetch_related
+        query._order_by = self._order_by
+        query._limit = self._limit
+        query._offset = self._offset
+        query._annotations = self._annotations
+        return query
+
+
+    def order_by(self, *fields) -> Query:
+        """
+        Sort the results. Prefix a field name with "-" for descending
+        order. Replaces any previous ordering.
+
+        .. code-block:: python
+
+            database.new_query(NodeRegister).order_by('status', '-name')
+
+        :param fields: Field names on our table
+        :return: Query
+        """
+        annotations = dict(self._annotations)
+
+        order = []
+        for field_name in fields:
+            descending = field_name.startswith('-')
+            field_name = field_name.lstrip('-')
+            if field_name not in annotations:
+                self._cls.get_field(field_name) # Raise if it doesn't exist
+            order.append((field_name, descending))
+
+        query = self.filter()
+        query._order_by = tuple(order)
+        return query
+
+
+    def limit(self, count: int) -> Query:
+        """
+        Return at most count rows
+        :return: Query
+        """
+        if count is not None and (not isinstance(count, int) or count < 0):
+            raise ValueError(f'Invalid limit: {count}')
+        query = self.filter()
+        query._limit = count
+        return query
+
+
+    def offset(self, count: int) -> Query:
+        """
+        Skip the first count rows. For deep pages, after() is much
+        cheaper as the database doesn't have to walk the skipped rows.
+        :return: Query
+        """
+        if count is not None and (not isinstance(count, int) or count < 0):
+            raise ValueError(f'Invalid offset: {count}')
+        query = self.filter()
+        query._offset = count or None
+        return query
+
+
+    def after(self, value) -> Query:
+        """
+        Keyset pagination. Only return rows that come after value in the
+        ordering (by primary key if there isn't one). Because the
+        ``IdField`` is time ordered, this pages through rows in the order
+        they were created.
+
+        .. code-block:: python
+
+            page = database.new_query(NodeMeta).limit(100).objects()
+            while page:
+                ...
+                page = database.new_query(NodeMeta).after(page[-1]) \\
+                                                   .limit(100).objects()
+
+        :param value: The last instance of the previous page or, when
+                      only ordered by primary key, it's primary key
+        :return: Query
+        """
+        pk_name = self._cls.pk_field().field_name
+        order = self._order_by or ((pk_name, False),)
+        if pk_name not in [name for name, _ in order]:
+            # Break ties so the order is total
+            order += ((pk_name, order[-1][1]),)
+
+        directions = set(descending for _, descending in order)
+        if len(directions) > 1:
+            raise ValueError(
+                'after() requires every order_by field to share a direction'
+            )
+
+        if isinstance(value, self._cls):
+            keys = tuple(self._key_value(value, name) for name, _ in order)
+        elif len(order) == 1:
+            keys = (value,)
+        else:
+            raise ValueError(
+                'after() requires an instance when ordered by more than '
+                'the primary key'
+            )
+
+        query = self.filter(_Keyset(
+            self._cls,
+            tuple(name for name, _ in order),
+            keys,
+            directions.pop()
+        ))
+        query._order_by = order
+        return query
+
+
+    def select_related(self, *fields) -> Query:
+        """
+        Load the given foreign keys in the same statement as the objects
+        themselves (LEFT JOIN). Accessing them afterwards doesn't touch
+        the database.
+
+        :param fields: Names of ForeignKeyFields on our table
+        :return: Query
+        """
+        query = self.filter()
+        query._select_related = self._select_related + self._fk_names(fields)
+        return query
+
+
+    def prefetch_related(self, *fields) -> Query:
+        """
+        Load the given foreign keys after the objects, with one
+        ``IN (...)`` query per relation (in chunks of
+        ``PREFETCH_CHUNK_SIZE``) rather than one query per object.
+
+        :param fields: Names of ForeignKeyFields on our table
+        :return: Query
+        """
+        query = self.filter()
+        query._prefetch_related = self._prefetch_related + self._fk_names(fields)
+        return query
 
 
     def sql(self) -> tuple:
         """
         Obtain the sql statement. This is augmented based on the
         database type.
+
+        The text is cached on the database by the shape of our filters
+        so repeated queries only have to gather their values.
+
         :return: tuple(sql_string, values)
         """
-        output = ''
-        values = tuple()
+        if not self._filters:
+            return ('', tuple())
 
         if len(self._filters) > 1:
-            output, values = self.AND(*self._filters).sql(self._database)
-        elif self._filters:
-            output, values = self._filters[0].sql(self._database)
-        return (output, values)
+            item = self.AND(*self._filters)
+        else:
+            item = self._filters[0]
+
+        cache = getattr(self._database, 'sql_cache', None)
+        if cache is None:
+            return item.sql(self._database)
+
+        shape, values = item.shape_and_values(self._database)
+        output = cache.get(shape)
+        if output is None:
+            output, _ = item.sql(self._database)
+            cache.put(shape, output)
+        return (output, tuple(values))
 
     # -- Execution Queries
 
@@ -277,12 +619,21 @@ class Query(object):
         Given a set of fields to lookup, snag the values of them and
         return them in the order listed
         """
+        if self._annotations:
+            full_sql, values, names = self._grouped_sql(fields)
+            rows = self._database.fetch_rows(
+                full_sql, values, (self._cls.db_name(),)
+            )
+            return [dict(zip(names, row)) for row in rows]
+
         sql_string, values = self.sql()
+        suffix, suffix_values = self._suffix_sql()
         return self._database.to_values(
             self._cls,
             sql_string,
-            values,
-            fields
+            values + suffix_values,
+            fields,
+            suffix=suffix
         )
 
 
@@ -300,13 +651,255 @@ class Query(object):
         Use this query to construct instances of the query class.
         :return: list[_TableLayout instances]
         """
+        self._check_not_annotated('objects')
         sql_string, values = self.sql()
-        return self._database.to_objects(
+        suffix, suffix_values = self._suffix_sql()
+        objects = self._database.to_objects(
             self._cls,
             sql_string,
-            values
+            values + suffix_values,
+            select_related=self._select_related,
+            suffix=suffix
+        )
+
+        return self._prefetch_all(objects)
+
+    def iterator(self, chunk_size: int = 1000):
+        """
+        Like objects() but instances are built as they're consumed,
+        ``chunk_size`` rows at a time, so scanning a large table runs in
+        constant memory.
+
+        .. code-block:: python
+
+            for node in database.new_query(NodeRegister).iterator():
+                ...
+
+        :return: Generator[_TableLayout instances]
+        """
+        self._check_not_annotated('iterator')
+        sql_string, values = self.sql()
+        suffix, suffix_values = self._suffix_sql()
+        objects = self._database.iter_objects(
+            self._cls,
+            sql_string,
+            values + suffix_values,
+            chunk_size=chunk_size,
+            select_related=self._select_related,
+            suffix=suffix
+        )
+
+        if not self._prefetch_related:
+            yield from objects
+            return
+
+        # Prefetch a chunk at a time
+        chunk = []
+        for instance in objects:
+            chunk.append(instance)
+            if len(chunk) >= chunk_size:
+                yield from self._prefetch_all(chunk)
+                chunk = []
+        if chunk:
+            yield from self._prefetch_all(chunk)
+
+
+    def values_iter(self, *fields, chunk_size: int = 1000):
+        """
+        Like values() but rows are pulled from the database as they're
+        consumed
+        :return: Generator[dict]
+        """
+        if self._annotations:
+            full_sql, values, names = self._grouped_sql(fields)
+            return (
+                dict(zip(names, row)) for row in
+                self._database._iter_rows(full_sql, values, chunk_size)
+            )
+
+        sql_string, values = self.sql()
+        suffix, suffix_values = self._suffix_sql()
+        return self._database.iter_values(
+            self._cls,
+            sql_string,
+            values + suffix_values,
+            fields,
+            chunk_size=chunk_size,
+            suffix=suffix
+        )
+
+
+    def to_columns(self, *fields, chunk_size: int = 10000, use_numpy: bool = None) -> dict:
+        """
+        Like values() but laid out by column, without building a dict
+        per row. Numeric columns are packed into ``array.array`` (or
+        numpy arrays)
+
+        .. code-block:: python
+
+            columns = database.new_query(NodeRegister).to_columns('id', 'port')
+            columns['port'] # -> array('q', [...])
+
+        :param fields: The fields (or annotations) to gather. Every
+                       column of the table when none are given
+        :return: dict[str, array.array|numpy.ndarray|list]
+        """
+        from hivemind.data import export
+        return export.to_columns(
+            self, *fields, chunk_size=chunk_size, use_numpy=use_numpy
+        )
+
+
+    def write_csv(self, fp, *fields, header: bool = True, chunk_size: int = 10000) -> int:
+        """
+        Stream the results out as csv
+        :param fp: File-like object opened for text
+        :return: The number of rows written
+        """
+        from hivemind.data import export
+        return export.write_csv(
+            self, fp, *fields, header=header, chunk_size=chunk_size
         )
 
+
+    def write_arrow(self, sink, *fields, chunk_size: int = 10000) -> int:
+        """
+        Stream the results out in the Arrow IPC stream format. Requires
+        pyarrow
+        :return: The number of rows written
+        """
+        from hivemind.data import export
+        return export.write_arrow(self, sink, *fields, chunk_size=chunk_size)
+
+
+    def explain(self, *fields) -> list:
+        """
+        The database's plan for this query, as objects() (or values()
+        when given fields) would run it. Handy for finding a missing
+        index.
+
+        .. code-block:: python
+
+            for line in my_query.filter(name='foo').explain():
+                print (line) # e.g. SEARCH my_table USING INDEX ...
+
+        :return: list[str] of the lines of the plan
+        """
+        if self._annotations:
+            full_sql, values, _ = self._grouped_sql(fields)
+            return self._database.explain(full_sql, values)
+
+        sql_string, values = self.sql()
+        suffix, suffix_values = self._suffix_sql()
+        if fields:
+            full_sql, _ = self._database._values_sql(self._cls, sql_string, fields)
+        else:
+            full_sql, _ = self._database._objects_sql(
+                self._cls, sql_string, self._select_related
+            )
+        return self._database.explain(full_sql + suffix, values + suffix_values)
+
+
+    def aggregate(self, **aggregates) -> dict:
+        """
+        Compute aggregates over every row this query matches (or the
+        slice of them, with limit/offset) in a single statement.
+
+        .. code-block:: python
+
+            stats = database.new_query(NodeRegister).aggregate(
+                nodes=Count(),
+                statuses=Count('status', distinct=True),
+                last_port=Max('port')
+            )
+
+        :param aggregates: name -> _Aggregate (Count, Sum, Avg, Min, Max)
+        :return: dict[name, value]
+        """
+        if not aggregates:
+            raise ValueError('aggregate() requires at least one aggregate')
+
+        table = self._cls.db_name()
+        sql_string, values = self.sql()
+        where = f' WHERE {sql_string}' if sql_string else ''
+
+        if self._limit is None and not self._offset:
+            source = f'"{table}"{where}'
+            alias = None
+        else:
+            # Only over the rows we'd return
+            suffix, suffix_values = self._suffix_sql()
+            source = f'(SELECT "{table}".* FROM "{table}"{where}{suffix}) ' \
+                     'AS "_sliced"'
+            alias = '_sliced'
+            values = values + suffix_values
+
+        selects = ', '.join(
+            f'{aggregate.sql(self._cls, alias)} AS "{name}"'
+            for name, aggregate in aggregates.items()
+        )
+        row = self._database.fetch_rows(
+            f'SELECT {selects} FROM {source}', values, (table,)
+        )[0]
+        return dict(zip(aggregates, row))
+
+
+    def annotate(self, **aggregates) -> Query:
+        """
+        Add aggregates to each row of values(), grouped by the fields
+        asked for there. Names given here may be used with order_by().
+
+        .. code-block:: python
+
+            database.new_query(NodeMeta) \\
+                .annotate(nodes=Count('node', distinct=True)) \\
+                .order_by('-nodes') \\
+                .values('key')
+            # [{ 'key' : 'os', 'nodes' : 1204 }, ...]
+
+        :param aggregates: name -> _Aggregate (Count, Sum, Avg, Min, Max)
+        :return: Query
+        """
+        for name in aggregates:
+            if name in self._cls._field_set:
+                raise ValueError(f'{name} conflicts with a field')
+
+        query = self.filter()
+        query._annotations = self._annotations + tuple(aggregates.items())
+        return query
+
+
+    def update(self, **fields) -> int:
+        """
+        Set fields on every row this query matches with a single
+        UPDATE statement. Instances already in memory aren't touched.
+
+        .. code-block:: python
+
+            database.new_query(NodeRegister, status='pending').update(
+                status='online'
+            )
+
+        :return: The number of rows changed
+        """
+        self._check_not_sliced('update')
+        sql_string, values = self.sql()
+        return self._database.update_where(
+            self._cls, sql_string, values, fields
+        )
+
+
+    def delete(self) -> int:
+        """
+        Remove every row this query matches with a single DELETE
+        statement
+        :return: The number of rows removed
+        """
+        self._check_not_sliced('delete')
+        sql_string, values = self.sql()
+        return self._database.delete_where(self._cls, sql_string, values)
+
+
     def get(self) -> _TableLayout:
         """
         Obtain a single item at the end of this query. Raise an error
@@ -336,6 +929,181 @@ class Query(object):
             return None
 
 
+    # -- Private Methods
+
+    def _suffix_sql(self) -> tuple:
+        """
+        :return: tuple(sql:str, values:tuple) for the ORDER BY and
+                 LIMIT/OFFSET that go after the WHERE clause
+        """
+        parts = []
+        values = tuple()
+
+        if self._order_by:
+            table = self._cls.db_name()
+            annotations = dict(self._annotations)
+            parts.append('ORDER BY ' + ', '.join(
+                (f'"{name}"' if name in annotations else
+                 f'"{table}"."{self._cls.db_column_name(name)}"') +
+                (' DESC' if descending else '')
+                for name, descending in self._order_by
+            ))
+
+        if self._limit is not None or self._offset:
+            limit_sql, values = self._database.limit_sql(
+                self._limit, self._offset
+            )
+            parts.append(limit_sql)
+
+        if not parts:
+            return '', values
+        return ' ' + ' '.join(parts), tuple(values)
+
+
+    def _grouped_sql(self, fields) -> tuple:
+        """
+        The SELECT for values() with annotations, grouped by the fields
+        :return: tuple(full_sql:str, values:tuple, names:list[str])
+        """
+        table = self._cls.db_name()
+
+        names = []
+        columns = []
+        for field in fields:
+            field_name = field if isinstance(field, str) else field.field_name
+            self._cls.get_field(field_name) # Raise if it doesn't exist
+            names.append(field_name)
+            columns.append(f'"{table}"."{self._cls.db_column_name(field_name)}"')
+
+        selects = columns + [
+            f'{aggregate.sql(self._cls)} AS "{name}"'
+            for name, aggregate in self._annotations
+        ]
+        names.extend(name for name, _ in self._annotations)
+
+        sql_string, values = self.sql()
+        full_sql = f'SELECT {", ".join(selects)} FROM "{table}"'
+        if sql_string:
+            full_sql += ' WHERE ' + sql_string
+        if columns:
+            full_sql += ' GROUP BY ' + ', '.join(columns)
+
+        suffix, suffix_values = self._suffix_sql()
+        return full_sql + suffix, values + suffix_values, names
+
+
+    def _column_chunks(self, fields, chunk_size: int) -> tuple:
+        """
+        Run the query for a columnar export
+        :return: tuple(names:list[str], sources:list[_Field|_Aggregate],
+                       chunks:Generator[list[tuple]])
+        """
+        if not fields:
+            fields = [name for name, _ in self._cls.columns()]
+
+        if self._annotations:
+            full_sql, values, names = self._grouped_sql(fields)
+            sources = [self._cls.get_field(n) for n in names[:len(fields)]]
+            sources.extend(aggregate for _, aggregate in self._annotations)
+        else:
+            table = self._cls.db_name()
+            names = []
+            sources = []
+            for field in fields:
+                field_name = field if isinstance(field, str) else field.field_name
+                names.append(field_name)
+                sources.append(self._cls.get_field(field_name))
+
+            sql_string, values = self.sql()
+            suffix, suffix_values = self._suffix_sql()
+            full_sql = 'SELECT ' + ', '.join(
+                f'"{table}"."{self._cls.db_column_name(n)}"' for n in names
+            ) + f' FROM "{table}"'
+            if sql_string:
+                full_sql += ' WHERE ' + sql_string
+            full_sql += suffix
+            values += suffix_values
+
+        chunks = self._database._iter_chunks(full_sql, values, chunk_size)
+        return names, sources, chunks
+
+
+    def _check_not_annotated(self, operation: str) -> None:
+        if self._annotations:
+            raise ValueError(
+                f'Cannot use {operation}() with annotate(), use values()'
+            )
+
+
+    def _check_not_sliced(self, operation: str) -> None:
+        if self._limit is not None or self._offset:
+            raise ValueError(f'Cannot {operation} with a limit or offset')
+
+
+    def _key_value(self, instance, field_name: str):
+        """
+        :return: The value of a field as stored, foreign keys by their
+                 primary key rather than loading the related row
+        """
+        if field_name in self._cls._fk_names:
+            return instance.__dict__.get(f'{field_name}_pk')
+        return getattr(instance, field_name)
+
+
+    def _fk_names(self, fields) -> tuple:
+        """
+        Verify that fields are foreign keys on our table
+        :return: tuple[str]
+        """
+        for field_name in fields:
+            self._cls.get_field(field_name) # Raises if missing
+            if field_name not in self._cls._fk_names:
+                raise TypeError(
+                    f'{self._cls.__name__}.{field_name} is not a foreign key'
+                )
+        return tuple(fields)
+
+
+    def _prefetch_all(self, objects: list) -> list:
+        """
+        Run every prefetch_related() lookup over objects
+        :return: objects
+        """
+        for field_name in self._prefetch_related:
+            self._prefetch(objects, field_name)
+        return objects
+
+
+    def _prefetch(self, objects: list, field_name: str) -> None:
+        """
+        Resolve one foreign key for all objects in bulk
+        """
+        related = self._cls.get_field(field_name).related_class
+        pk_name = f'{field_name}_pk'
+
+        waiting = [
+            o for o in objects
+            if not isinstance(o.__dict__.get(field_name), related)
+            and o.__dict__.get(pk_name) is not None
+        ]
+        keys = list({o.__dict__[pk_name] for o in waiting})
+        if not keys:
+            return
+
+        pk_field = related.pk_field()
+        found = {}
+        chunk_size = self.PREFETCH_CHUNK_SIZE
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            for instance in self._database.new_query(
+                    related, pk_field.one_of(chunk)).objects():
+                found[instance.pk_value] = instance
+
+        for o in waiting:
+            instance = found.get(o.__dict__[pk_name])
+            if instance is not None:
+                o.__dict__[field_name] = instance
+
     # -- Algorithms
 
     def _run_algo(self, algo: str, field: str = None) -> (int, float):
@@ -344,15 +1112,8 @@ class Query(object):
         :param algo: The algorithm to execute
         :return: int
         """
-        field_name = field or self._cls.pk()
-        table = self._cls.db_name()
-        sql_string, values = self.sql()
-        field_name = f'"{table}"."{field_name}"'
-
-        return self._database.execute(
-            f'SELECT {algo}({field_name}) FROM {table} WHERE {sql_string}',
-            values
-        ).fetchone()[0]
+        aggregate = _Aggregate.registry[algo](field or self._cls.pk_field().field_name)
+        return self.aggregate(result=aggregate)['result']
 
 
     def count(self) -> int:
@@ -65,8 +65,8 @@ class NodeMeta(_TableLayout):
     Table to assign metadata to nodes. This makes
 
     """
-    node = _Field.ForeignKeyField(NodeRegister)
-    key = _Field.TextField()
+    node = _Field.ForeignKeyField(NodeRegister, index=True)
+    key = _Field.TextField(index=True)
     value = _Field.TextField(null=True)
 
 
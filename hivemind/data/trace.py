@@ -0,0 +1,292 @@
+"""
+Copyright (c) 2019 Michael McCartney, Kevin McLoughlin
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+# --
+SQL tracing for the data layer.
+
+A ``SqlTracer`` on a database records every statement it runs (or a
+sample of them) as a fingerprint, the number of values bound to it and
+how long it took. For reads made through a ``Query`` that includes
+fetching the rows, which is where sqlite does most of the work. Raw
+``execute()`` calls only time the statement. Records land in a ring
+buffer and per-fingerprint totals feed a slow query report. Nothing is
+formatted until someone asks to see it.
+
+.. code-block:: python
+
+    tracer = database.enable_tracing(sample_rate=0.1, slow_threshold=0.05)
+
+    # ... later
+    print (tracer.report())
+
+Or from the settings:
+
+.. code-block:: python
+
+    DATABASE = {
+        ...
+        "trace_sql" : {
+            "capacity" : 1000,
+            "sample_rate" : 1.0,
+            "slow_threshold" : 0.1
+        }
+    }
+
+With the ``log_sql`` setting on, every statement is traced and logged.
+"""
+import re
+import time
+import random
+import logging
+import functools
+import threading
+
+from collections import deque
+from contextlib import contextmanager
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """
+    Reduce a statement to it's shape. Literals become ``?``, lists of
+    placeholders collapse and whitespace is squashed, so the same query
+    with different values (or a different number of them) comes out
+    the same.
+
+    :param sql: The statement
+    :return: str
+    """
+    shape = _STRINGS.sub('?', sql)
+    shape = _NUMBERS.sub('?', shape)
+    shape = _IN_LISTS.sub('(...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def pretty(sql: str) -> str:
+    """
+    :return: The statement formatted for reading. Needs sqlparse, the
+             statement is handed back as is without it
+    """
+    try:
+        import sqlparse
+    except ImportError: # pragma: no cover
+        return sql
+    return sqlparse.format(sql, reindent=True, keyword_case='upper')
+
+
+class TraceRecord(object):
+    """
+    A single statement that was run
+    """
+    __slots__ = ('sql', 'params', 'batch', 'duration', 'started')
+
+    def __init__(self, sql: str, params: int, batch: int, duration: float, started: float):
+        self.sql = sql
+        self.params = params
+        self.batch = batch
+        self.duration = duration
+        self.started = started
+
+
+    @property
+    def fingerprint(self) -> str:
+        return fingerprint(self.sql)
+
+
+    def format(self) -> str:
+        return (
+            f'-- {self.duration * 1000:.3f} ms, {self.params} values'
+            + (f' x {self.batch}' if self.batch != 1 else '') + '\n'
+            + pretty(self.sql)
+        )
+
+
+    def __repr__(self):
+        return f'<TraceRecord {self.duration * 1000:.3f} ms {self.fingerprint[:60]}>'
+
+
+class _ShapeStats(object):
+    __slots__ = ('count', 'total', 'slowest', 'sql', 'params')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+
+        # The latest statement of this shape, to explain it by
+        self.sql = None
+        self.params = 0
+
+
+class SqlTracer(object):
+    """
+    Records the statements a database runs.
+
+    :param capacity: The most recent records to keep
+    :param sample_rate: Fraction (0.0 to 1.0) of statements to trace
+    :param slow_threshold: Seconds beyond which a statement is logged
+                           as slow. None to never log them
+    :param log_statements: Log every traced statement
+    """
+    def __init__(self,
+                 capacity: int = 1000,
+                 sample_rate: float = 1.0,
+                 slow_threshold: float = None,
+                 log_statements: bool = False,
+                 logger=None):
+        self._records = deque(maxlen=capacity)
+        self._sample_rate = sample_rate
+        self._slow_threshold = slow_threshold
+        self._log_statements = log_statements
+        self._logger = logger or logging
+
+        self._lock = threading.Lock()
+        self._shapes = {} # fingerprint -> _ShapeStats
+
+        # Threads we've stopped tracing for now. \see paused()
+        self._local = threading.local()
+
+
+    @contextmanager
+    def paused(self):
+        """
+        Leave this thread's statements out while inside. For the ones we
+        run to look into the trace itself (e.g. plans)
+        """
+        was_paused = getattr(self._local, 'paused', False)
+        self._local.paused = True
+        try:
+            yield
+        finally:
+            self._local.paused = was_paused
+
+
+    def start(self) -> (float, None):
+        """
+        Called before a statement is run
+        :return: The time it started or None if we're not tracing it
+        """
+        if getattr(self._local, 'paused', False):
+            return None
+        if self._sample_rate < 1.0 and random.random() >= self._sample_rate:
+            return None
+        return time.perf_counter()
+
+
+    def finish(self, sql: str, params: int, started: float, batch: int = 1) -> None:
+        """
+        Called once a statement that start() picked is done
+        :param params: The number of values bound to the statement
+        :param batch: The number of sets of values (execute_many)
+        """
+        duration = time.perf_counter() - started
+        record = TraceRecord(sql, params, batch, duration, time.time())
+
+        shape = fingerprint(sql)
+        with self._lock:
+            self._records.append(record)
+            stats = self._shapes.get(shape)
+            if stats is None:
+                stats = self._shapes[shape] = _ShapeStats()
+            stats.count += 1
+            stats.total += duration
+            stats.sql = sql
+            stats.params = params
+            if duration > stats.slowest:
+                stats.slowest = duration
+
+        if self._log_statements:
+            self._logger.info(
+                f'SQL ({duration * 1000:.3f} ms, {params} values): {shape}'
+            )
+        elif self._slow_threshold is not None and duration >= self._slow_threshold:
+            self._logger.warning(
+                f'Slow SQL ({duration * 1000:.3f} ms): {shape}'
+            )
+
+
+    def finish_many(self, sql: str, rows, started: float) -> None:
+        """
+        finish() for a statement run with many sets of values
+        """
+        if isinstance(rows, (list, tuple)):
+            params = len(rows[0]) if rows else 0
+            batch = len(rows)
+        else:
+            params = batch = 0 # Already consumed, we can't tell
+        self.finish(sql, params, started, batch=batch)
+
+
+    def records(self) -> list:
+        """
+        :return: list[TraceRecord] oldest first
+        """
+        with self._lock:
+            return list(self._records)
+
+
+    def slow_queries(self, limit: int = 10) -> list:
+        """
+        The query shapes we've spent the most time in. Lots of quick
+        runs of one shape is usually an N+1 pattern.
+        :return: list[dict] with the fingerprint, count, total, mean
+                 and max (in seconds) of each along with the latest
+                 statement (sql) and it's number of values (params)
+        """
+        with self._lock:
+            output = [{
+                'fingerprint' : shape,
+                'count' : stats.count,
+                'total' : stats.total,
+                'mean' : stats.total / stats.count,
+                'max' : stats.slowest,
+                'sql' : stats.sql,
+                'params' : stats.params
+            } for shape, stats in self._shapes.items()]
+
+        output.sort(key=lambda e: e['total'], reverse=True)
+        return output[:limit]
+
+
+    def report(self, limit: int = 10) -> str:
+        """
+        :return: Human readable slow query report
+        """
+        lines = []
+        for entry in self.slow_queries(limit):
+            lines.append(
+                f"-- {entry['count']} x, {entry['total'] * 1000:.3f} ms total, "
+                f"{entry['mean'] * 1000:.3f} ms mean, {entry['max'] * 1000:.3f} ms max"
+            )
+            lines.append(pretty(entry['fingerprint']))
+            lines.append('')
+        return '\n'.join(lines)
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._shapes = {}
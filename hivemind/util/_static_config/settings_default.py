@@ -47,16 +47,84 @@ TEMPLATE_DIRS = [
 HIVE_KEY = "{_hive_key}"
 
 
+# -- Where the root keeps it's tables. "type" is either "sqlite" or
+#    "postgres". The optional keys each integration understands are
+#    listed below
 DATABASE = { # Probably multiple in the future
     "name" : ":memory:",
     "type" : "sqlite",
-    "location" : HIVE_ROOT # ??
+    "location" : HIVE_ROOT, # ??
+
+    # -- postgres: "host", "port", "user", "password" (or a "dsn") and
+    #    "max_connections"
+
+    # -- sqlite: "synchronous", "cache_size", "mmap_size" and
+    #    "busy_timeout" (or a "pragmas" dict) tune every connection.
+    #    File databases are opened in WAL mode with a reader per thread
+
+    # -- "async_workers": How many threads serve the root's web handlers
+
+    # -- "query_cache": Dict with "maxsize" and "ttl" keys. Caches the
+    #    results of reads
+
+    # -- "migrations": Dict with "batch_size" and "pause" keys. Existing
+    #    tables are migrated at start up, these pace the rows copied per
+    #    transaction
+
+    # -- "group_commit": Dict with "interval" and "max_size" keys. Lets
+    #    the transactions of many threads share one commit. File based
+    #    sqlite only, it's ignored with a warning otherwise
+
+    # -- "trace_sql": Dict with "capacity", "sample_rate" and
+    #    "slow_threshold" keys. Records statements for a slow query
+    #    report. The root serves it at /api/db/profile
+}
+
+# -- Durable message log at the root. Set to a dict with "location",
+#    "segment_size" and "commit_interval" keys to survive restarts
+#    without dropping messages in flight. A subscription that hasn't
+#    registered for "cursor_ttl" seconds (a week by default) is no
+#    longer held on to
+MESSAGE_LOG = None
+
+# -- At-least-once delivery. Each subscription may have up to "window"
+#    unacknowledged messages, which are sent again after "ack_timeout"
+#    seconds. Rejected messages are sent again after "backoff" seconds,
+#    doubling each time up to "max_backoff". After "max_attempts" (None
+#    retries forever) we give up on a message
+DELIVERY = {
+    "window" : 32,
+    "ack_timeout" : 5.0,
+    "max_attempts" : 10,
+    "backoff" : 0.5,
+    "max_backoff" : 30.0
+}
+
+# -- Nodes heartbeat to the root every "interval" seconds. The root
+#    marks a node offline once it's suspicion (phi) of the node passes
+#    "phi_threshold". Lower thresholds detect failures faster at the
+#    cost of more false alarms
+HEARTBEAT = {
+    "interval" : 1.0,
+    "phi_threshold" : 8.0,
+    "acceptable_pause" : 0.0
 }
 
 HIVEMIND_EPOCH = datetime({:raw:__import__('datetime').datetime.now().year}, 1, 1, 0, 0, 0, 0, tzinfo=timezone.utc)
 
+# -- Ids are unique per shard (0 to 8191). Give every process that
+#    writes to the same database it's own. A forked child keeps the
+#    parent's shard, so call IdField.set_shard_id() in it before
+#    creating any rows (a warning is logged otherwise)
+HIVE_SHARD_ID = 1
+
 HIVE_DEFAULT_PORT = 9467
 
+# -- Nodes on the same host as the root receive messages through
+#    shared memory rather than HTTP
+SHM_TRANSPORT = False
+SHM_TRANSPORT_SIZE = 4 * 1024 * 1024
+
 # -- Enabled Features
 HIVE_FEATURES = []
 
@@ -72,6 +140,10 @@ global_settings.set({
     'hive_controller' : (HIVE_CONTROLLER_LOCATION, HIVE_CONTROLLER_CLASS),
     'default_port' : HIVE_DEFAULT_PORT,
 
+    # -- Transport
+    'shm_transport' : SHM_TRANSPORT,
+    'shm_transport_size' : SHM_TRANSPORT_SIZE,
+
     # -- Logging
     'log_location' : LOG_LOCATION,
     'log_max_bytes_size' : LOG_MAX_BYTE_SIZE,
@@ -87,6 +159,10 @@ global_settings.set({
     # -- Data Layer
     'database' : DATABASE,
     'hive_epoch' : HIVEMIND_EPOCH,
+    'hive_shard_id' : HIVE_SHARD_ID,
+    'message_log' : MESSAGE_LOG,
+    'delivery' : DELIVERY,
+    'heartbeat' : HEARTBEAT,
 
     # -- Additional Features
     'hive_features' : HIVE_FEATURES
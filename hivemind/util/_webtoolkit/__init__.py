@@ -123,9 +123,68 @@ class API(object):
         return web.json_response(res)
 
 
-def api_request(path, controller, querydict):
+def db_profile(controller, querydict, method: str = 'GET'):
+    """
+    Report on the time the controller's database has spent per query
+    shape. Requires tracing (the ``trace_sql`` database setting)
+
+    .. code-block:: text
+
+        GET /api/db/profile?limit=20
+
+        # With the plan of the latest statement of each SELECT shape
+        GET /api/db/profile?explain=1
+
+        # Start over, once the report is taken
+        POST /api/db/profile?reset=1
+
+    :param method: The HTTP method. Only a POST may reset
+    :return: web.Response with the json report
+    """
+    database = controller.database
+    tracer = getattr(database, 'tracer', None)
+
+    reset = bool(querydict.get('reset'))
+    if reset and method != 'POST':
+        raise web.HTTPMethodNotAllowed(method, ['POST'])
+
+    if tracer is None:
+        return web.json_response({'enabled' : False, 'shapes' : []})
+
+    try:
+        limit = int(querydict.get('limit', 20))
+    except ValueError:
+        raise web.HTTPBadRequest(text='limit must be an integer')
+
+    shapes = tracer.slow_queries(limit)
+    if querydict.get('explain'):
+        # The plans aren't part of the workload we're reporting on
+        with tracer.paused():
+            for shape in shapes:
+                shape['plan'] = None
+                head = shape['sql'].lstrip()[:6].upper()
+                if not head.startswith(('SELECT', 'WITH')):
+                    continue
+                try:
+                    # Values don't change the shape of the plan
+                    shape['plan'] = database.explain(
+                        shape['sql'], (None,) * shape['params']
+                    )
+                except Exception:
+                    pass # Not something we can explain
+
+    if reset:
+        tracer.clear()
+
+    return web.json_response({'enabled' : True, 'shapes' : shapes})
+
+
+def api_request(path, controller, querydict, method: str = 'GET'):
     """
     Run an api request based on the query information
     """
     if path.startswith('render/'):
         return API.query_renderable(path[7:], controller, querydict)
+    if path == 'db/profile':
+        return db_profile(controller, querydict, method)
+    raise web.HTTPNotFound(text=f'Unknown api: {path}')
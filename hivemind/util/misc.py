@@ -26,7 +26,9 @@ import shlex
 import shutil
 import socket
 import tempfile
+import threading
 import subprocess
+from collections import OrderedDict
 from contextlib import contextmanager
 from typing import TypeVar, Generic, Callable, Generator, Optional
 
@@ -248,6 +250,67 @@ def requests_retry_session(
     session.mount('https://', adapter)
     return session
 
+
+class LRUCache(object):
+    """
+    Small, thread safe, least recently used cache.
+
+    .. code-block:: python
+
+        cache = LRUCache(256)
+        value = cache.get(key)
+        if value is None:
+            value = cache.put(key, expensive(key))
+    """
+    def __init__(self, maxsize: int = 128):
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+
+    def put(self, key, value):
+        """
+        :return: The value, for convenience
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+        return value
+
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
 # -- Metaclasses
 
 class SimpleRegistry(type):
@@ -0,0 +1,89 @@
+"""
+Benchmark for IdField generation across threads and processes.
+
+    python tests/benchmarks/bench_ids.py [--count 1000000] [--workers 4]
+
+Every process gets it's own shard. Ids are checked for collisions once
+they're all in.
+"""
+import os
+import sys
+import time
+import array
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime, timezone
+
+TEST_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(TEST_BASE_DIR))
+
+from hivemind.util import global_settings
+
+global_settings.set({
+    'hive_epoch' : datetime(2019, 1, 1, tzinfo=timezone.utc)
+})
+
+from hivemind.data.abstract.field import _Field
+
+
+def _generate(count: int) -> array.array:
+    build = _Field.IdField._build_id
+    return array.array('q', (build() for _ in range(count)))
+
+
+def _process_worker(shard_and_count) -> bytes:
+    shard_id, count = shard_and_count
+    _Field.IdField.set_shard_id(shard_id)
+    return _generate(count).tobytes()
+
+
+def _report(label: str, ids: array.array, elapsed: float) -> None:
+    unique = len(set(ids))
+    print(f'{label:<28} {len(ids) / elapsed:14,.0f} ids/s'
+          f'  ({len(ids) - unique} collisions)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    per_worker = args.count // args.workers
+
+    start = time.perf_counter()
+    ids = _generate(args.count)
+    _report('1 thread', ids, time.perf_counter() - start)
+
+    results = []
+    def _thread():
+        results.append(_generate(per_worker))
+
+    threads = [threading.Thread(target=_thread) for _ in range(args.workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    ids = array.array('q')
+    for result in results:
+        ids.extend(result)
+    _report(f'{args.workers} threads', ids, elapsed)
+
+    with multiprocessing.Pool(args.workers) as pool:
+        start = time.perf_counter()
+        chunks = pool.map(
+            _process_worker,
+            [(shard + 2, per_worker) for shard in range(args.workers)]
+        )
+        elapsed = time.perf_counter() - start
+    ids = array.array('q')
+    for chunk in chunks:
+        ids.frombytes(chunk)
+    _report(f'{args.workers} processes', ids, elapsed)
+
+
+if __name__ == '__main__':
+    main()
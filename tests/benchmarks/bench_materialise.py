@@ -0,0 +1,82 @@
+"""
+Benchmark for building model instances out of query results.
+
+    python tests/benchmarks/bench_materialise.py [--rows 100000]
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timezone
+
+TEST_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(TEST_BASE_DIR))
+
+from hivemind.util import global_settings
+
+global_settings.set({
+    'hive_epoch' : datetime(2019, 1, 1, tzinfo=timezone.utc)
+})
+
+from hivemind.data.abstract.field import _Field
+from hivemind.data.tables import NodeRegister
+from hivemind.data.contrib.sqlite_interface import SQLiteInterface
+
+
+def _timed(label, func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{label:<28} {best * 1000:10.1f} ms')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    interface = SQLiteInterface()
+    interface.connect(name=':memory:')
+    try:
+        interface._create_table(NodeRegister)
+
+        rows = [
+            (_Field.IdField._build_id(), f'node_{i}', 'online', '127.0.0.1', 9000 + i)
+            for i in range(args.rows)
+        ]
+        with interface.transaction:
+            interface.get_db_cursor().executemany(
+                f'INSERT INTO {NodeRegister.db_name()} VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+
+        print(f'NodeRegister x {args.rows}')
+        query = interface.new_query(NodeRegister)
+
+        _timed('fetch rows (raw)', lambda: interface.execute(
+            f'SELECT * FROM {NodeRegister.db_name()}'
+        ).fetchall(), args.repeat)
+
+        objects = _timed('objects()', query.objects, args.repeat)
+
+        def _read():
+            total = 0
+            for node in objects:
+                total += node.port
+                node.name
+                node.status
+            return total
+
+        _timed('read 3 columns', _read, args.repeat)
+    finally:
+        interface.disconnect()
+
+
+if __name__ == '__main__':
+    main()
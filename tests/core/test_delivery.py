@@ -0,0 +1,131 @@
+"""
+Tests for at-least-once delivery bookkeeping
+"""
+import time
+import threading
+import unittest
+
+from hivemind.core.delivery import DeliveryTracker, Acknowledger
+
+
+class _Dispatch(object):
+    def __init__(self, offset):
+        self.offset = offset
+
+
+class TestDeliveryTracker(unittest.TestCase):
+
+    def test_window(self):
+        """
+        Only window messages may be in flight. Acks make room for
+        the backlog
+        """
+        tracker = DeliveryTracker(window=2)
+        dispatches = [_Dispatch(i) for i in range(4)]
+
+        self.assertEqual(
+            [tracker.reserve('/a', d) for d in dispatches],
+            [True, True, False, False]
+        )
+        self.assertEqual(tracker.in_flight('/a'), 2)
+        self.assertEqual(tracker.low_water('/a'), 0)
+
+        released = tracker.acknowledge('/a', [0])
+        self.assertEqual(released, [dispatches[2]])
+        self.assertTrue(tracker.reserve('/a', dispatches[2]))
+        self.assertEqual(tracker.low_water('/a'), 1)
+
+        # Other endpoints have their own window
+        self.assertTrue(tracker.reserve('/b', dispatches[0]))
+
+
+    def test_redelivery(self):
+        """
+        Messages that time out or are rejected come back around
+        """
+        tracker = DeliveryTracker(window=4, ack_timeout=0.01, max_attempts=2, backoff=0.01)
+        d = _Dispatch(7)
+        tracker.reserve('/a', d)
+
+        self.assertEqual(tracker.reject('/a', [7]), [])
+        self.assertEqual(tracker.reject('/a', [8]), [])
+
+        time.sleep(0.02)
+        retry, dropped = tracker.expired()
+        self.assertEqual(retry, [('/a', d)])
+        self.assertEqual(dropped, [])
+
+        # Sending it again uses up the last attempt
+        tracker.reserve('/a', d)
+        time.sleep(0.02)
+        retry, dropped = tracker.expired()
+        self.assertEqual(retry, [])
+        self.assertEqual(dropped, [('/a', d)])
+        self.assertIsNone(tracker.low_water('/a'))
+
+
+    def test_reject_backoff(self):
+        """
+        Rejected messages wait longer with each attempt and are given
+        up on once they've used them all
+        """
+        tracker = DeliveryTracker(window=4, max_attempts=3, backoff=0.02)
+        d = _Dispatch(1)
+        tracker.reserve('/a', d)
+
+        # Not right away
+        self.assertEqual(tracker.reject('/a', [1]), [])
+        self.assertEqual(tracker.expired(), ([], []))
+        time.sleep(0.03)
+        self.assertEqual(tracker.expired()[0], [('/a', d)])
+
+        # Twice as long the second time
+        tracker.reserve('/a', d)
+        self.assertEqual(tracker.reject('/a', [1]), [])
+        time.sleep(0.03)
+        self.assertEqual(tracker.expired(), ([], []))
+        time.sleep(0.02)
+        self.assertEqual(tracker.expired()[0], [('/a', d)])
+
+        tracker.reserve('/a', d)
+        self.assertEqual(tracker.reject('/a', [1]), [d])
+        self.assertIsNone(tracker.low_water('/a'))
+
+
+class TestAcknowledger(unittest.TestCase):
+
+    def test_batches_results(self):
+        """
+        Results are sent back in batches with failures reported
+        as nacks
+        """
+        sent = []
+        done = threading.Event()
+
+        def _deliver(path, data):
+            if data == 'bad':
+                raise ValueError('bad payload')
+
+        def _send(acks, nacks):
+            sent.append((acks, nacks))
+            done.set()
+
+        acknowledger = Acknowledger(_deliver, _send, flush_interval=0.05)
+        try:
+            acknowledger.submit('/a', 'good', 1)
+            acknowledger.submit('/a', 'bad', 2)
+            acknowledger.complete('/b', 3, True)
+            self.assertTrue(done.wait(2.0))
+        finally:
+            acknowledger.shutdown()
+
+        acks = {}
+        nacks = {}
+        for a, n in sent:
+            for k, v in a.items():
+                acks.setdefault(k, []).extend(v)
+            for k, v in n.items():
+                nacks.setdefault(k, []).extend(v)
+
+        self.assertEqual(acks, {'/a' : [1], '/b' : [3]})
+        self.assertEqual(nacks, {'/a' : [2]})
@@ -0,0 +1,61 @@
+"""
+Tests for the heartbeat failure detector
+"""
+import unittest
+
+from hivemind.core.liveness import FailureDetector
+
+
+class TestFailureDetector(unittest.TestCase):
+
+    def _steady(self, detector, name, beats, interval=1.0):
+        now = 0.0
+        for _ in range(beats):
+            detector.heartbeat(name, now=now)
+            now += interval
+        return now - interval
+
+
+    def test_phi_grows_with_silence(self):
+        """
+        The longer a node is quiet, the more we suspect it
+        """
+        detector = FailureDetector(interval=1.0, threshold=8.0)
+        last = self._steady(detector, 'a', 20)
+
+        phis = [detector.phi('a', now=last + t) for t in (0.5, 1.0, 2.0, 4.0)]
+        self.assertEqual(phis, sorted(phis))
+        self.assertTrue(phis[0] < 1.0)
+
+        self.assertEqual(detector.suspects(now=last + 1.0), [])
+        self.assertEqual(detector.suspects(now=last + 4.0), ['a'])
+
+
+    def test_threshold_controls_latency(self):
+        """
+        A lower threshold gives up on a node sooner
+        """
+        fast = FailureDetector(interval=1.0, threshold=1.0)
+        slow = FailureDetector(interval=1.0, threshold=16.0)
+        last = self._steady(fast, 'a', 20)
+        self._steady(slow, 'a', 20)
+
+        self.assertEqual(fast.suspects(now=last + 2.0), ['a'])
+        self.assertEqual(slow.suspects(now=last + 2.0), [])
+
+
+    def test_heartbeat_and_forget(self):
+        """
+        Heartbeats clear suspicion and forgotten nodes aren't tracked
+        """
+        detector = FailureDetector(interval=1.0)
+        self.assertTrue(detector.heartbeat('a', now=0.0))
+        self.assertFalse(detector.heartbeat('a', now=1.0))
+
+        self.assertEqual(detector.suspects(now=30.0), ['a'])
+        detector.heartbeat('a', now=30.0)
+        self.assertEqual(detector.suspects(now=30.5), [])
+
+        detector.forget('a')
+        self.assertEqual(detector.phi('a', now=100.0), 0.0)
+        self.assertEqual(detector.phi('unknown'), 0.0)
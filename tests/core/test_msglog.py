@@ -0,0 +1,135 @@
+"""
+Tests for the durable message log
+"""
+import os
+import unittest
+
+from hivemind.util.misc import temp_dir
+from hivemind.core.msglog import MessageLog
+
+
+class TestMessageLog(unittest.TestCase):
+
+    def test_append_and_read(self):
+        """
+        Records come back in order with their offsets
+        """
+        with temp_dir() as d:
+            log = MessageLog(d)
+            try:
+                offsets = [log.append({'i' : i}) for i in range(10)]
+                self.assertEqual(offsets, sorted(offsets))
+                self.assertTrue(log.wait_durable(offsets[-1], timeout=5.0))
+
+                records = list(log.read_from(offsets[4]))
+                self.assertEqual([r['i'] for _, r in records], list(range(4, 10)))
+                self.assertEqual([o for o, _ in records], offsets[4:])
+            finally:
+                log.close()
+
+
+    def test_rotation_and_recovery(self):
+        """
+        Segments roll over and we pick up where we left off after
+        a restart, cursors included
+        """
+        with temp_dir() as d:
+            log = MessageLog(d, segment_size=256)
+            offsets = [log.append({'value' : 'x' * 20, 'i' : i}) for i in range(20)]
+            log.acknowledge('/sub/node/a', offsets[9])
+            log.close()
+
+            segments = [n for n in os.listdir(d) if n.endswith('.log')]
+            self.assertTrue(len(segments) > 1)
+
+            log = MessageLog(d, segment_size=256)
+            try:
+                self.assertEqual(log.cursor('/sub/node/a'), offsets[10])
+                missed = [r['i'] for _, r in log.read_from(log.cursor('/sub/node/a'))]
+                self.assertEqual(missed, list(range(10, 20)))
+
+                # New records continue after the old ones
+                self.assertEqual(log.append({'i' : 20}), log.next_offset(offsets[-1]))
+            finally:
+                log.close()
+
+
+    def test_truncate_acknowledged_segments(self):
+        """
+        Segments everyone has moved past are removed
+        """
+        with temp_dir() as d:
+            log = MessageLog(d, segment_size=128)
+            try:
+                offsets = [log.append({'i' : i}) for i in range(30)]
+                log.acknowledge('a', offsets[-1])
+                log.wait_durable(log.append({'i' : 30}), timeout=5.0)
+                log.close()
+
+                segments = [n for n in os.listdir(d) if n.endswith('.log')]
+                self.assertEqual(len(segments), 1)
+            finally:
+                log.close()
+
+
+    def test_truncate_without_subscribers(self):
+        """
+        Nobody left to deliver to means nothing to keep
+        """
+        with temp_dir() as d:
+            log = MessageLog(d, segment_size=128)
+            try:
+                log.acknowledge('a', log.append({'i' : 0}))
+                for i in range(30):
+                    log.append({'i' : i})
+                log.forget('a')
+                log.wait_durable(log.append({'i' : 30}), timeout=5.0)
+                log.close()
+
+                segments = [n for n in os.listdir(d) if n.endswith('.log')]
+                self.assertEqual(len(segments), 1)
+            finally:
+                log.close()
+
+
+    def test_read_while_truncating(self):
+        """
+        A reader whose segments are removed from under it carries on
+        from the oldest one left
+        """
+        with temp_dir() as d:
+            log = MessageLog(d, segment_size=128)
+            try:
+                offsets = [log.append({'i' : i}) for i in range(30)]
+                reader = log.read_from(offsets[0])
+                self.assertEqual(next(reader)[1]['i'], 0)
+
+                log.acknowledge('a', offsets[25])
+                log._flush()
+
+                rest = [r['i'] for _, r in reader]
+                self.assertEqual(rest, sorted(rest))
+                self.assertEqual(rest[-1], 29)
+                self.assertNotIn(1, rest)
+            finally:
+                log.close()
+
+
+    def test_expire(self):
+        """
+        Cursors nobody has touched in a while stop holding the log
+        back, unless we're asked to keep them
+        """
+        with temp_dir() as d:
+            log = MessageLog(d)
+            try:
+                offset = log.append({'i' : 0})
+                log.acknowledge('gone', offset)
+                log.acknowledge('kept', offset)
+
+                self.assertEqual(log.expire(set(), 60.0), [])
+                self.assertEqual(log.expire({'kept'}, 0.0), ['gone'])
+                self.assertIsNone(log.cursor('gone'))
+                self.assertIsNotNone(log.cursor('kept'))
+            finally:
+                log.close()
@@ -0,0 +1,73 @@
+"""
+Tests for subscription payload predicates
+"""
+import unittest
+
+from hivemind.core.predicate import compile_predicate
+
+
+class TestPredicate(unittest.TestCase):
+
+    def test_empty(self):
+        """
+        No clause, nothing to check
+        """
+        self.assertIsNone(compile_predicate(None))
+        self.assertIsNone(compile_predicate({}))
+
+
+    def test_equality_and_ranges(self):
+        """
+        Plain values are equality checks and operators stack up
+        """
+        match = compile_predicate({
+            'site' : 'north',
+            'reading.temp' : { 'gt_or_eq' : 30, 'lt' : 45 },
+        })
+        self.assertTrue(match({'site' : 'north', 'reading' : {'temp' : 30}}))
+        self.assertFalse(match({'site' : 'north', 'reading' : {'temp' : 45}}))
+        self.assertFalse(match({'site' : 'south', 'reading' : {'temp' : 35}}))
+
+        # Missing fields and mismatched types never match
+        self.assertFalse(match({'site' : 'north'}))
+        self.assertFalse(match({'site' : 'north', 'reading' : {'temp' : 'hot'}}))
+        self.assertFalse(match('not a dict'))
+
+
+    def test_membership_and_strings(self):
+        match = compile_predicate({
+            'kind' : { 'one_of' : ['storm', 'hail'] },
+            'name' : { 'startswith' : 'st' },
+            'tags.0' : { 'not_one_of' : ['test'] },
+            'extra' : { 'is_null' : True },
+        })
+        payload = {'kind' : 'storm', 'name' : 'station', 'tags' : ['live']}
+        self.assertTrue(match(payload))
+        self.assertFalse(match(dict(payload, kind='rain')))
+        self.assertFalse(match(dict(payload, tags=['test'])))
+        self.assertFalse(match(dict(payload, extra=1)))
+
+        # The operand counts
+        self.assertTrue(compile_predicate({'extra' : { 'is_null' : False }})({'extra' : 1}))
+        self.assertFalse(compile_predicate({'extra' : { 'is_null' : False }})({}))
+        self.assertTrue(compile_predicate({'extra' : { 'is_not_null' : False }})({}))
+        self.assertFalse(compile_predicate({'extra' : { 'is_not_null' : True }})({'extra' : None}))
+
+
+    def test_groups(self):
+        match = compile_predicate({
+            'or' : [
+                { 'level' : { 'gt' : 3 } },
+                { 'and' : [{ 'level' : 1 }, { 'force' : True }] },
+            ]
+        })
+        self.assertTrue(match({'level' : 4}))
+        self.assertTrue(match({'level' : 1, 'force' : True}))
+        self.assertFalse(match({'level' : 1}))
+
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            compile_predicate({'a' : { 'near' : 1 }})
+        with self.assertRaises(ValueError):
+            compile_predicate({'or' : { 'a' : 1 }})
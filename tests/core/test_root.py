@@ -0,0 +1,175 @@
+"""
+Tests for the RootController's bookkeeping, without the web server
+"""
+import queue
+import asyncio
+import datetime
+import unittest
+import threading
+
+from aiohttp import web
+
+from hivemind.util import global_settings
+from hivemind.util.misc import temp_dir
+
+if global_settings.get('hive_epoch') is None:
+    global_settings.set({
+        'hive_epoch' : datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+    })
+if global_settings.get('default_port') is None:
+    global_settings.set({ 'default_port' : 9467 })
+if global_settings.get('hive_features') is None:
+    global_settings.set({ 'hive_features' : [] })
+
+from hivemind.core.root import RootController
+from hivemind.core.node import NodeSubscriptionHandler
+from hivemind.core.msglog import MessageLog
+from hivemind.core.delivery import DeliveryTracker
+from hivemind.data.tables import NodeRegister, NodeMeta
+from hivemind.data.contrib.sqlite_interface import SQLiteInterface
+
+
+class TestCatchUp(unittest.TestCase):
+
+    def _drain(self, root) -> list:
+        dispatches = []
+        while True:
+            try:
+                dispatches.append(root._response_queue.get_nowait())
+            except queue.Empty:
+                return dispatches
+
+
+    def _register(self, root, status):
+        root._register_node({
+            'name' : 'rec', 'status' : status, 'ip' : None, 'meta' : {}
+        })
+        return root._register_subscription({
+            'node' : 'rec', 'filter' : 'ping', 'endpoint' : '/sub/rec/ping',
+            'port' : 1
+        })
+
+
+    def _root(self, location) -> RootController:
+        root = RootController()
+        root._database = SQLiteInterface()
+        root._database.connect(name=':memory:')
+        root._database._create_table(NodeRegister)
+        root._database._create_table(NodeMeta)
+        root._message_log = MessageLog(location)
+        return root
+
+
+    def test_replay_waits_for_online(self):
+        """
+        Messages missed while a node was away are replayed once it's
+        online, not while it's still pending where they'd be dropped
+        """
+        with temp_dir() as d:
+            root = self._root(d)
+            try:
+                self._register(root, RootController.NODE_ONLINE)
+
+                # Sent while the node is away (e.g. restarting)
+                offsets = [
+                    root._delegate('ping', {'payload' : i})['offset']
+                    for i in range(2)
+                ]
+                self._drain(root)
+
+                self._register(root, RootController.NODE_PENDING)
+                self.assertEqual(self._drain(root), [])
+
+                # Nothing that comes by while pending moves it along
+                root._message_log.wait_durable(offsets[-1], timeout=5.0)
+                self.assertEqual(
+                    root._message_log.cursor('/sub/rec/ping'), offsets[0]
+                )
+
+                root._register_node({'name' : 'rec', 'status' : RootController.NODE_ONLINE})
+                replayed = self._drain(root)
+                self.assertEqual([r.offset for r in replayed], offsets)
+                self.assertTrue(all(r.target for r in replayed))
+            finally:
+                root._message_log.close()
+                root._database.disconnect()
+
+
+    def test_replay_in_batches(self):
+        """
+        A long backlog is replayed a delivery window at a time, the
+        next once the subscriber has answered for the last
+        """
+        with temp_dir() as d:
+            root = self._root(d)
+            root._delivery = DeliveryTracker(window=2)
+            try:
+                self._register(root, RootController.NODE_ONLINE)
+                offsets = [
+                    root._delegate('ping', {'payload' : i})['offset']
+                    for i in range(5)
+                ]
+                self._drain(root)
+
+                self._register(root, RootController.NODE_PENDING)
+                root._register_node({'name' : 'rec', 'status' : RootController.NODE_ONLINE})
+                first = self._drain(root)
+                self.assertEqual([r.offset for r in first], offsets[:2])
+
+                # Half an answer isn't enough
+                root._acknowledge({'acks' : { '/sub/rec/ping' : [offsets[0]] }})
+                self.assertEqual(self._drain(root), [])
+
+                root._acknowledge({'acks' : { '/sub/rec/ping' : [offsets[1]] }})
+                second = self._drain(root)
+                self.assertEqual([r.offset for r in second], offsets[2:4])
+
+                # Giving up on one counts as an answer too
+                root._acknowledge({'acks' : { '/sub/rec/ping' : [offsets[2]] }})
+                root._give_up('/sub/rec/ping', second[1])
+                last = self._drain(root)
+                self.assertEqual([r.offset for r in last], offsets[4:])
+                self.assertEqual(root._replays, {})
+            finally:
+                root._message_log.close()
+                root._database.disconnect()
+
+
+class TestHttpFallback(unittest.TestCase):
+
+    def test_raw_payload(self):
+        """
+        Raw payloads that go over HTTP rather than the ring reach the
+        subscription as bytes
+        """
+        received = []
+
+        class _Callback(object):
+            function = received.append
+
+        class Handler(NodeSubscriptionHandler):
+            endpoints = { '/sub/rec/raw' : _Callback }
+
+        loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.add_routes([web.post('/{fullpath:.*}', Handler().node_post)])
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+
+        thread = threading.Thread(target=loop.run_forever)
+        thread.start()
+        try:
+            root = RootController()
+            url = f'http://127.0.0.1:{port}/sub/rec/raw'
+            self.assertTrue(root._ship(url, memoryview(b'\x00raw')))
+            self.assertTrue(root._ship(url, { 'not' : 'raw' }))
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.run_until_complete(runner.cleanup())
+            loop.close()
+
+        self.assertEqual(received, [b'\x00raw', { 'not' : 'raw' }])
@@ -0,0 +1,81 @@
+"""
+Tests for the same-host shared memory transport
+"""
+import os
+import unittest
+
+from hivemind.core import transport
+from hivemind.core.transport import ShmRing
+
+
+@unittest.skipUnless(transport.available(), 'Shared memory not available')
+class TestShmRing(unittest.TestCase):
+
+    def setUp(self):
+        self.name = f'hm_test_{os.getpid()}_{id(self)}'
+        self.writer = ShmRing.create(self.name, 256)
+        self.reader = ShmRing.attach(**self.writer.info())
+
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close(unlink=True)
+
+
+    def _drain(self):
+        output = []
+        def _collect(endpoint, payload, delivery):
+            if isinstance(payload, memoryview):
+                payload = bytes(payload)
+            output.append((endpoint, payload))
+        self.reader.drain(_collect)
+        return output
+
+
+    def test_json_round_trip(self):
+        """
+        Json payloads come out the other end decoded
+        """
+        self.assertTrue(self.writer.send('/sub/a/b', {'foo' : [1, 2]}))
+        self.assertTrue(self.reader.wait(0.1))
+        self.assertEqual(self._drain(), [('/sub/a/b', {'foo' : [1, 2]})])
+        self.assertFalse(self.reader.pending())
+
+
+    def test_raw_payload_is_a_view(self):
+        """
+        Raw bytes are handed to the consumer as a memoryview
+        """
+        self.writer.send('/raw', b'\x00\x01\x02')
+
+        seen = []
+        self.reader.drain(lambda e, p, d: seen.append((type(p), bytes(p), d)))
+        self.assertEqual(seen, [(memoryview, b'\x00\x01\x02', None)])
+
+
+    def test_delivery_id(self):
+        """
+        The delivery id rides along with the record
+        """
+        self.writer.send('/x', {'a' : 1}, delivery=1234)
+        seen = []
+        self.reader.drain(lambda e, p, d: seen.append(d))
+        self.assertEqual(seen, [1234])
+
+
+    def test_full_and_wrap(self):
+        """
+        A full ring refuses records and wraps once drained
+        """
+        sent = 0
+        while self.writer.send('/x', b'y' * 40):
+            sent += 1
+
+        self.assertTrue(sent > 0)
+        self.assertFalse(self.writer.send('/x', b'z' * 1024))
+        self.assertEqual(len(self._drain()), sent)
+
+        # Push enough through that we must wrap a few times
+        for i in range(50):
+            self.assertTrue(self.writer.send('/x', {'i' : i}))
+            self.assertEqual(self._drain(), [('/x', {'i' : i})])
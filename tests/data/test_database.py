@@ -2,10 +2,12 @@
 Tests for our physical database
 """
 
+import os
 import unittest
 import tempfile
 import datetime
 
+from hivemind.util import global_settings
 from hivemind.util.misc import temp_dir
 
 from hivemind.data.abstract.table import _TableLayout
@@ -14,6 +16,12 @@ from hivemind.data.exceptions import IntegrityError
 
 from hivemind.data.contrib.sqlite_interface import SQLiteInterface
 
+if global_settings.get('hive_epoch') is None:
+    global_settings.set({
+        'hive_epoch' : datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+    })
+
+
 def _sqlite_db_wrap(func):
     """
     Helper wrapper function for creating a file based database
@@ -373,3 +381,720 @@ class TestDatabaseBasics(unittest.TestCase):
                 bar = 2
             )
 
+
+
+    @_sqlite_db_wrap
+    def test_query_shape_cache(self, interface):
+        """
+        Queries with the same shape share their SQL and only
+        differ in the values
+        """
+        class ShapeTable(_TableLayout):
+            numba = _Field.IntField()
+            foo = _Field.TextField()
+
+        interface._create_table(ShapeTable)
+        for i in range(4):
+            interface.create(ShapeTable, numba=i, foo=f'foo{i}')
+
+        first = interface.new_query(ShapeTable, numba=1).sql()
+        hits = interface.sql_cache.hits
+        second = interface.new_query(ShapeTable, numba=2).sql()
+
+        self.assertEqual(first[0], second[0])
+        self.assertEqual(second[1], (2,))
+        self.assertEqual(interface.sql_cache.hits, hits + 1)
+
+        # Different number of IN values is a different shape
+        one_of = interface.new_query(ShapeTable).filter(
+            ShapeTable.numba.one_of([1, 2, 3])
+        )
+        self.assertEqual(one_of.count(), 3)
+        self.assertNotEqual(one_of.sql()[0], first[0])
+
+        # Falsy values still bind
+        self.assertEqual(interface.new_query(ShapeTable, numba=0).count(), 1)
+        self.assertEqual(interface.new_query(ShapeTable, foo='').count(), 0)
+
+        # No filters at all
+        self.assertEqual(interface.new_query(ShapeTable).count(), 4)
+
+
+    @_sqlite_db_wrap
+    def test_materialised_instances(self, interface):
+        """
+        Instances built from rows hold their values directly and only
+        resolve foreign keys when asked
+        """
+        class Owner(_TableLayout):
+            name = _Field.TextField()
+
+        class Owned(_TableLayout):
+            owner = _Field.ForeignKeyField(Owner)
+            label = _Field.TextField(null=True)
+
+        interface._create_table(Owner)
+        interface._create_table(Owned)
+
+        owner = interface.create(Owner, name='me')
+        interface.create(Owned, owner=owner, label='thing')
+
+        owned = interface.new_query(Owned).get()
+        self.assertEqual(owned.__dict__['owner'], owner.pk_value)
+        self.assertEqual(owned.owner_pk, owner.pk_value)
+        self.assertEqual(owned.label, 'thing')
+        self.assertTrue(isinstance(owned.created_on, datetime.datetime))
+        self.assertIs(owned.created_on, owned.created_on)
+
+        # First access loads it
+        self.assertEqual(owned.owner, owner)
+        self.assertTrue(isinstance(owned.__dict__['owner'], Owner))
+
+        # Fields are still reachable from the class for filtering
+        self.assertEqual(
+            interface.new_query(Owned, Owned.owner.equals(owner)).count(), 1
+        )
+
+
+    @_sqlite_db_wrap
+    def test_related_loading(self, interface):
+        """
+        select_related and prefetch_related load foreign keys without
+        a query per instance
+        """
+        class Parent(_TableLayout):
+            name = _Field.TextField()
+
+        class Child(_TableLayout):
+            parent = _Field.ForeignKeyField(Parent, null=True)
+            label = _Field.TextField()
+
+        interface._create_table(Parent)
+        interface._create_table(Child)
+
+        parents = [interface.create(Parent, name=f'p{i}') for i in range(3)]
+        for i in range(9):
+            interface.create(Child, parent=parents[i % 3], label=f'c{i}')
+        interface.create(Child, parent=None, label='orphan')
+
+        statements = []
+        execute = interface.execute
+        def _counting(query, values=None):
+            statements.append(query)
+            return execute(query, values)
+        interface.execute = _counting
+
+        base = interface.new_query(Child)
+        for query, expected in ((base.select_related('parent'), 1),
+                                (base.prefetch_related('parent'), 2)):
+            statements.clear()
+            children = query.objects()
+            names = sorted(
+                (c.label, c.parent.name if c.parent else None)
+                for c in children
+            )
+            self.assertEqual(len(statements), expected)
+            self.assertEqual(names[0], ('c0', 'p0'))
+            self.assertIn(('orphan', None), names)
+
+        # Filters still apply with the join in place
+        joined = base.select_related('parent').filter(label='c4').get()
+        self.assertEqual(joined.parent.name, 'p1')
+
+        with self.assertRaises(TypeError):
+            base.select_related('label')
+
+
+    @_sqlite_db_wrap
+    def test_iterators(self, interface):
+        """
+        Results can be streamed off of the cursor
+        """
+        class Streamed(_TableLayout):
+            numba = _Field.IntField()
+
+        interface._create_table(Streamed)
+        with interface.transaction:
+            for i in range(25):
+                interface.create(Streamed, numba=i)
+
+        query = interface.new_query(Streamed)
+        stream = query.iterator(chunk_size=4)
+        first = next(stream)
+        self.assertTrue(isinstance(first, Streamed))
+
+        # Other statements can run while we're partway through
+        self.assertEqual(query.count(), 25)
+
+        numbers = [first.numba] + [s.numba for s in stream]
+        self.assertEqual(sorted(numbers), list(range(25)))
+
+        values = list(query.filter(
+            Streamed.numba.lt(3)
+        ).values_iter('numba', chunk_size=2))
+        self.assertEqual(sorted(v['numba'] for v in values), [0, 1, 2])
+
+
+    @_sqlite_db_wrap
+    def test_bulk_operations(self, interface):
+        """
+        Many rows at once with set based statements
+        """
+        class Bulk(_TableLayout):
+            numba = _Field.IntField()
+            foo = _Field.TextField(null=True)
+
+        interface._create_table(Bulk)
+
+        ids = interface.bulk_create(
+            Bulk, [{'numba' : i, 'foo' : 'a'} for i in range(10)]
+        )
+        self.assertEqual(len(ids), 10)
+        self.assertEqual(len(set(ids)), 10)
+        self.assertEqual(interface.new_query(Bulk, id=ids[3]).get().numba, 3)
+        self.assertEqual(interface.bulk_create(Bulk, []), [])
+
+        query = interface.new_query(Bulk).filter(Bulk.numba.lt(4))
+        self.assertEqual(query.update(foo='b'), 4)
+        self.assertEqual(interface.new_query(Bulk, foo='b').count(), 4)
+
+        self.assertEqual(query.delete(), 4)
+        self.assertEqual(interface.new_query(Bulk).count(), 6)
+
+        # A failure takes the whole batch with it
+        with self.assertRaises(IntegrityError):
+            interface.bulk_create(Bulk, [{'numba' : 1}, {'numba' : None}])
+        self.assertEqual(interface.new_query(Bulk).count(), 6)
+
+
+    @_sqlite_db_wrap
+    def test_dirty_tracking(self, interface):
+        """
+        save() writes only what changed and nothing if that's nothing
+        """
+        class Tracked(_TableLayout):
+            numba = _Field.IntField()
+            foo = _Field.TextField()
+            data = _Field.JSONField(null=True)
+
+        interface._create_table(Tracked)
+        interface.create(Tracked, numba=1, foo='a', data={'x' : [1]})
+
+        instance = interface.new_query(Tracked).get()
+        self.assertEqual(instance.dirty_fields(), set())
+
+        statements = []
+        execute = interface.execute
+        def _counting(query, values=None):
+            statements.append((query, values))
+            return execute(query, values)
+        interface.execute = _counting
+
+        interface.save(instance)
+        self.assertEqual(statements, [])
+
+        instance.foo = 'b'
+        self.assertEqual(instance.dirty_fields(), {'foo'})
+        interface.save(instance)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('"numba"', statements[0][0])
+        self.assertEqual(instance.dirty_fields(), set())
+
+        # In place changes to json are picked up too
+        instance.data['x'].append(2)
+        self.assertEqual(instance.dirty_fields(), {'data'})
+        interface.save(instance)
+
+        interface.execute = execute
+        fresh = interface.new_query(Tracked).get()
+        self.assertEqual((fresh.foo, fresh.data), ('b', {'x' : [1, 2]}))
+
+        # Changing the primary key would update the wrong row
+        fresh.id = fresh.id + 1
+        with self.assertRaises(IntegrityError):
+            interface.save(fresh)
+        self.assertIn('id', fresh.dirty_fields())
+
+
+    @_sqlite_db_wrap
+    def test_async_database(self, interface):
+        """
+        The asyncio facade runs statements off of the event loop
+        """
+        import asyncio
+        import threading
+        from hivemind.data.aio import AsyncDatabase
+
+        interface._create_table(TestTable)
+        adb = AsyncDatabase(interface, max_workers=2)
+        threads = set()
+
+        def _create(value):
+            threads.add(threading.get_ident())
+            return interface.create(TestTable, foo=value)
+
+        async def _work():
+            await adb.create(TestTable, foo=1)
+            await adb.atomic(_create, 2)
+            await asyncio.gather(*(adb.run(_create, i) for i in range(3, 6)))
+
+            query = adb.query(TestTable).filter(TestTable.foo.gt(2))
+            values = await query.values_list('foo')
+            self.assertEqual(sorted(values), [3, 4, 5])
+            self.assertEqual(await adb.query(TestTable).count(), 5)
+            self.assertEqual((await adb.query(TestTable, foo=2).get()).foo, 2)
+            return await query.delete()
+
+        try:
+            self.assertEqual(asyncio.run(_work()), 3)
+        finally:
+            adb.shutdown()
+
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+    @_sqlite_db_wrap
+    def test_indexes(self, interface):
+        """
+        Declared indexes are built with the table and lookups use them
+        """
+        class Reading(_TableLayout):
+            sensor = _Field.TextField(index=True)
+            takenOn = _Field.IntField()
+
+            @classmethod
+            def indexes(cls):
+                return (('sensor', 'takenOn'),)
+
+        def _index_names():
+            return sorted(row[0] for row in interface.execute(
+                "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=?",
+                (Reading.db_name(),)
+            ) if not row[0].startswith('sqlite_'))
+
+        interface._create_table(Reading)
+        self.assertEqual(_index_names(), [
+            'idx_reading_sensor', 'idx_reading_sensor_taken_on'
+        ])
+
+        # Running it again is harmless
+        interface._create_indexes(Reading)
+        self.assertEqual(len(_index_names()), 2)
+
+        sql, values = interface.new_query(Reading, sensor='a').sql()
+        plan = interface.execute(
+            f'EXPLAIN QUERY PLAN SELECT * FROM "{Reading.db_name()}" WHERE {sql}',
+            values
+        ).fetchall()
+        self.assertIn('idx_reading_sensor', ' '.join(str(r) for r in plan))
+
+
+    @_sqlite_db_wrap
+    def test_query_cache(self, interface):
+        """
+        Repeated reads come from the cache until a write invalidates them
+        """
+        class Cached(_TableLayout):
+            numba = _Field.IntField()
+            data = _Field.JSONField(null=True)
+
+        interface._create_table(Cached)
+        cache = interface.enable_query_cache(maxsize=16)
+        interface.create(Cached, numba=1, data={'x' : 1})
+
+        query = interface.new_query(Cached)
+        self.assertEqual(query.count(), 1)
+        first = query.objects()[0]
+        self.assertEqual(query.count(), 1)
+        self.assertEqual(cache.hits, 1)
+
+        # Callers can't change what's held
+        first.data['x'] = 2
+        self.assertEqual(query.objects()[0].data, {'x' : 1})
+        self.assertEqual(cache.hits, 2)
+
+        interface.create(Cached, numba=2)
+        self.assertEqual(query.count(), 2)
+
+        with interface.transaction:
+            query.filter(numba=2).update(numba=3)
+            # Inside the transaction we always go to the database
+            self.assertEqual(query.values_list('numba'), [1, 3])
+        self.assertEqual(sorted(query.values_list('numba')), [1, 3])
+
+        interface.delete(first)
+        self.assertEqual(query.values_list('numba'), [3])
+
+
+    @_sqlite_db_wrap
+    def test_ordering_and_paging(self, interface):
+        """
+        order_by, limit/offset and keyset pagination with after()
+        """
+        class Paged(_TableLayout):
+            numba = _Field.IntField()
+            group = _Field.TextField()
+
+        interface._create_table(Paged)
+        interface.bulk_create(Paged, [
+            { 'numba' : i, 'group' : 'ab'[i % 2] } for i in range(10)
+        ])
+
+        query = interface.new_query(Paged)
+        self.assertEqual(
+            query.order_by('-numba').limit(3).values_list('numba'), [9, 8, 7]
+        )
+        self.assertEqual(
+            query.order_by('numba').offset(8).values_list('numba'), [8, 9]
+        )
+        self.assertEqual(
+            [o.numba for o in query.order_by('numba').limit(2).offset(4).objects()],
+            [4, 5]
+        )
+        self.assertEqual(query.limit(4).count(), 4)
+        self.assertEqual(query.offset(7).count(), 3)
+
+        # Keyset pagination walks everything exactly once
+        seen = []
+        page = query.limit(4).objects()
+        while page:
+            seen.extend(o.numba for o in page)
+            page = query.after(page[-1].pk_value).limit(4).objects()
+        self.assertEqual(sorted(seen), list(range(10)))
+
+        # ...and with an ordering of our own
+        ordered = query.order_by('-group', '-numba').limit(3)
+        first = ordered.objects()
+        self.assertEqual([o.numba for o in first], [9, 7, 5])
+        self.assertEqual(
+            ordered.after(first[-1]).values_list('numba'), [3, 1, 8]
+        )
+
+        with self.assertRaises(ValueError):
+            query.order_by('group', '-numba').after(first[-1])
+
+        with self.assertRaises(ValueError):
+            query.limit(2).update(numba=0)
+
+        with self.assertRaises(KeyError):
+            query.order_by('nope')
+
+
+    @_sqlite_db_wrap
+    def test_aggregates(self, interface):
+        """
+        aggregate() and annotate() run their math in the database
+        """
+        from hivemind.data.query import Count, Sum, Avg, Min, Max
+
+        class Stat(_TableLayout):
+            numba = _Field.IntField()
+            group = _Field.TextField()
+
+        interface._create_table(Stat)
+        interface.bulk_create(Stat, [
+            { 'numba' : i, 'group' : 'abc'[i % 3] } for i in range(9)
+        ])
+
+        query = interface.new_query(Stat)
+        self.assertEqual(query.aggregate(
+            total=Count(),
+            groups=Count('group', distinct=True),
+            summed=Sum('numba'),
+            low=Min('numba'),
+            high=Max('numba'),
+            mean=Avg('numba')
+        ), {
+            'total' : 9, 'groups' : 3, 'summed' : 36,
+            'low' : 0, 'high' : 8, 'mean' : 4.0
+        })
+
+        # The old helpers ride on aggregate()
+        self.assertEqual(query.count(), 9)
+        self.assertEqual(query.filter(Stat.numba.gt(5)).sum('numba'), 21)
+        self.assertEqual(query.order_by('numba').limit(3).aggregate(s=Sum('numba')), {'s' : 3})
+
+        grouped = query.annotate(n=Count(), top=Max('numba')).order_by('-top')
+        self.assertEqual(grouped.values('group'), [
+            { 'group' : 'c', 'n' : 3, 'top' : 8 },
+            { 'group' : 'b', 'n' : 3, 'top' : 7 },
+            { 'group' : 'a', 'n' : 3, 'top' : 6 },
+        ])
+        self.assertEqual(
+            list(grouped.filter(group='a').values_iter('group')),
+            [{ 'group' : 'a', 'n' : 3, 'top' : 6 }]
+        )
+
+        # No fields means one group of everything
+        self.assertEqual(query.annotate(n=Count()).values(), [{ 'n' : 9 }])
+
+        with self.assertRaises(ValueError):
+            grouped.objects()
+
+        with self.assertRaises(ValueError):
+            query.aggregate(s=Sum())
+
+        # The helpers default to the primary key, even one whose
+        # column doesn't look like its field name
+        class Keyed(_TableLayout):
+            key = _Field.IntField(pk=True, db_column='RecordKey')
+
+        interface._create_table(Keyed)
+        interface.bulk_create(Keyed, [{ 'key' : k } for k in (2, 4, 9)])
+
+        keyed = interface.new_query(Keyed)
+        self.assertEqual(keyed.count(), 3)
+        self.assertEqual(keyed.sum(), 15)
+
+
+    @_sqlite_db_wrap
+    def test_nested_transactions(self, interface):
+        """
+        Nested transactions are savepoints, a failure within one only
+        undoes it's own work
+        """
+        interface._create_table(TestTable)
+
+        with interface.transaction:
+            interface.create(TestTable, foo=1)
+
+            try:
+                with interface.transaction:
+                    interface.create(TestTable, foo=2)
+                    raise KeyError('Inner failure')
+            except KeyError:
+                pass
+
+            with interface.transaction:
+                interface.create(TestTable, foo=3)
+
+        self.assertEqual(
+            sorted(interface.new_query(TestTable).values_list('foo')), [1, 3]
+        )
+        self.assertIsNone(interface.transaction.active)
+
+
+    @_sqlite_db_wrap
+    def test_explain(self, interface):
+        """
+        explain() hands back the plan the database would use
+        """
+        class Lookup(_TableLayout):
+            key = _Field.TextField(index=True)
+            value = _Field.TextField(null=True)
+
+        interface._create_table(Lookup)
+        query = interface.new_query(Lookup)
+
+        plan = query.filter(key='a').explain()
+        self.assertTrue(any('idx_lookup_key' in line for line in plan))
+
+        plan = query.filter(value='a').explain('key')
+        self.assertTrue(any(line.strip().startswith('SCAN') for line in plan))
+
+
+    @_sqlite_db_wrap
+    def test_columnar_export(self, interface):
+        """
+        to_columns() and write_csv() read straight off of the cursor
+        """
+        import io
+        import array
+        from hivemind.data.query import Count
+
+        class Reading(_TableLayout):
+            sensor = _Field.TextField()
+            value = _Field.FloatField()
+            count = _Field.IntField(null=True)
+            extra = _Field.JSONField(null=True)
+
+        interface._create_table(Reading)
+        interface.bulk_create(Reading, [
+            { 'sensor' : 'ab'[i % 2], 'value' : i / 2, 'count' : i } for i in range(5)
+        ])
+
+        query = interface.new_query(Reading).order_by('count')
+        columns = query.to_columns('sensor', 'value', 'count', chunk_size=2, use_numpy=False)
+        self.assertEqual(columns['sensor'], ['a', 'b', 'a', 'b', 'a'])
+        self.assertEqual(columns['value'], array.array('d', [0, 0.5, 1, 1.5, 2]))
+        self.assertEqual(columns['count'], array.array('q', range(5)))
+
+        # Everything by default, empty values fall back to a list
+        interface.create(Reading, sensor='c', value=9.0, extra={'x' : 1})
+        columns = query.to_columns(use_numpy=False)
+        self.assertEqual(list(columns), ['id', 'sensor', 'value', 'count', 'extra'])
+        self.assertEqual(columns['count'], [None, 0, 1, 2, 3, 4])
+        self.assertIsInstance(columns['id'], array.array)
+
+        grouped = interface.new_query(Reading).annotate(n=Count()).order_by('sensor')
+        self.assertEqual(
+            grouped.to_columns('sensor', use_numpy=False),
+            { 'sensor' : ['a', 'b', 'c'], 'n' : array.array('q', [3, 2, 1]) }
+        )
+
+        output = io.StringIO()
+        written = query.filter(sensor='c').write_csv(output, 'sensor', 'value', 'extra')
+        self.assertEqual(written, 1)
+        self.assertEqual(
+            output.getvalue().splitlines(),
+            ['sensor,value,extra', 'c,9.0,"{""x"": 1}"']
+        )
+
+
+class TestSQLitePool(unittest.TestCase):
+
+    def test_group_commit(self):
+        """
+        Concurrent transactions share a commit and a failing one
+        doesn't take the others with it
+        """
+        import threading
+
+        with temp_dir() as d:
+            interface = SQLiteInterface()
+            interface.connect(name=os.path.join(d, 'group'))
+            try:
+                interface._create_table(TestTable)
+                interface.transaction.enable_group_commit(interval=0.1, max_size=100)
+
+                commits = []
+                commit_sql = interface.commit_sql
+                def _counted(*args):
+                    commits.append(1)
+                    return commit_sql(*args)
+                interface.commit_sql = _counted
+
+                barrier = threading.Barrier(8)
+                errors = []
+                def _write(i):
+                    barrier.wait()
+                    try:
+                        with interface.transaction:
+                            interface.create(TestTable, foo=i)
+                            if i == 3:
+                                raise KeyError('Only this one')
+                    except KeyError:
+                        errors.append(i)
+
+                threads = [threading.Thread(target=_write, args=(i,)) for i in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+                self.assertEqual(errors, [3])
+                self.assertTrue(len(commits) < 7)
+                self.assertEqual(
+                    sorted(interface.new_query(TestTable).values_list('foo')),
+                    [0, 1, 2, 4, 5, 6, 7]
+                )
+            finally:
+                interface.disconnect()
+
+
+    def test_group_commit_plain_write(self):
+        """
+        A write outside of a transaction waits for the open group to
+        commit rather than becoming part of it
+        """
+        import threading
+
+        with temp_dir() as d:
+            interface = SQLiteInterface()
+            interface.connect(name=os.path.join(d, 'group'))
+            try:
+                interface._create_table(TestTable)
+                interface.transaction.enable_group_commit(interval=0.2, max_size=100)
+
+                in_group = threading.Event()
+                def _write():
+                    with interface.transaction:
+                        interface.create(TestTable, foo=1)
+                        in_group.set()
+
+                thread = threading.Thread(target=_write)
+                thread.start()
+                in_group.wait(5.0)
+
+                # Once it returns it's committed, the group along with it
+                interface.create(TestTable, foo=2)
+                self.assertEqual(
+                    sorted(interface.new_query(TestTable).values_list('foo')),
+                    [1, 2]
+                )
+                thread.join()
+            finally:
+                interface.disconnect()
+
+        # Readers share the writer in memory so they'd see the group
+        interface = SQLiteInterface()
+        interface.connect(name=':memory:')
+        with self.assertRaises(ValueError):
+            interface.transaction.enable_group_commit()
+        interface.disconnect()
+
+        # ...and from the settings it's only a warning
+        with self.assertLogs(level='WARNING'):
+            interface = SQLiteInterface.start_database({
+                'type' : 'sqlite',
+                'name' : ':memory:',
+                'group_commit' : { 'interval' : 0.1 }
+            })
+        self.assertFalse(interface.transaction.group_commit)
+        interface.disconnect()
+
+
+    def test_concurrent_readers(self):
+        """
+        Readers on other threads carry on while a write is in progress
+        and only see it once it's committed
+        """
+        import threading
+
+        with temp_dir() as d:
+            interface = SQLiteInterface()
+            interface.connect(name=os.path.join(d, 'pool'))
+            try:
+                interface.execute('CREATE TABLE foo ( bar int );')
+                interface.execute('INSERT INTO foo (bar) VALUES (1)')
+
+                mode = interface.execute('PRAGMA journal_mode;').fetchone()
+                self.assertEqual(mode[0].lower(), 'wal')
+
+                def _count():
+                    return interface.execute(
+                        'SELECT COUNT(*) FROM foo'
+                    ).fetchone()[0]
+
+                seen = []
+                def _reader():
+                    seen.append(_count())
+
+                with interface.transaction:
+                    interface.execute('INSERT INTO foo (bar) VALUES (2)')
+                    readers = [threading.Thread(target=_reader) for _ in range(4)]
+                    for reader in readers:
+                        reader.start()
+                    for reader in readers:
+                        reader.join(5.0)
+
+                self.assertEqual(seen, [1, 1, 1, 1])
+
+                reader = threading.Thread(target=_reader)
+                reader.start()
+                reader.join(5.0)
+                self.assertEqual(seen[-1], 2)
+
+                # Readers go away with their threads
+                import gc
+                gc.collect()
+                pool = interface._SQLiteInterface__pool
+                self.assertEqual(len(pool._readers), 0)
+
+                # A WITH that writes goes to the writer, not a reader
+                interface.execute(
+                    'WITH v(n) AS (SELECT 3) INSERT INTO foo (bar) SELECT n FROM v'
+                )
+                self.assertEqual(_count(), 3)
+            finally:
+                interface.disconnect()
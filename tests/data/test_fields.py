@@ -0,0 +1,89 @@
+"""
+Tests for the field types
+"""
+import unittest
+import threading
+import datetime
+
+from hivemind.util import global_settings
+
+from hivemind.data.abstract.field import _Field
+from hivemind.data.fields import intfields
+
+if global_settings.get('hive_epoch') is None:
+    global_settings.set({
+        'hive_epoch' : datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+    })
+
+
+class TestIdField(unittest.TestCase):
+
+    def test_ids_increase(self):
+        """
+        Ids from one thread only ever go up, even when we run through
+        a millisecond's worth of sequence numbers
+        """
+        generator = intfields._IdGenerator()
+        ids = [generator.next_id() for _ in range(5000)]
+        self.assertEqual(ids, sorted(set(ids)))
+
+        sequences = [i & intfields.MAX_SEQUENCE for i in ids]
+        self.assertTrue(max(sequences) <= intfields.MAX_SEQUENCE)
+
+
+    def test_threads(self):
+        """
+        Threads sharing the generator never see the same id
+        """
+        ids = []
+        def _generate():
+            ids.extend([_Field.IdField._build_id() for _ in range(5000)])
+
+        threads = [threading.Thread(target=_generate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(ids)), 20000)
+
+
+    def test_shard_and_time(self):
+        """
+        The shard and creation time can be read back out of an id
+        """
+        generator = intfields._IdGenerator()
+        generator.set_shard_id(42)
+        value = generator.next_id()
+
+        shard = (value >> intfields.SEQUENCE_BITS) & intfields.MAX_SHARD_ID
+        self.assertEqual(shard, 42)
+
+        created = _Field.IdField.to_datetime(value)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.assertTrue(abs((now - created).total_seconds()) < 5)
+        self.assertEqual(_Field.IdField.date_to_int(created), value >> intfields.TIMESTAMP_SHIFT)
+
+        with self.assertRaises(ValueError):
+            generator.set_shard_id(intfields.MAX_SHARD_ID + 1)
+
+
+    def test_after_fork(self):
+        """
+        A forked child starts a fresh sequence and is warned if it makes
+        ids on the parent's shard
+        """
+        generator = intfields._IdGenerator()
+        generator.next_id()
+        generator.after_fork()
+        self.assertEqual((generator._last_ms, generator._sequence), (-1, 0))
+
+        with self.assertLogs(level='WARNING'):
+            generator.next_id()
+
+        generator.after_fork()
+        generator.set_shard_id(7)
+        with self.assertNoLogs(level='WARNING'):
+            value = generator.next_id()
+        shard = (value >> intfields.SEQUENCE_BITS) & intfields.MAX_SHARD_ID
+        self.assertEqual(shard, 7)
@@ -0,0 +1,208 @@
+"""
+Tests for migrating tables from their recorded layout
+"""
+import unittest
+import datetime
+
+from hivemind.util import global_settings
+
+from hivemind.data.abstract.table import _TableLayout
+from hivemind.data.abstract.field import _Field
+from hivemind.data.tables import TableDefinition
+from hivemind.data.exceptions import MigrationError
+from hivemind.data.migrate import (
+    Migrator, AddColumn, CreateIndex, DropIndex, RebuildTable
+)
+
+from hivemind.data.contrib.sqlite_interface import SQLiteInterface
+
+if global_settings.get('hive_epoch') is None:
+    global_settings.set({
+        'hive_epoch' : datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+    })
+
+
+def _widget_v1():
+    class Widget(_TableLayout):
+        name = _Field.TextField()
+        size = _Field.IntField(null=True)
+        legacy = _Field.TextField(null=True, index=True)
+    return Widget
+
+
+def _widget_v2():
+    class Widget(_TableLayout):
+        name = _Field.TextField()
+        size = _Field.IntField(null=True)
+        legacy = _Field.TextField(null=True, index=True)
+        colour = _Field.TextField(null=True)
+    return Widget
+
+
+def _widget_v3():
+    class Widget(_TableLayout):
+        name = _Field.TextField(index=True)
+        size = _Field.IntField(default=lambda: 7)
+        colour = _Field.TextField(null=True)
+        weight = _Field.IntField(default=lambda: 3)
+    return Widget
+
+
+class TestMigrator(unittest.TestCase):
+
+    def setUp(self):
+        self.interface = SQLiteInterface()
+        self.interface.connect(name=':memory:')
+        self.interface._create_table(TableDefinition)
+
+
+    def tearDown(self):
+        self.interface.disconnect()
+
+
+    def _install(self, table):
+        self.interface._create_table(table)
+        migrator = Migrator(self.interface, batch_size=3)
+        self.assertEqual(migrator.migrate(table), []) # First sighting
+        return migrator
+
+
+    def test_add_column_in_place(self):
+        """
+        Nullable columns are added without touching the rows
+        """
+        v1 = _widget_v1()
+        migrator = self._install(v1)
+        self.interface.create(v1, name='a', size=1)
+
+        v2 = _widget_v2()
+        operations = migrator.plan(v2, migrator.current_layout(v2))
+        self.assertEqual([type(o) for o in operations], [AddColumn])
+
+        migrator.migrate(v2)
+        widget = self.interface.new_query(v2, name='a').get()
+        self.assertEqual((widget.size, widget.colour), (1, None))
+
+        # Nothing left to do
+        self.assertEqual(migrator.migrate(v2), [])
+
+
+    def test_add_column_in_the_middle(self):
+        """
+        A column declared between others ends up last in the table.
+        Rows still go in and come out by name
+        """
+        v1 = _widget_v1()
+        migrator = self._install(v1)
+        self.interface.create(v1, name='a', size=1, legacy='x')
+
+        class Widget(_TableLayout):
+            name = _Field.TextField()
+            colour = _Field.TextField(null=True)
+            size = _Field.IntField(null=True)
+            legacy = _Field.TextField(null=True, index=True)
+
+        migrator.migrate(Widget)
+        created = self.interface.create(Widget, name='b', colour='red', size=2)
+        self.assertEqual((created.colour, created.size), ('red', 2))
+
+        widgets = self.interface.new_query(Widget).order_by('name').objects()
+        self.assertEqual(
+            [(w.name, w.colour, w.size, w.legacy) for w in widgets],
+            [('a', None, 1, 'x'), ('b', 'red', 2, None)]
+        )
+
+        self.interface.bulk_create(Widget, [{'name' : 'c', 'colour' : 'blue'}])
+        widget = self.interface.new_query(Widget, name='c').get()
+        self.assertEqual((widget.colour, widget.size), ('blue', None))
+
+
+    def test_rebuild(self):
+        """
+        Changed and removed columns rebuild the table, in batches,
+        keeping the rows we have
+        """
+        v2 = _widget_v2()
+        migrator = self._install(v2)
+        with self.interface.transaction:
+            for i in range(10):
+                self.interface.create(
+                    v2, name=f'w{i}', size=(None if i % 2 else i), legacy='x'
+                )
+
+        v3 = _widget_v3()
+        operations = migrator.plan(v3, migrator.current_layout(v3))
+        self.assertEqual([type(o) for o in operations], [RebuildTable])
+
+        migrator.migrate(v3)
+
+        widgets = self.interface.new_query(v3).order_by('name').objects()
+        self.assertEqual([w.name for w in widgets], [f'w{i}' for i in range(10)])
+        self.assertEqual(
+            [w.size for w in widgets], [0, 7, 2, 7, 4, 7, 6, 7, 8, 7]
+        )
+        self.assertEqual({w.weight for w in widgets}, {3})
+
+        columns = [r[1] for r in self.interface.execute(
+            'PRAGMA table_info("widget")'
+        ).fetchall()]
+        self.assertNotIn('legacy', columns)
+
+        indexes = {r[1] for r in self.interface.execute(
+            'PRAGMA index_list("widget")'
+        ).fetchall()}
+        self.assertIn(self.interface.index_name(v3, ('name',)), indexes)
+        self.assertNotIn(self.interface.index_name(v3, ('legacy',)), indexes)
+
+        self.assertEqual(migrator.migrate(v3), [])
+        self.assertEqual(self.interface.new_query(
+            TableDefinition, table_name='widget'
+        ).count(), 2)
+
+
+    def test_not_null_without_default(self):
+        """
+        A column the rows can't be given a value for is refused before
+        the table is touched
+        """
+        v2 = _widget_v2()
+        migrator = self._install(v2)
+        self.interface.create(v2, name='a', legacy='x')
+
+        class Widget(_TableLayout):
+            name = _Field.TextField()
+            size = _Field.IntField(null=True)
+            colour = _Field.TextField(null=True)
+            weight = _Field.IntField()
+
+        with self.assertRaises(MigrationError):
+            migrator.plan(Widget, migrator.current_layout(Widget))
+
+        with self.assertRaises(MigrationError):
+            migrator.migrate(Widget)
+
+        widget = self.interface.new_query(v2, name='a').get()
+        self.assertEqual(widget.legacy, 'x')
+        self.assertEqual(
+            migrator.plan(v2, migrator.current_layout(v2)), []
+        )
+
+
+    def test_indexes(self):
+        """
+        Index changes alone don't need a rebuild
+        """
+        v2 = _widget_v2()
+        migrator = self._install(v2)
+
+        class Widget(_TableLayout):
+            name = _Field.TextField()
+            size = _Field.IntField(null=True, index=True)
+            legacy = _Field.TextField(null=True)
+            colour = _Field.TextField(null=True)
+
+        operations = migrator.plan(Widget, migrator.current_layout(Widget))
+        self.assertEqual(
+            [(type(o), o.fields) for o in operations],
+            [(DropIndex, ('legacy',)), (CreateIndex, ('size',))]
+        )
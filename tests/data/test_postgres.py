@@ -0,0 +1,154 @@
+"""
+Tests for the PostgreSQL integration. Set HIVE_TEST_POSTGRES_DSN to
+run them against a live server, e.g.
+
+    HIVE_TEST_POSTGRES_DSN="dbname=hivemind_test user=postgres"
+"""
+import os
+import unittest
+import datetime
+
+from hivemind.util import global_settings
+
+from hivemind.data.abstract.table import _TableLayout
+from hivemind.data.abstract.field import _Field
+from hivemind.data.exceptions import IntegrityError
+
+from hivemind.data.contrib import postgres_interface
+from hivemind.data.contrib.postgres_interface import PostgresInterface, to_pyformat
+
+POSTGRES_DSN = os.environ.get('HIVE_TEST_POSTGRES_DSN')
+
+if global_settings.get('hive_epoch') is None:
+    global_settings.set({
+        'hive_epoch' : datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+    })
+
+
+class PgParent(_TableLayout):
+    name = _Field.TextField(unique=True)
+    data = _Field.JSONField(null=True)
+
+
+class PgChild(_TableLayout):
+    parent = _Field.ForeignKeyField(PgParent)
+    value = _Field.IntField(default=1)
+
+
+class TestPlaceholders(unittest.TestCase):
+
+    def test_to_pyformat(self):
+        """
+        Placeholders are swapped but quoted text is left alone
+        """
+        self.assertEqual(
+            to_pyformat('SELECT * FROM "a?" WHERE "a?"."b" = ? AND c IN (?,?)'),
+            'SELECT * FROM "a?" WHERE "a?"."b" = %s AND c IN (%s,%s)'
+        )
+        self.assertEqual(
+            to_pyformat("SELECT '?%' || ?"),
+            "SELECT '?%%' || %s"
+        )
+
+
+@unittest.skipUnless(
+    postgres_interface.available() and POSTGRES_DSN,
+    'Set HIVE_TEST_POSTGRES_DSN (and install psycopg2) to test postgres'
+)
+class TestPostgresInterface(unittest.TestCase):
+
+    def setUp(self):
+        self.interface = PostgresInterface()
+        self.interface.connect(dsn=POSTGRES_DSN, max_connections=4)
+        self._drop()
+        self.interface._create_table(PgParent)
+        self.interface._create_table(PgChild)
+
+
+    def tearDown(self):
+        self._drop()
+        self.interface.disconnect()
+
+
+    def _drop(self):
+        for table in (PgChild, PgParent):
+            self.interface.execute(f'DROP TABLE IF EXISTS "{table.db_name()}" CASCADE')
+
+
+    def test_round_trip(self):
+        """
+        Rows, json and foreign keys make it in and out
+        """
+        db = self.interface
+        self.assertIn(PgParent.db_name(), db.get_table_names())
+
+        parent = db.create(PgParent, name='a', data={'x' : [1, 2]})
+        self.assertEqual(parent.data, {'x' : [1, 2]})
+
+        db.bulk_create(PgChild, [{'parent' : parent, 'value' : i} for i in range(5)])
+
+        query = db.new_query(PgChild).filter(PgChild.value.one_of([1, 3]))
+        self.assertEqual(sorted(query.values_list('value')), [1, 3])
+        self.assertEqual(query.count(), 2)
+
+        child = query.select_related('parent').objects()[0]
+        self.assertEqual(child.parent.name, 'a')
+
+        # Deleting the parent cascades
+        db.delete(parent)
+        self.assertEqual(db.new_query(PgChild).count(), 0)
+
+
+    def test_transactions(self):
+        """
+        Failures roll the whole transaction back
+        """
+        db = self.interface
+        with self.assertRaises(IntegrityError):
+            with db.transaction:
+                db.create(PgParent, name='b')
+                db.create(PgParent, name='b')
+
+        self.assertEqual(db.new_query(PgParent).count(), 0)
+
+
+    def test_leases(self):
+        """
+        A thread's connection goes back to the pool after a statement
+        and only stays leased for the length of a transaction
+        """
+        db = self.interface
+        pool = db._PostgresInterface__pool
+
+        db.create(PgParent, name='c')
+        self.assertIsNone(getattr(pool._local, 'connection', None))
+
+        with db.transaction:
+            db.create(PgParent, name='d')
+            self.assertIsNotNone(pool._local.connection)
+        self.assertIsNone(pool._local.connection)
+        self.assertEqual(db.new_query(PgParent).count(), 2)
+
+
+    def test_server_side_iterator(self):
+        """
+        Iterators read through a named cursor that keeps it's
+        connection while other statements come and go
+        """
+        db = self.interface
+        pool = db._PostgresInterface__pool
+        db.bulk_create(PgParent, [{ 'name' : f'p{i}' } for i in range(25)])
+
+        cursor = db.get_iter_cursor(10)
+        self.assertIsNotNone(cursor.name)
+        self.assertEqual(cursor.itersize, 10)
+        cursor.close()
+        db.release()
+
+        names = []
+        for parent in db.new_query(PgParent).order_by('name').iterator(chunk_size=10):
+            names.append(parent.name)
+            db.create(PgChild, parent=parent) # Would hand the lease back
+        self.assertEqual(names, sorted(f'p{i}' for i in range(25)))
+        self.assertIsNone(pool._local.connection)
+        self.assertEqual(db.new_query(PgChild).count(), 25)
@@ -25,3 +25,67 @@ class TestTableBasics(unittest.TestCase):
             class MyTable(_TableLayout):
                 foo = _Field.IntField(default=1)
                 baz = _Field() # No can do
+
+
+    def test_frozen_layout(self):
+        """
+        The metaclass works out the layout details up front
+        """
+        class ParentTable(_TableLayout):
+            name = _Field.TextField()
+
+        class ChildTable(_TableLayout):
+            someValue = _Field.IntField()
+            renamed = _Field.IntField(db_column='other_col')
+            parent = _Field.ForeignKeyField(ParentTable)
+
+        self.assertEqual(ChildTable.db_name(), 'child_table')
+        self.assertEqual(
+            [name for name, _ in ChildTable.columns()],
+            ['id', 'someValue', 'renamed', 'parent']
+        )
+        self.assertIs(ChildTable.columns(), ChildTable.columns())
+
+        self.assertIs(ChildTable.pk_field(), ChildTable.id)
+        self.assertEqual(ChildTable.pk(), 'id')
+        self.assertEqual(ChildTable.column_index('parent'), 3)
+
+        self.assertEqual(ChildTable.db_column_name('someValue'), 'some_value')
+        self.assertEqual(ChildTable.db_column_name('renamed'), 'other_col')
+        self.assertEqual(ChildTable.db_column_name(ChildTable.renamed), 'other_col')
+
+        self.assertEqual(
+            ChildTable.fk_columns(), (('parent', ChildTable.parent),)
+        )
+
+
+    def test_index_definitions(self):
+        """
+        Indexes come from both the fields and the indexes() hook
+        """
+        class Indexed(_TableLayout):
+            sensor = _Field.TextField(index=True)
+            code = _Field.TextField(index=True, unique=True)
+            takenOn = _Field.IntField()
+
+            @classmethod
+            def indexes(cls):
+                return (('sensor', 'takenOn'),)
+
+        self.assertEqual(
+            Indexed.index_definitions(), (('sensor',), ('sensor', 'takenOn'))
+        )
+
+        layout = Indexed.db_layout()
+        self.assertEqual(layout['indexes'], [['sensor'], ['sensor', 'takenOn']])
+        self.assertTrue(dict(layout['fields'])['sensor']['index'])
+
+        class BadIndex(_TableLayout):
+            foo = _Field.IntField()
+
+            @classmethod
+            def indexes(cls):
+                return (('nope',),)
+
+        with self.assertRaises(KeyError):
+            BadIndex.index_definitions()
@@ -0,0 +1,153 @@
+"""
+Tests for tracing the SQL we run
+"""
+import json
+import unittest
+import datetime
+
+from aiohttp import web
+
+from hivemind.util import _webtoolkit, global_settings
+from hivemind.data.abstract.table import _TableLayout
+from hivemind.data.abstract.field import _Field
+from hivemind.data.trace import SqlTracer, fingerprint
+from hivemind.data.contrib.sqlite_interface import SQLiteInterface
+
+if global_settings.get('hive_epoch') is None:
+    global_settings.set({
+        'hive_epoch' : datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+    })
+
+
+class TestSqlTracer(unittest.TestCase):
+
+    def test_fingerprint(self):
+        """
+        Statements that only differ in their values share a fingerprint
+        """
+        self.assertEqual(
+            fingerprint("SELECT *  FROM foo\n WHERE a = 'b''c' AND n > 10"),
+            'SELECT * FROM foo WHERE a = ? AND n > ?'
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM "foo" WHERE "id" IN (?, ?, ?)'),
+            fingerprint('SELECT * FROM "foo" WHERE "id" IN (?,?)')
+        )
+
+
+    def test_ring_and_report(self):
+        """
+        Only the latest records are kept, totals cover everything
+        """
+        tracer = SqlTracer(capacity=3)
+        for i in range(5):
+            tracer.finish(f'SELECT {i}', 0, tracer.start())
+        tracer.finish('DELETE FROM foo', 1, tracer.start())
+
+        records = tracer.records()
+        self.assertEqual([r.sql for r in records], ['SELECT 3', 'SELECT 4', 'DELETE FROM foo'])
+
+        shapes = {e['fingerprint'] : e['count'] for e in tracer.slow_queries()}
+        self.assertEqual(shapes, {'SELECT ?' : 5, 'DELETE FROM foo' : 1})
+        self.assertIn('-- 1 x', tracer.report())
+
+        tracer.clear()
+        self.assertEqual(tracer.records(), [])
+
+
+    def test_sampling(self):
+        """
+        A sample rate of zero traces nothing
+        """
+        tracer = SqlTracer(sample_rate=0.0)
+        self.assertIsNone(tracer.start())
+
+
+    def test_database(self):
+        """
+        Statements run through the database are traced
+        """
+        interface = SQLiteInterface()
+        interface.connect(name=':memory:')
+        try:
+            tracer = interface.enable_tracing()
+            interface.execute('CREATE TABLE foo ( bar int );')
+            interface.execute_many('INSERT INTO foo (bar) VALUES (?)', [(1,), (2,)])
+            interface.execute('SELECT * FROM foo WHERE bar = ?', (1,))
+
+            records = tracer.records()
+            self.assertEqual(len(records), 3)
+            self.assertEqual((records[1].params, records[1].batch), (1, 2))
+            self.assertEqual(records[2].fingerprint, 'SELECT * FROM foo WHERE bar = ?')
+            self.assertIn('FROM foo', records[2].format())
+        finally:
+            interface.disconnect()
+
+
+    def test_fetches(self):
+        """
+        Reads through a query are traced once, fetching included, but
+        not the time spent with whoever's iterating
+        """
+        import time
+
+        class Traced(_TableLayout):
+            numba = _Field.IntField()
+
+        interface = SQLiteInterface()
+        interface.connect(name=':memory:')
+        try:
+            interface._create_table(Traced)
+            interface.bulk_create(Traced, [{'numba' : i} for i in range(3)])
+            tracer = interface.enable_tracing()
+
+            self.assertEqual(interface.new_query(Traced).count(), 3)
+            for row in interface.new_query(Traced).values_iter('numba', chunk_size=1):
+                time.sleep(0.05)
+
+            records = tracer.records()
+            self.assertEqual(len(records), 2)
+            self.assertTrue(all(r.fingerprint.startswith('SELECT') for r in records))
+            self.assertTrue(records[1].duration < 0.05)
+        finally:
+            interface.disconnect()
+
+
+    def test_profile_endpoint(self):
+        """
+        The profile report is served as json, with plans on request
+        """
+        class _Controller(object):
+            database = SQLiteInterface()
+
+        controller = _Controller()
+        controller.database.connect(name=':memory:')
+        try:
+            response = _webtoolkit.api_request('db/profile', controller, {})
+            self.assertFalse(json.loads(response.text)['enabled'])
+
+            controller.database.enable_tracing()
+            controller.database.execute('CREATE TABLE foo ( bar int );')
+            for i in range(3):
+                controller.database.execute('SELECT * FROM foo WHERE bar = ?', (i,))
+
+            response = _webtoolkit.api_request(
+                'db/profile', controller, {'explain' : '1'}
+            )
+            shapes = json.loads(response.text)['shapes']
+            select = [s for s in shapes if s['fingerprint'].startswith('SELECT')][0]
+            self.assertEqual(select['count'], 3)
+            self.assertEqual(select['plan'], ['SCAN foo'])
+
+            # Only reads are explained and that isn't traced itself
+            create = [s for s in shapes if s['fingerprint'].startswith('CREATE')][0]
+            self.assertIsNone(create['plan'])
+            self.assertEqual(len(controller.database.tracer.records()), 4)
+
+            # Resetting takes a POST
+            with self.assertRaises(web.HTTPMethodNotAllowed):
+                _webtoolkit.api_request('db/profile', controller, {'reset' : '1'})
+            _webtoolkit.api_request('db/profile', controller, {'reset' : '1'}, 'POST')
+            self.assertEqual(controller.database.tracer.records(), [])
+        finally:
+            controller.database.disconnect()